@@ -1,42 +1,43 @@
 """
 assist_mnt.py
+
+Les outils, tâches et docks (NumPy, GDAL, matplotlib) sont importés à leur
+première utilisation : le chargement du plugin au démarrage de QGIS n'importe
+que Qt et QGIS.
 """
 
 import os
 
-import matplotlib
-import networkx as nx
-import numpy as np
-import processing
-
-from qgis.PyQt.QtCore import QCoreApplication, Qt, QObject, QVariant
-from qgis.PyQt.QtGui import QIcon, QColor, QPainter
-from qgis.PyQt.QtWidgets import QAction, QMenu, QToolButton
-from qgis.PyQt.QtWidgets import QAction, QMessageBox
-from qgis.PyQt.QtWidgets import QAction, QMessageBox, QComboBox, QWidget, QToolBar
-from qgis.PyQt.QtWidgets import QAction, QMessageBox, QComboBox, QWidgetAction
-from qgis.PyQt.QtWidgets import QDockWidget, QWidget, QVBoxLayout
-from qgis._core import QgsRaster
+from qgis.PyQt.QtCore import QCoreApplication, Qt, QObject
+from qgis.PyQt.QtGui import QIcon, QPainter
+from qgis.PyQt.QtWidgets import QAction, QMessageBox, QMenu, QToolButton, QInputDialog
 from qgis.core import (
     QgsProject,
     QgsRasterLayer,
     QgsCoordinateReferenceSystem,
     QgsRasterTransparency,
     QgsMapLayer,
+    QgsProcessingAlgRunnerTask,
+    QgsProcessingContext,
     QgsProcessingFeedback,
     QgsFeature,
-    QgsGeometry,
-    QgsPointXY,
     QgsVectorLayer,
-    QgsWkbTypes,
-    QgsCoordinateTransform
+    QgsApplication,
+    QgsHillshadeRenderer,
+    QgsSettings
 )
-from qgis.gui import QgsMapTool, QgsRubberBand
 
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-from qgis.PyQt.QtWidgets import QAction, QMessageBox, QMenu, QToolButton, QInputDialog
+from .log import logger
+from .terrain.metrics import Metrics
+
+# Moteur d'ombrage de MNTvisu, conservé dans les paramètres QGIS
+HILLSHADE_ENGINE_KEY = 'AssistMnt/hillshadeEngine'
+HILLSHADE_ENGINES = {
+    'renderer': "Rendu à la volée",
+    'gdal': "gdal:hillshade",
+    'numpy': "Moteur NumPy par tuiles (grands MNT)"
+}
+
 
 class AssistMnt(QObject):
     """
@@ -58,8 +59,36 @@ class AssistMnt(QObject):
         self.menu = self.tr(u'&Assist MNT')
         self.toolbar = self.iface.addToolBar('Assist MNT')
         self.toolbar.setObjectName('Assist MNT')
+        logger.load_settings()
         self.ridge_tool = None  # Instance du nouvel outil
         self.profile_dock = None  # Ajoutez cette ligne
+        self.ridge_index_task = None
+        self.dem_cache_task = None
+        self.talweg_tool = None
+        self.flow_grids_task = None
+        # Mesures partagées par l'outil de tracé et le dock du profil
+        self.metrics = Metrics()
+        self.metrics_dock = None
+
+        # MNTvisu : étapes enchaînées en tâches d'arrière-plan
+        self.mntvisu_task = None
+        self.mntvisu_inputs = []
+        self.mntvisu_crs = None
+        self.mntvisu_context = None
+        self.mntvisu_feedback = None
+        self.overview_tasks = []
+        # Ombrage : 'renderer' (rendu à la volée), 'gdal' (gdal:hillshade) ou
+        # 'numpy' (moteur par tuiles parallèles, avec aperçus)
+        self.hillshade_engine = QgsSettings().value(HILLSHADE_ENGINE_KEY, 'renderer')
+        if self.hillshade_engine not in HILLSHADE_ENGINES:
+            self.hillshade_engine = 'renderer'
+        self.hillshade_params = {
+            'BAND': 1,
+            'Z_FACTOR': 1.0,
+            'AZIMUTH': 315.0,
+            'ALTITUDE': 45.0,
+            'MULTIDIRECTIONAL': False
+        }
 
     def tr(self, message):
         """
@@ -128,6 +157,10 @@ class AssistMnt(QObject):
         self.action_tracer_talweg.triggered.connect(self.show_talweg_tool)
         self.menu.addAction(self.action_tracer_talweg)
 
+        self.action_hillshade_engine = QAction("Ombrage MNTvisu", self.iface.mainWindow())
+        self.action_hillshade_engine.triggered.connect(self.configure_hillshade_engine)
+        self.menu.addAction(self.action_hillshade_engine)
+
         self.action_reset = QAction("Reset", self.iface.mainWindow())
         self.action_reset.triggered.connect(self.reset_toolbar)
         self.menu.addAction(self.action_reset)
@@ -148,12 +181,19 @@ class AssistMnt(QObject):
         """
         Supprime la barre d'outils du plugin et ses boutons de l'interface QGIS.
         """
+        self.cancel_mntvisu()
+        for task in self.overview_tasks:
+            task.cancel()
+        self.overview_tasks = []
         for action in self.actions:
             self.toolbar.removeAction(action)
         del self.toolbar
         if self.profile_dock is not None:
             self.iface.removeDockWidget(self.profile_dock)
             self.profile_dock = None
+        if self.metrics_dock is not None:
+            self.iface.removeDockWidget(self.metrics_dock)
+            self.metrics_dock = None
 
     def clear_toolbar_actions(self):
         """
@@ -220,6 +260,34 @@ class AssistMnt(QObject):
         self.toolbar.insertAction(self.menu_action, self.action_toggle_free_draw)
         self.actions.append(self.action_toggle_free_draw)
 
+        # Bouton toggle pour l'index de crêtes précalculé
+        self.action_ridge_index = QAction(self.tr(u'Index de crêtes'), self.iface.mainWindow())
+        self.action_ridge_index.setCheckable(True)
+        self.action_ridge_index.toggled.connect(self.toggle_ridge_index)
+        self.toolbar.insertAction(self.menu_action, self.action_ridge_index)
+        self.actions.append(self.action_ridge_index)
+
+        # Bouton de réglage des largeurs du couloir de recherche
+        self.action_corridor = QAction(self.tr(u'Couloir'), self.iface.mainWindow())
+        self.action_corridor.triggered.connect(self.configure_corridor)
+        self.toolbar.insertAction(self.menu_action, self.action_corridor)
+        self.actions.append(self.action_corridor)
+
+        # Bouton toggle pour le cache MNT projeté en mémoire
+        self.action_dem_cache = QAction(self.tr(u'Cache MNT'), self.iface.mainWindow())
+        self.action_dem_cache.setCheckable(True)
+        self.action_dem_cache.toggled.connect(self.toggle_dem_cache)
+        self.toolbar.insertAction(self.menu_action, self.action_dem_cache)
+        self.actions.append(self.action_dem_cache)
+
+        # Bouton toggle pour les mesures de performance
+        self.action_metrics = QAction(self.tr(u'Mesures'), self.iface.mainWindow())
+        self.action_metrics.setCheckable(True)
+        self.action_metrics.setChecked(self.metrics.enabled)
+        self.action_metrics.toggled.connect(self.toggle_metrics)
+        self.toolbar.insertAction(self.menu_action, self.action_metrics)
+        self.actions.append(self.action_metrics)
+
         # Bouton pour StopMNT
         self.action_stopMNT = QAction(QIcon(os.path.join(icon_dir, "icon/icon_stop.png")), self.tr(u'StopMNT'),
                                       self.iface.mainWindow())
@@ -243,6 +311,13 @@ class AssistMnt(QObject):
         self.toolbar.insertAction(self.menu_action, self.action_startTalweg)
         self.actions.append(self.action_startTalweg)
 
+        # Bouton pour StopTalweg
+        self.action_stopTalweg = QAction(QIcon(os.path.join(icon_dir, "icon/icon_stop.png")), self.tr(u'StopTalweg'),
+                                         self.iface.mainWindow())
+        self.action_stopTalweg.triggered.connect(self.stoptalweg_callback)
+        self.toolbar.insertAction(self.menu_action, self.action_stopTalweg)
+        self.actions.append(self.action_stopTalweg)
+
     def reset_toolbar(self):
         """
         Réinitialise la barre d'outils à son état initial.
@@ -255,10 +330,11 @@ class AssistMnt(QObject):
             self.ridge_tool.reset()
             self.ridge_tool = None
             self.canvas.unsetMapTool(self.canvas.mapTool())
+        if self.talweg_tool is not None:
+            self.stop_talweg_tool()
 
     def toggle_simplification(self, checked):
-        print("toggle_simplification appelée, checked:", checked)
-        print("self.ridge_tool:", self.ridge_tool)
+        logger.debug("toggle_simplification : checked=%s, outil=%s", checked, self.ridge_tool)
         if self.ridge_tool is not None:
             if checked:
                 tol, ok = QInputDialog.getDouble(self.iface.mainWindow(), "Tolérance de simplification",
@@ -283,8 +359,134 @@ class AssistMnt(QObject):
             # Désactiver le bouton si l'outil n'est pas actif
             self.action_toggle_free_draw.setChecked(False)
 
+    def configure_corridor(self):
+        """Demande les demi-largeurs minimale et maximale du couloir de recherche."""
+        if self.ridge_tool is None:
+            QMessageBox.warning(None, "Avertissement", "Veuillez d'abord activer l'outil avec le bouton StartMNT.")
+            return
+        min_width, ok = QInputDialog.getDouble(self.iface.mainWindow(), "Couloir de recherche",
+                                               "Demi-largeur initiale (unités du MNT) :",
+                                               self.ridge_tool.corridor_min_width, 0.1, 10000, decimals=1)
+        if not ok:
+            return
+        max_width, ok = QInputDialog.getDouble(self.iface.mainWindow(), "Couloir de recherche",
+                                               "Demi-largeur maximale (unités du MNT) :",
+                                               max(self.ridge_tool.corridor_max_width, min_width),
+                                               min_width, 10000, decimals=1)
+        if ok:
+            self.ridge_tool.set_corridor_widths(min_width, max_width)
+
+    def toggle_ridge_index(self, checked):
+        """Active ou désactive l'index de crêtes, calculé en arrière-plan si nécessaire."""
+        if self.ridge_tool is None:
+            QMessageBox.warning(None, "Avertissement", "Veuillez d'abord activer l'outil avec le bouton StartMNT.")
+            self.action_ridge_index.setChecked(False)
+            return
+
+        if not checked:
+            if self.ridge_index_task is not None:
+                self.ridge_index_task.cancel()
+                self.ridge_index_task = None
+            self.ridge_tool.set_ridge_index(None)
+            return
+
+        from .tasks import RidgeIndexTask
+        source = self.ridge_tool.raster_layer.dataProvider().dataSourceUri()
+        self.ridge_index_task = RidgeIndexTask(source)
+        self.ridge_index_task.taskCompleted.connect(self.on_ridge_index_ready)
+        self.ridge_index_task.taskTerminated.connect(self.on_ridge_index_failed)
+        QgsApplication.taskManager().addTask(self.ridge_index_task)
+
+    def on_ridge_index_ready(self):
+        """Charge l'index de crêtes calculé dans l'outil de tracé."""
+        task, self.ridge_index_task = self.ridge_index_task, None
+        if task is None or self.ridge_tool is None or not self.action_ridge_index.isChecked():
+            return
+        self.ridge_tool.set_ridge_index(task.index_path)
+
+    def on_ridge_index_failed(self):
+        """Signale l'échec du calcul de l'index de crêtes."""
+        task, self.ridge_index_task = self.ridge_index_task, None
+        if task is None:
+            return
+        if task.exception is not None:
+            QMessageBox.warning(None, "Avertissement", f"Échec du calcul de l'index de crêtes : {task.exception}")
+        self.action_ridge_index.setChecked(False)
+
+    def toggle_dem_cache(self, checked):
+        """
+        Active ou désactive la lecture du MNT depuis sa copie projetée en
+        mémoire, convertie en arrière-plan si nécessaire.
+        """
+        if self.ridge_tool is None:
+            QMessageBox.warning(None, "Avertissement", "Veuillez d'abord activer l'outil avec le bouton StartMNT.")
+            self.action_dem_cache.setChecked(False)
+            return
+
+        if not checked:
+            if self.dem_cache_task is not None:
+                self.dem_cache_task.cancel()
+                self.dem_cache_task = None
+            self.ridge_tool.set_dem_cache(None)
+            return
+
+        from .tasks import DemCacheTask
+        source = self.ridge_tool.raster_layer.dataProvider().dataSourceUri()
+        # Cache à côté du projet s'il est enregistré, sinon à côté du MNT
+        project_dir = QgsProject.instance().homePath()
+        cache_dir = project_dir if project_dir and os.access(project_dir, os.W_OK) else None
+        self.dem_cache_task = DemCacheTask(source, cache_dir, self.ridge_tool.dem_cache_max_bytes)
+        self.dem_cache_task.taskCompleted.connect(self.on_dem_cache_ready)
+        self.dem_cache_task.taskTerminated.connect(self.on_dem_cache_failed)
+        QgsApplication.taskManager().addTask(self.dem_cache_task)
+
+    def on_dem_cache_ready(self):
+        """Bascule l'outil de tracé sur le cache MNT converti."""
+        task, self.dem_cache_task = self.dem_cache_task, None
+        if task is None or self.ridge_tool is None or not self.action_dem_cache.isChecked():
+            return
+        self.ridge_tool.set_dem_cache(task.cache_path)
+
+    def on_dem_cache_failed(self):
+        """Signale l'échec (ou l'impossibilité) de la conversion du MNT."""
+        task, self.dem_cache_task = self.dem_cache_task, None
+        if task is None:
+            return
+        if task.exception is not None:
+            QMessageBox.warning(None, "Avertissement", f"Échec de la conversion du MNT : {task.exception}")
+        elif task.too_large:
+            QMessageBox.warning(None, "Avertissement", "Le MNT dépasse la taille maximale du cache.")
+        self.action_dem_cache.setChecked(False)
+
+    def toggle_metrics(self, checked):
+        """
+        Active ou désactive les mesures du tracé et affiche le dock des mesures.
+        """
+        self.metrics.enabled = checked
+        if self.metrics_dock is None:
+            from .docks import MetricsDockWidget
+            self.metrics_dock = MetricsDockWidget(self.metrics, self.iface.mainWindow())
+            self.iface.addDockWidget(Qt.RightDockWidgetArea, self.metrics_dock)
+        self.metrics_dock.setVisible(checked)
+
+    def configure_hillshade_engine(self):
+        """Demande le moteur d'ombrage de MNTvisu et le conserve dans les paramètres QGIS."""
+        engines = list(HILLSHADE_ENGINES)
+        labels = [HILLSHADE_ENGINES[engine] for engine in engines]
+        label, ok = QInputDialog.getItem(self.iface.mainWindow(), "Ombrage MNTvisu", "Moteur d'ombrage :",
+                                         labels, engines.index(self.hillshade_engine), False)
+        if ok:
+            self.hillshade_engine = engines[labels.index(label)]
+            QgsSettings().setValue(HILLSHADE_ENGINE_KEY, self.hillshade_engine)
+
     def mntvisu_callback(self):
-        """Function for MNTvisu button."""
+        """
+        Function for MNTvisu button.
+
+        La mosaïque et l'ombrage sont calculés en tâches d'arrière-plan
+        enchaînées, visibles et annulables dans le gestionnaire de tâches ;
+        les couches sont ajoutées et stylées à la fin du calcul.
+        """
 
         # Définir le code EPSG à assigner
         EPSG_CODE = 2154  # RGF93 / Lambert-93
@@ -299,8 +501,6 @@ class AssistMnt(QObject):
             QMessageBox.warning(None, "Avertissement", "Aucune couche raster sélectionnée.")
             return
 
-        feedback = QgsProcessingFeedback()
-
         # Assigner EPSG 2154 à chaque couche raster sélectionnée
         crs = QgsCoordinateReferenceSystem(EPSG_CODE)
         for layer in selected_layers:
@@ -308,63 +508,139 @@ class AssistMnt(QObject):
                 layer.setCrs(crs)
                 layer.triggerRepaint()
 
+        # Un nouveau lancement remplace le calcul en cours
+        self.cancel_mntvisu()
+        self.mntvisu_inputs = selected_layers
+        self.mntvisu_crs = crs
+
         # Si plusieurs couches sont sélectionnées, les combiner en une seule couche raster
         if len(selected_layers) > 1:
             # Rassembler les chemins des fichiers des couches raster sélectionnées
             raster_paths = [layer.source() for layer in selected_layers]
 
-            # Définir les paramètres pour l'algorithme 'gdal:merge'
-            merge_params = {
-                'INPUT': raster_paths,
-                'PCT': False,
-                'SEPARATE': False,
-                'NODATA_INPUT': None,
-                'NODATA_OUTPUT': None,
-                'OPTIONS': '',
-                'DATA_TYPE': 0,  # Utiliser le type de données de la première couche
-                'OUTPUT': 'TEMPORARY_OUTPUT'
-            }
-
-            # Exécuter l'algorithme de fusion
-            merge_result = processing.run("gdal:merge", merge_params, feedback=feedback)
-            merged_layer = QgsRasterLayer(merge_result['OUTPUT'], 'Raster Combiné')
-
-            if not merged_layer.isValid():
-                QMessageBox.critical(None, "Erreur", "Échec de la création du raster combiné.")
-                return
-
-            # Assigner EPSG 2154 au raster combiné
-            merged_layer.setCrs(crs)
-
-            # Ajouter la couche raster combinée au projet
-            QgsProject.instance().addMapLayer(merged_layer)
-            combined_layer = merged_layer
+            # Mosaïque virtuelle : les dalles sont référencées, pas recopiées
+            from .tasks import MosaicTask
+            self.mntvisu_task = MosaicTask(raster_paths)
+            self.mntvisu_task.taskCompleted.connect(self.on_mosaic_ready)
+            self.mntvisu_task.taskTerminated.connect(self.on_mosaic_failed)
+            QgsApplication.taskManager().addTask(self.mntvisu_task)
         else:
             # Une seule couche raster sélectionnée, l'utiliser directement
-            combined_layer = selected_layers[0]
+            self.start_hillshade(selected_layers[0])
+
+    def on_mosaic_ready(self):
+        """Ajoute la mosaïque au projet et enchaîne l'étape d'ombrage."""
+        if self.sender() is not self.mntvisu_task:
+            return
+        task, self.mntvisu_task = self.mntvisu_task, None
+        merged_layer = QgsRasterLayer(task.mosaic_path, 'Raster Combiné')
+
+        if not merged_layer.isValid():
+            QMessageBox.critical(None, "Erreur", "Échec de la création du raster combiné.")
+            return
+
+        # Assigner EPSG 2154 au raster combiné
+        merged_layer.setCrs(self.mntvisu_crs)
+
+        # Ajouter la couche raster combinée au projet
+        QgsProject.instance().addMapLayer(merged_layer)
+        self.start_hillshade(merged_layer)
+
+    def on_mosaic_failed(self):
+        """Signale l'échec de la mosaïque (rien n'est signalé en cas d'annulation)."""
+        if self.sender() is not self.mntvisu_task:
+            return
+        task, self.mntvisu_task = self.mntvisu_task, None
+        if task.exception is not None:
+            QMessageBox.critical(None, "Erreur", f"Échec de la création du raster combiné : {task.exception}")
+
+    def start_hillshade(self, combined_layer):
+        """
+        Étape d'ombrage de la couche raster combinée.
+
+        En rendu à la volée, QGIS n'ombre que les tuiles affichées et aucun
+        raster n'est écrit ; sinon ``gdal:hillshade`` ou le moteur NumPy est
+        exécuté en arrière-plan.
+        """
+        params = self.hillshade_params
+        if self.hillshade_engine == 'numpy':
+            from .tasks import HillshadeTask
+            task = HillshadeTask(combined_layer.source(), params)
+            task.taskCompleted.connect(lambda: self.on_hillshade_built(task, combined_layer))
+            task.taskTerminated.connect(lambda: self.on_hillshade_failed(task))
+            self.mntvisu_task = task
+            QgsApplication.taskManager().addTask(task)
+            return
+
+        if self.hillshade_engine == 'renderer':
+            hillshade_layer = QgsRasterLayer(combined_layer.source(), 'Ombrage')
+            if hillshade_layer.isValid():
+                renderer = QgsHillshadeRenderer(hillshade_layer.dataProvider(), params['BAND'],
+                                                params['AZIMUTH'], params['ALTITUDE'])
+                renderer.setZFactor(params['Z_FACTOR'])
+                renderer.setMultiDirectional(params['MULTIDIRECTIONAL'])
+                hillshade_layer.setRenderer(renderer)
+            self.finish_mntvisu(combined_layer, hillshade_layer)
+            return
 
-        # Générer un ombrage de la couche raster combinée
         hillshade_params = {
             'INPUT': combined_layer.source(),
-            'BAND': 1,
-            'Z_FACTOR': 1.0,
+            'BAND': params['BAND'],
+            'Z_FACTOR': params['Z_FACTOR'],
             'SCALE': 1.0,
-            'AZIMUTH': 315.0,
-            'ALTITUDE': 45.0,
+            'AZIMUTH': params['AZIMUTH'],
+            'ALTITUDE': params['ALTITUDE'],
             'COMPUTE_EDGES': False,
             'ZEVENBERGEN': False,
-            'MULTIDIRECTIONAL': False,
+            'MULTIDIRECTIONAL': params['MULTIDIRECTIONAL'],
             'COMBINED': False,
+            # Sortie tuilée et compressée ; ses aperçus sont construits ensuite
+            'OPTIONS': 'TILED=YES|COMPRESS=DEFLATE|PREDICTOR=2|BIGTIFF=IF_SAFER',
             'OUTPUT': 'TEMPORARY_OUTPUT'
         }
+        algorithm = QgsApplication.processingRegistry().algorithmById('gdal:hillshade')
+        # Le contexte et le retour doivent vivre aussi longtemps que la tâche
+        self.mntvisu_context = QgsProcessingContext()
+        self.mntvisu_feedback = QgsProcessingFeedback()
+        task = QgsProcessingAlgRunnerTask(algorithm, hillshade_params, self.mntvisu_context, self.mntvisu_feedback)
+        task.executed.connect(
+            lambda successful, results: self.on_hillshade_executed(task, combined_layer, successful, results))
+        self.mntvisu_task = task
+        QgsApplication.taskManager().addTask(task)
+
+    def on_hillshade_executed(self, task, combined_layer, successful, results):
+        """Ajoute l'ombrage calculé par ``gdal:hillshade`` au projet."""
+        if task is not self.mntvisu_task:
+            return
+        self.mntvisu_task = None
+        if not successful:
+            if not self.mntvisu_feedback.isCanceled():
+                QMessageBox.critical(None, "Erreur", "Échec de la création de l'ombrage.")
+            return
+        hillshade_layer = QgsRasterLayer(results['OUTPUT'], 'Ombrage')
+        self.finish_mntvisu(combined_layer, hillshade_layer)
+
+    def on_hillshade_built(self, task, combined_layer):
+        """Ajoute l'ombrage calculé par le moteur NumPy au projet."""
+        if task is not self.mntvisu_task:
+            return
+        self.mntvisu_task = None
+        self.finish_mntvisu(combined_layer, QgsRasterLayer(task.hillshade_path, 'Ombrage'))
 
-        hillshade_result = processing.run("gdal:hillshade", hillshade_params, feedback=feedback)
-        hillshade_layer = QgsRasterLayer(hillshade_result['OUTPUT'], 'Ombrage')
-        hillshade_layer.setCrs(crs)
+    def on_hillshade_failed(self, task):
+        """Signale l'échec du moteur d'ombrage (rien n'est signalé en cas d'annulation)."""
+        if task is not self.mntvisu_task:
+            return
+        self.mntvisu_task = None
+        if task.exception is not None:
+            QMessageBox.critical(None, "Erreur", f"Échec de la création de l'ombrage : {task.exception}")
 
+    def finish_mntvisu(self, combined_layer, hillshade_layer):
+        """Insère l'ombrage sous la couche combinée et applique le style."""
         if not hillshade_layer.isValid():
             QMessageBox.critical(None, "Erreur", "Échec de la création de l'ombrage.")
             return
+        hillshade_layer.setCrs(self.mntvisu_crs)
 
         # Ajouter la couche d'ombrage en dessous de la couche raster combinée
         QgsProject.instance().addMapLayer(hillshade_layer, False)
@@ -395,16 +671,123 @@ class AssistMnt(QObject):
         combined_layer.triggerRepaint()
 
         # Supprimer les couches raster de base non combinées si elles ont été fusionnées
-        if len(selected_layers) > 1:
-            for layer in selected_layers:
+        if combined_layer not in self.mntvisu_inputs:
+            for layer in self.mntvisu_inputs:
                 QgsProject.instance().removeMapLayer(layer.id())
+        self.mntvisu_inputs = []
+
+        # Aperçus des couches qui n'en ont pas, construits sans bloquer l'affichage
+        self.start_overviews([combined_layer, hillshade_layer])
+
+    def start_overviews(self, layers):
+        """
+        Construit en arrière-plan les aperçus manquants des couches raster,
+        puis les recharge pour que QGIS les utilise.
+        """
+        from .tasks import OverviewTask
+        sources = {}
+        for layer in layers:
+            sources.setdefault(layer.source(), []).append(layer.id())
+        task = OverviewTask(sources)
+        task.taskCompleted.connect(lambda: self.on_overviews_built(task))
+        task.taskTerminated.connect(lambda: self.on_overviews_built(task))
+        self.overview_tasks.append(task)
+        QgsApplication.taskManager().addTask(task)
+
+    def on_overviews_built(self, task):
+        """Recharge les couches dont les aperçus ont été construits."""
+        if task in self.overview_tasks:
+            self.overview_tasks.remove(task)
+        for source in task.built:
+            for layer_id in task.sources[source]:
+                layer = QgsProject.instance().mapLayer(layer_id)
+                if layer is not None:
+                    layer.dataProvider().reloadData()
+                    layer.triggerRepaint()
+
+    def cancel_mntvisu(self):
+        """Annule l'étape MNTvisu en cours."""
+        task, self.mntvisu_task = self.mntvisu_task, None
+        if task is not None:
+            task.cancel()
 
     def starttalweg_callback(self):
         """
-        Fonction appelée lorsque le bouton StartTalweg est cliqué.
-        Actuellement, elle ne fait rien.
+        Activation de l'outil de tracé de talweg.
+
+        Les directions d'écoulement du MNT sont calculées en arrière-plan lors
+        de la première utilisation, puis relues depuis le cache.
         """
-        pass
+        mnt_layer = None
+        for layer in QgsProject.instance().mapLayers().values():
+            if layer.type() == QgsMapLayer.RasterLayer and layer.isValid():
+                mnt_layer = layer
+                break
+
+        if mnt_layer is None:
+            QMessageBox.warning(None, "Avertissement", "Aucune couche raster active trouvée.")
+            return
+
+        from .map_tools import TalwegDrawingTool
+        from .tasks import FlowGridsTask
+        if self.talweg_tool is not None:
+            self.stop_talweg_tool()
+        self.talweg_tool = TalwegDrawingTool(self.canvas, mnt_layer)
+        self.canvas.setMapTool(self.talweg_tool)
+
+        source = mnt_layer.dataProvider().dataSourceUri()
+        self.flow_grids_task = FlowGridsTask(source)
+        self.flow_grids_task.taskCompleted.connect(self.on_flow_grids_ready)
+        self.flow_grids_task.taskTerminated.connect(self.on_flow_grids_failed)
+        QgsApplication.taskManager().addTask(self.flow_grids_task)
+
+    def on_flow_grids_ready(self):
+        """Charge les grilles d'écoulement calculées dans l'outil de talweg."""
+        task, self.flow_grids_task = self.flow_grids_task, None
+        if task is None or self.talweg_tool is None:
+            return
+        self.talweg_tool.set_flow_grids(task.grids_path)
+
+    def on_flow_grids_failed(self):
+        """Signale l'échec du calcul des directions d'écoulement."""
+        task, self.flow_grids_task = self.flow_grids_task, None
+        if task is not None and task.exception is not None:
+            QMessageBox.warning(None, "Avertissement",
+                                f"Échec du calcul des directions d'écoulement : {task.exception}")
+
+    def stoptalweg_callback(self):
+        """Désactivation de l'outil de talweg et création de la couche temporaire."""
+        if self.talweg_tool is None:
+            QMessageBox.warning(None, "Avertissement", "Aucun tracé en cours.")
+            return
+
+        crs = self.canvas.mapSettings().destinationCrs()
+        temp_layer = QgsVectorLayer(f"MultiLineString?crs={crs.authid()}", "Talweg", "memory")
+        if not temp_layer.isValid():
+            QMessageBox.critical(None, "Erreur", "Impossible de créer la couche vectorielle temporaire.")
+            return
+
+        temp_features = []
+        for idx, geom in enumerate(self.talweg_tool.confirmed_polylines):
+            feature = QgsFeature()
+            feature.setGeometry(geom)
+            feature.setAttributes([idx + 1])
+            temp_features.append(feature)
+        temp_layer.dataProvider().addFeatures(temp_features)
+        temp_layer.updateExtents()
+        QgsProject.instance().addMapLayer(temp_layer)
+
+        self.stop_talweg_tool()
+        QMessageBox.information(None, "Succès", "Les talwegs ont été ajoutés en tant que couche temporaire.")
+
+    def stop_talweg_tool(self):
+        """Abandonne le calcul en cours et désactive l'outil de talweg."""
+        if self.flow_grids_task is not None:
+            self.flow_grids_task.cancel()
+            self.flow_grids_task = None
+        self.talweg_tool.reset()
+        self.talweg_tool = None
+        self.canvas.unsetMapTool(self.canvas.mapTool())
 
     def startmnt_callback(self):
         """Activation de l'outil de tracé."""
@@ -419,13 +802,18 @@ class AssistMnt(QObject):
             QMessageBox.warning(None, "Avertissement", "Aucune couche raster active trouvée.")
             return
 
+        from .docks import ProfileDockWidget
+        from .map_tools import RidgeDrawingTool
+
         # Créer une instance de l'outil de dessin de ligne de crête
         self.ridge_tool = RidgeDrawingTool(self.canvas, mnt_layer)
+        self.ridge_tool.metrics = self.metrics
         self.canvas.setMapTool(self.ridge_tool)
 
         # Vérifier si le dock existe déjà
         if self.profile_dock is None:
             self.profile_dock = ProfileDockWidget(self.iface.mainWindow())
+            self.profile_dock.metrics = self.metrics
             self.iface.addDockWidget(Qt.RightDockWidgetArea, self.profile_dock)
 
         # Passer le dock à l'outil de dessin pour qu'il puisse le mettre à jour
@@ -477,425 +865,3 @@ class AssistMnt(QObject):
             self.profile_dock = None
 
         QMessageBox.information(None, "Succès", "La polyligne a été ajoutée en tant que couche temporaire.")
-
-
-class RidgeDrawingTool(QgsMapTool):
-    """
-    Outil de dessin de ligne de crête avec assistance dynamique sur MNT.
-    """
-
-    def __init__(self, canvas, raster_layer):
-        super().__init__(canvas)
-        self.canvas = canvas
-        self.raster_layer = raster_layer
-        self.start_point = None
-        self.dynamic_path = None
-        self.confirmed_polylines = []
-        self.free_draw_mode = False
-        self.free_draw_points = []
-        self.profile_dock = None
-        self.simplification_enabled = False
-        self.simplification_tolerance = 2
-
-        # Rubber band pour la ligne dynamique
-        self.dynamic_rubber_band = QgsRubberBand(self.canvas, QgsWkbTypes.LineGeometry)
-        self.dynamic_rubber_band.setColor(QColor(0, 255, 0))
-        self.dynamic_rubber_band.setWidth(3)
-        self.dynamic_rubber_band.setLineStyle(Qt.DashLine)
-
-        # Rubber band pour les polylignes confirmées
-        self.confirmed_rubber_band = QgsRubberBand(self.canvas, QgsWkbTypes.LineGeometry)
-        self.confirmed_rubber_band.setColor(QColor(0, 0, 220))
-        self.confirmed_rubber_band.setWidth(3)
-
-        # **Ajouter ce code pour le tracé libre**
-        # Rubber band pour le tracé libre
-        self.free_draw_rubber_band = QgsRubberBand(self.canvas, QgsWkbTypes.LineGeometry)
-        self.free_draw_rubber_band.setColor(QColor(0, 255, 255))
-        self.free_draw_rubber_band.setWidth(3)
-
-    def set_profile_dock(self, dock):
-        """Assigne le dock du profil d'élévation."""
-        self.profile_dock = dock
-
-    def set_simplification(self, enabled):
-        """
-        Active ou désactive la simplification du tracé.
-        """
-        self.simplification_enabled = enabled
-
-    def set_free_draw_mode(self, free_draw):
-        """Bascule le mode de tracé libre."""
-        if free_draw:
-            # Entrer en mode tracé libre
-            self.free_draw_mode = True
-            self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
-
-            # Initialiser les points du tracé libre avec le dernier point
-            if self.start_point is not None:
-                self.free_draw_points = [self.start_point]
-                self.free_draw_rubber_band.reset(QgsWkbTypes.LineGeometry)
-                self.free_draw_rubber_band.addPoint(self.start_point)
-            else:
-                # Aucun point de départ défini
-                self.free_draw_points = []
-        else:
-            # Sortir du mode tracé libre
-            self.free_draw_mode = False
-            self.free_draw_rubber_band.reset(QgsWkbTypes.LineGeometry)
-            if len(self.free_draw_points) >= 2:
-                # Créer une polyligne à partir des points tracés librement
-                free_draw_line = QgsGeometry.fromPolylineXY(self.free_draw_points)
-                # Ajouter aux polylignes confirmées
-                self.confirmed_polylines.append(free_draw_line)
-                self.confirmed_rubber_band.addGeometry(free_draw_line, None)
-                # Mettre à jour le point de départ pour le prochain segment
-                self.start_point = self.free_draw_points[-1]
-            elif len(self.free_draw_points) == 1:
-                # Un seul point cliqué en mode libre
-                self.start_point = self.free_draw_points[0]
-            # Réinitialiser les points du tracé libre
-            self.free_draw_points = []
-
-    def canvasPressEvent(self, event):
-        """Gestion des clics de souris."""
-        map_point = self.toMapCoordinates(event.pos())
-
-        if self.free_draw_mode:
-            # Mode tracé libre
-            self.free_draw_points.append(map_point)
-            self.free_draw_rubber_band.addPoint(map_point)
-        else:
-            if self.start_point is None:
-                # Premier clic : définir le point de départ
-                self.start_point = map_point
-            else:
-                # Clic suivant : confirmer le segment actuel
-                if self.dynamic_path:
-                    # Ajouter la polyligne confirmée
-                    self.confirmed_polylines.append(self.dynamic_path)
-                    self.confirmed_rubber_band.addGeometry(self.dynamic_path, None)
-                    # Mettre à jour le point de départ pour le prochain segment
-                    self.start_point = self.dynamic_path.asPolyline()[-1]
-                # Réinitialiser la ligne dynamique
-                self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
-
-    #
-    def canvasMoveEvent(self, event):
-        """Gestion des mouvements de souris."""
-        if self.free_draw_mode:
-            current_point = self.toMapCoordinates(event.pos())
-            if self.free_draw_points:
-                # Mettre à jour le rubber band pour montrer la ligne du dernier point jusqu'au curseur
-                self.free_draw_rubber_band.reset(QgsWkbTypes.LineGeometry)
-                for point in self.free_draw_points:
-                    self.free_draw_rubber_band.addPoint(point)
-                self.free_draw_rubber_band.addPoint(current_point)
-        else:
-            # Comportement existant
-            if self.start_point is not None:
-                current_point = self.toMapCoordinates(event.pos())
-                # Calculer le chemin de plus haute altitude
-                path_geometry = self.calculate_highest_path(self.start_point, current_point)
-                if path_geometry:
-                    # **Appliquer la simplification si activée**
-                    if self.simplification_enabled:
-                        simplified_geometry = self.simplify_geometry(path_geometry)
-                        self.dynamic_path = simplified_geometry
-                    else:
-                        self.dynamic_path = path_geometry
-                    # Afficher la polyligne dynamique
-                    self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
-                    self.dynamic_rubber_band.addGeometry(self.dynamic_path, None)
-
-                    # Mettre à jour le profil d'élévation
-                    if self.profile_dock:
-                        self.update_elevation_profile(self.dynamic_path)
-                else:
-                    self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
-
-    def simplify_geometry(self, geometry):
-        """
-        Simplifie la géométrie tout en préservant les points d'altitude maximale.
-        """
-        # Extraire les points de la polyligne
-        points = geometry.asPolyline()
-
-        # Trouver le point avec l'altitude maximale
-        max_elevation = -float('inf')
-        max_point = None
-        for point in points:
-            elevation = self.get_elevation_at_point(point)
-            if elevation is not None and elevation > max_elevation:
-                max_elevation = elevation
-                max_point = point
-
-        # Simplifier la géométrie
-        simplified_geometry = geometry.simplify(self.simplification_tolerance)
-
-        # S'assurer que le point d'altitude maximale est inclus
-        if max_point and not simplified_geometry.contains(QgsGeometry.fromPointXY(max_point)):
-            # Ajouter le point d'altitude maximale à la géométrie simplifiée
-            simplified_points = simplified_geometry.asPolyline()
-            simplified_points.append(max_point)
-            simplified_geometry = QgsGeometry.fromPolylineXY(simplified_points)
-            simplified_geometry = simplified_geometry.simplify(self.simplification_tolerance)
-
-        return simplified_geometry
-
-    def toggle_simplification(self, checked):
-        """
-        Active ou désactive la simplification du tracé.
-        """
-        if self.ridge_tool is not None:
-            if checked:
-                # Demander à l'utilisateur de saisir la tolérance
-                tol, ok = QInputDialog.getDouble(None, "Tolérance de simplification", "Entrez la tolérance :", 5, 0,
-                                                 100, decimals=2)
-                if ok:
-                    self.ridge_tool.simplification_tolerance = tol
-                else:
-                    # L'utilisateur a annulé, désactiver la simplification
-                    self.action_simplify.setChecked(False)
-                    return
-            self.ridge_tool.set_simplification(checked)
-        else:
-            QMessageBox.warning(None, "Avertissement", "Veuillez d'abord activer l'outil avec le bouton StartMNT.")
-            self.action_simplify.setChecked(False)
-
-
-    def update_elevation_profile(self, geometry):
-        """Extrait les altitudes le long de la polyligne et met à jour le profil."""
-        points = geometry.asPolyline()
-        distances = []
-        elevations = []
-        total_distance = 0
-
-        prev_point = None
-        for point in points:
-            # Calculer la distance cumulative
-            if prev_point is not None:
-                segment = QgsGeometry.fromPolylineXY([prev_point, point])
-                distance = segment.length()
-                total_distance += distance
-            else:
-                total_distance = 0
-            distances.append(total_distance)
-            prev_point = point
-
-            # Obtenir l'élévation du raster au point
-            elevation = self.get_elevation_at_point(point)
-            elevations.append(elevation if elevation is not None else 0)
-
-        # Mettre à jour le profil dans le dock
-        self.profile_dock.update_profile(distances, elevations)
-
-    def get_elevation_at_point(self, point):
-        """Obtient l'élévation du raster au point donné."""
-        # Transformer le point si nécessaire
-        raster_crs = self.raster_layer.crs()
-        canvas_crs = self.canvas.mapSettings().destinationCrs()
-        if raster_crs != canvas_crs:
-            xform = QgsCoordinateTransform(canvas_crs, raster_crs, QgsProject.instance())
-            point = xform.transform(point)
-
-        # Obtenir la valeur du raster
-        ident = self.raster_layer.dataProvider().identify(point, QgsRaster.IdentifyFormatValue)
-
-        # Vérifier si l'identification est valide
-        if ident.isValid():
-            results = ident.results()
-            # Afficher les résultats pour débogage
-            print(f"Résultats de l'identification au point {point}: {results}")
-            print(f"Clés disponibles : {results.keys()}")
-
-            # Déterminer la clé correcte pour accéder à l'altitude
-            elevation = None
-            if 'Band 1' in results:
-                elevation = results.get('Band 1', None)
-            elif 'Bande 1' in results:
-                elevation = results.get('Bande 1', None)
-            elif 'value' in results:
-                elevation = results.get('value', None)
-            elif 1 in results:
-                elevation = results.get(1, None)
-            else:
-                print("Clé d'altitude non trouvée dans les résultats.")
-                elevation = None
-
-            if elevation is not None:
-                elevation = float(elevation)
-            else:
-                print(f"Aucune élévation trouvée au point {point}.")
-            return elevation
-        else:
-            print(f"Identification non valide au point {point}.")
-            return None
-
-    def calculate_highest_path(self, start_point, end_point):
-        """Calcul du chemin de plus haute altitude entre deux points dans le buffer."""
-        from osgeo import gdal
-
-        # Création du buffer autour de la ligne entre les deux points
-        line = QgsGeometry.fromPolylineXY([start_point, end_point])
-        buffer_distance = 20
-        buffer_geom = line.buffer(buffer_distance, -1)
-
-        # Définir l'étendue du raster à extraire
-        extent = buffer_geom.boundingBox()
-        raster_provider = self.raster_layer.dataProvider()
-        raster_crs = self.raster_layer.crs()
-        canvas_crs = self.canvas.mapSettings().destinationCrs()
-
-        # Transformation des coordonnées si nécessaire
-        if not raster_crs == canvas_crs:
-            xform = QgsCoordinateTransform(canvas_crs, raster_crs, QgsProject.instance())
-            extent = xform.transformBoundingBox(extent)
-
-        # Ouvrir le raster avec GDAL
-        source = self.raster_layer.dataProvider().dataSourceUri()
-        dataset = gdal.Open(source)
-        if dataset is None:
-            return None
-
-        gt = dataset.GetGeoTransform()
-        inv_gt = gdal.InvGeoTransform(gt)
-        if inv_gt is None:
-            return None
-
-        xmin, ymin, xmax, ymax = extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum()
-
-        # S'assurer que xmin <= xmax et ymin <= ymax
-        if xmin > xmax:
-            xmin, xmax = xmax, xmin
-        if ymin > ymax:
-            ymin, ymax = ymax, ymin
-
-        # Transformer les coordonnées de l'étendue en coordonnées pixels
-        xoff1, yoff1 = gdal.ApplyGeoTransform(inv_gt, xmin, ymax)
-        xoff2, yoff2 = gdal.ApplyGeoTransform(inv_gt, xmax, ymin)
-
-        xoff = int(min(xoff1, xoff2))
-        yoff = int(min(yoff1, yoff2))
-        xsize = int(abs(xoff2 - xoff1))
-        ysize = int(abs(yoff2 - yoff1))
-
-        if xsize == 0 or ysize == 0:
-            return None
-
-        # Lire le tableau de données
-        band = dataset.GetRasterBand(1)
-        data_array = band.ReadAsArray(xoff, yoff, xsize, ysize)
-        if data_array is None:
-            return None
-
-        # Création du graphe
-        G = nx.DiGraph()
-
-        # Fonction pour convertir les indices de pixel en coordonnées
-        x0 = gt[0] + xoff * gt[1]
-        y0 = gt[3] + yoff * gt[5]
-        pixel_size_x = gt[1]
-        pixel_size_y = gt[5]
-
-        def pixel_to_map(i, j):
-            x = x0 + j * pixel_size_x + pixel_size_x / 2
-            y = y0 + i * pixel_size_y + pixel_size_y / 2
-            return QgsPointXY(x, y)
-
-        rows, cols = data_array.shape
-
-        # Ajout des nœuds au graphe
-        for i in range(rows):
-            for j in range(cols):
-                pos = pixel_to_map(i, j)
-                point_geom = QgsGeometry.fromPointXY(pos)
-                if buffer_geom.contains(point_geom):
-                    value = data_array[i][j]
-                    if value is not None and not np.isnan(value):
-                        node = (i, j)
-                        G.add_node(node, elevation=value, pos=pos)
-
-        # Ajout des arêtes au graphe
-        for node in G.nodes():
-            i, j = node
-            neighbors = [
-                (i + di, j + dj)
-                for di in [-1, 0, 1]
-                for dj in [-1, 0, 1]
-                if not (di == 0 and dj == 0)
-            ]
-            for neighbor in neighbors:
-                if neighbor in G.nodes():
-                    weight = -G.nodes[neighbor]['elevation']
-                    G.add_edge(node, neighbor, weight=weight)
-
-        # Trouver les nœuds les plus proches des points de départ et d'arrivée
-        start_node = None
-        end_node = None
-        min_start_dist = float('inf')
-        min_end_dist = float('inf')
-
-        for node in G.nodes():
-            pos = G.nodes[node]['pos']
-            dist_start = (pos.x() - start_point.x()) ** 2 + (pos.y() - start_point.y()) ** 2
-            dist_end = (pos.x() - end_point.x()) ** 2 + (pos.y() - end_point.y()) ** 2
-
-            if dist_start < min_start_dist:
-                min_start_dist = dist_start
-                start_node = node
-
-            if dist_end < min_end_dist:
-                min_end_dist = dist_end
-                end_node = node
-
-        if start_node is None or end_node is None:
-            return None
-
-        # Calcul du chemin le plus court (plus haute altitude)
-        try:
-            path = nx.dijkstra_path(G, start_node, end_node)
-        except nx.NetworkXNoPath:
-            return None
-
-        # Conversion du chemin en polyligne
-        point_list = [G.nodes[node]['pos'] for node in path]
-        return QgsGeometry.fromPolylineXY(point_list)
-
-    def reset(self):
-        """Réinitialise l'outil en supprimant les éléments temporaires."""
-        self.start_point = None
-        self.dynamic_path = None
-        self.confirmed_polylines = []
-        self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
-        self.confirmed_rubber_band.reset(QgsWkbTypes.LineGeometry)
-        # **Réinitialiser le tracé libre**
-        self.free_draw_rubber_band.reset(QgsWkbTypes.LineGeometry)
-        self.free_draw_points = []
-        self.free_draw_mode = False
-
-
-
-class ProfileDockWidget(QDockWidget):
-    def __init__(self, parent=None):
-        super().__init__("Profil d'Élévation", parent)
-
-        # Créer une figure Matplotlib
-        self.figure, self.ax = plt.subplots()
-        self.canvas = FigureCanvasQTAgg(self.figure)
-
-        # Configurer le widget principal
-        widget = QWidget()
-        layout = QVBoxLayout()
-        layout.addWidget(self.canvas)
-        widget.setLayout(layout)
-        self.setWidget(widget)
-
-    def update_profile(self, distances, elevations):
-        """Met à jour le graphique du profil d'élévation."""
-        self.ax.clear()
-        self.ax.plot(distances, elevations)
-        self.ax.set_xlabel("Distance (m)")
-        self.ax.set_ylabel("Élévation (m)")
-        self.ax.set_title("Profil d'Élévation")
-        self.canvas.draw()
@@ -0,0 +1,225 @@
+"""
+docks.py
+
+Docks du plugin : profil d'élévation et mesures du tracé.
+"""
+
+import math
+import time
+
+import numpy as np
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+
+from qgis.PyQt.QtCore import QTimer
+from qgis.PyQt.QtGui import QGuiApplication
+from qgis.PyQt.QtWidgets import (
+    QDockWidget,
+    QFileDialog,
+    QHBoxLayout,
+    QMessageBox,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget
+)
+
+from .terrain.metrics import Metrics
+
+
+class ProfileDockWidget(QDockWidget):
+    """
+    Dock du profil d'élévation.
+
+    La courbe est un ``Line2D`` persistant dont seules les données changent.
+    Tant que les limites des axes restent adaptées, la mise à jour se limite à
+    restaurer le fond mémorisé et à redessiner la courbe (blitting) ; les
+    mises à jour sont regroupées pour ne pas dépasser la fréquence de
+    rafraîchissement de l'écran.
+    """
+
+    # Marge ajoutée autour des données lors d'un recadrage, en fraction de l'étendue
+    AXIS_MARGIN = 0.05
+    # Les axes sont resserrés quand les données occupent moins de cette fraction de la vue
+    SHRINK_RATIO = 0.5
+    # Fréquence d'affichage utilisée si celle de l'écran est inconnue, en Hz
+    DEFAULT_REFRESH_RATE = 60.0
+
+    def __init__(self, parent=None):
+        super().__init__("Profil d'Élévation", parent)
+
+        # Créer une figure Matplotlib, hors de pyplot : le moteur de rendu global
+        # de matplotlib n'est pas modifié
+        self.figure = Figure()
+        self.ax = self.figure.add_subplot()
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.ax.set_xlabel("Distance (m)")
+        self.ax.set_ylabel("Élévation (m)")
+        self.ax.set_title("Profil d'Élévation")
+        # La courbe est exclue du dessin complet et ajoutée par blitting
+        self.line, = self.ax.plot([], [], animated=True)
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+        # Limitation de la fréquence d'affichage
+        screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None else 0
+        self.frame_interval = 1.0 / (refresh_rate if refresh_rate > 0 else self.DEFAULT_REFRESH_RATE)
+        self.last_frame = 0.0
+        self.pending_profile = None
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self.render_pending)
+        self.metrics = Metrics()
+
+        # Configurer le widget principal
+        widget = QWidget()
+        layout = QVBoxLayout()
+        layout.addWidget(self.canvas)
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+    def update_profile(self, distances, elevations):
+        """
+        Met à jour le graphique du profil d'élévation.
+
+        Une mise à jour reçue moins d'une période d'affichage après la
+        précédente est différée ; seule la dernière reçue est affichée.
+        """
+        self.pending_profile = (distances, elevations)
+        if self.frame_timer.isActive():
+            return
+        wait = self.last_frame + self.frame_interval - time.monotonic()
+        if wait > 0:
+            self.frame_timer.start(int(math.ceil(wait * 1000)))
+        else:
+            self.render_pending()
+
+    def render_pending(self):
+        """Affiche la dernière mise à jour reçue."""
+        if self.pending_profile is None:
+            return
+        distances, elevations = self.pending_profile
+        self.pending_profile = None
+        self.last_frame = time.monotonic()
+
+        with self.metrics.timer('plot'):
+            self.line.set_data(distances, elevations)
+            if self.rescale(distances, elevations) or self.background is None:
+                # Dessin complet : le fond est mémorisé par on_draw
+                self.metrics.count('full_redraws')
+                self.canvas.draw()
+            else:
+                self.canvas.restore_region(self.background)
+                self.ax.draw_artist(self.line)
+                self.canvas.blit(self.ax.bbox)
+        self.metrics.count('frames')
+
+    def rescale(self, distances, elevations):
+        """
+        Adapte les limites des axes aux données si elles en sortent ou n'en
+        occupent plus qu'une petite partie.
+
+        :return: True si les limites ont changé.
+        :rtype: bool
+        """
+        distances = np.asarray(distances, dtype=np.float64)
+        elevations = np.asarray(elevations, dtype=np.float64)
+        if distances.size == 0 or np.isnan(elevations).all():
+            return False
+        changed = False
+        for values, get_lim, set_lim in ((distances, self.ax.get_xlim, self.ax.set_xlim),
+                                         (elevations, self.ax.get_ylim, self.ax.set_ylim)):
+            low, high = float(np.nanmin(values)), float(np.nanmax(values))
+            view_low, view_high = get_lim()
+            span = high - low
+            if low >= view_low and high <= view_high and span >= self.SHRINK_RATIO * (view_high - view_low):
+                continue
+            margin = self.AXIS_MARGIN * span if span > 0 else 1.0
+            set_lim(low - margin, high + margin)
+            changed = True
+        return changed
+
+    def on_draw(self, event):
+        """Mémorise le fond (axes sans la courbe) et y ajoute la courbe après un dessin complet."""
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
+
+
+class MetricsDockWidget(QDockWidget):
+    """
+    Dock des mesures du tracé : durées par étape et compteurs, actualisés
+    périodiquement, avec export JSON ou CSV.
+    """
+
+    # Période d'actualisation du tableau, en millisecondes
+    REFRESH_INTERVAL = 1000
+    COLUMNS = ('Étape', 'Appels', 'Moyenne (ms)', 'p50 (ms)', 'p90 (ms)', 'p99 (ms)', 'Max (ms)')
+
+    def __init__(self, metrics, parent=None):
+        super().__init__("Mesures du tracé", parent)
+        self.metrics = metrics
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+
+        export_json = QPushButton("Exporter JSON")
+        export_json.clicked.connect(lambda: self.export('JSON (*.json)', self.metrics.dump_json))
+        export_csv = QPushButton("Exporter CSV")
+        export_csv.clicked.connect(lambda: self.export('CSV (*.csv)', self.metrics.dump_csv))
+        reset = QPushButton("Réinitialiser")
+        reset.clicked.connect(self.reset)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(export_json)
+        buttons.addWidget(export_csv)
+        buttons.addWidget(reset)
+        layout = QVBoxLayout()
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+        widget = QWidget()
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+        # Le tableau n'est actualisé que lorsque le dock est visible
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.on_visibility_changed)
+
+    def on_visibility_changed(self, visible):
+        """Démarre ou arrête l'actualisation périodique."""
+        if visible:
+            self.refresh()
+            self.refresh_timer.start(self.REFRESH_INTERVAL)
+        else:
+            self.refresh_timer.stop()
+
+    def refresh(self):
+        """Affiche le résumé courant des mesures."""
+        summary = self.metrics.summary()
+        rows = [(stage, stats['calls'], stats['mean_ms'], stats['p50_ms'], stats['p90_ms'],
+                 stats['p99_ms'], stats['max_ms']) for stage, stats in summary['stages'].items()]
+        rows += [(name, value) for name, value in sorted(summary['counters'].items())]
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j in range(len(self.COLUMNS)):
+                value = row[j] if j < len(row) else ''
+                text = f"{value:.2f}" if isinstance(value, float) else str(value)
+                self.table.setItem(i, j, QTableWidgetItem(text))
+
+    def export(self, file_filter, dump):
+        """Enregistre le résumé des mesures dans le fichier choisi par l'utilisateur."""
+        path, _ = QFileDialog.getSaveFileName(self, "Exporter les mesures", "", file_filter)
+        if not path:
+            return
+        try:
+            dump(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Avertissement", f"Export impossible : {e}")
+
+    def reset(self):
+        """Efface les mesures enregistrées."""
+        self.metrics.reset()
+        self.refresh()
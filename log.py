@@ -0,0 +1,117 @@
+"""
+log.py
+
+Journal du plugin dans le panneau « Journal des messages » de QGIS.
+
+Les messages sous le niveau courant ne coûtent qu'une comparaison : les
+arguments sont formatés (``message % args``) seulement pour les messages
+émis. Chaque modèle de message est limité à ``rate_limit`` émissions par
+période ``rate_period`` ; le nombre de messages supprimés est rappelé à la
+première émission de la période suivante.
+
+Le niveau est lu dans les paramètres QGIS (clé ``AssistMnt/logLevel`` :
+DEBUG, INFO, WARNING ou CRITICAL ; WARNING par défaut).
+"""
+
+import threading
+import time
+
+from qgis.core import Qgis, QgsMessageLog, QgsSettings
+
+TAG = 'Assist MNT'
+SETTINGS_KEY = 'AssistMnt/logLevel'
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+CRITICAL = 50
+LEVEL_NAMES = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'CRITICAL': CRITICAL}
+
+# QgsMessageLog n'a pas de niveau de débogage : ces messages sont des infos préfixées
+_QGIS_LEVELS = {DEBUG: Qgis.Info, INFO: Qgis.Info, WARNING: Qgis.Warning, CRITICAL: Qgis.Critical}
+
+
+class PluginLogger:
+    """
+    Journal filtré par niveau et limité en débit, écrivant dans QgsMessageLog.
+    """
+
+    def __init__(self, tag=TAG, level=WARNING, rate_limit=10, rate_period=1.0):
+        """
+        :param tag: Onglet du journal des messages.
+        :type tag: str
+        :param level: Niveau minimal des messages émis.
+        :type level: int
+        :param rate_limit: Nombre maximal d'émissions d'un même modèle par période.
+        :type rate_limit: int
+        :param rate_period: Durée de la période de limitation, en secondes.
+        :type rate_period: float
+        """
+        self.tag = tag
+        self.level = level
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        # Modèle de message -> [début de période, émissions, suppressions]
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def set_level(self, level):
+        """Change le niveau minimal, donné par sa valeur ou son nom."""
+        if isinstance(level, str):
+            level = LEVEL_NAMES.get(level.upper(), WARNING)
+        self.level = level
+
+    def load_settings(self):
+        """Lit le niveau dans les paramètres QGIS."""
+        self.set_level(QgsSettings().value(SETTINGS_KEY, 'WARNING'))
+
+    def is_enabled_for(self, level):
+        """Indique si un message de niveau ``level`` serait émis."""
+        return level >= self.level
+
+    def log(self, level, message, *args):
+        """
+        Émet ``message % args`` si le niveau et la limite de débit le permettent.
+
+        :param level: Niveau du message.
+        :type level: int
+        :param message: Modèle du message, formaté avec ``args`` seulement s'il est émis.
+        :type message: str
+        """
+        if level < self.level:
+            return
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(message)
+            if window is None or now - window[0] >= self.rate_period:
+                suppressed = window[2] if window is not None else 0
+                window = self.windows[message] = [now, 0, 0]
+            else:
+                suppressed = 0
+            if window[1] >= self.rate_limit:
+                window[2] += 1
+                return
+            window[1] += 1
+
+        text = message % args if args else message
+        if level == DEBUG:
+            text = f"[DEBUG] {text}"
+        if suppressed:
+            text = f"{text} ({suppressed} messages semblables supprimés)"
+        QgsMessageLog.logMessage(text, self.tag, _QGIS_LEVELS.get(level, Qgis.Info))
+
+    def debug(self, message, *args):
+        self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(WARNING, message, *args)
+
+    def critical(self, message, *args):
+        self.log(CRITICAL, message, *args)
+
+
+# Journal partagé par tous les modules du plugin
+logger = PluginLogger()
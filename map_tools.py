@@ -0,0 +1,1057 @@
+"""
+map_tools.py
+
+Outils cartographiques du plugin : tracé assisté de crêtes et tracé de talwegs.
+"""
+
+import math
+import time
+
+import numpy as np
+
+from qgis.PyQt.QtCore import Qt, QTimer
+from qgis.PyQt.QtGui import QColor
+from qgis.PyQt.QtWidgets import QMessageBox
+from qgis.core import (
+    QgsApplication,
+    QgsCoordinateTransform,
+    QgsGeometry,
+    QgsPointXY,
+    QgsProject,
+    QgsWkbTypes
+)
+from qgis.gui import QgsMapTool, QgsRubberBand
+
+from .log import logger
+from .tasks import PathComputationTask
+from .terrain.dem_cache import MemmapRasterReader
+from .terrain.hydrology import FlowGrids
+from .terrain.lru import LRUCache
+from .terrain.metrics import Metrics
+from .terrain.path_engine import ASTAR, BIDIRECTIONAL, DIJKSTRA, SingleSourceSearch, nearest_valid_pixel
+from .terrain.pyramid import coarse_to_fine_path
+from .terrain.raster_window import RasterWindowReader
+from .terrain.ridge_index import snap_to_ridge
+from .terrain.ridge_path import (
+    elevation_profile,
+    highest_path,
+    path_points,
+    read_window,
+    search_cost,
+    simplify_path
+)
+from .terrain.sampling import NEAREST
+
+
+class RidgeDrawingTool(QgsMapTool):
+    """
+    Outil de dessin de ligne de crête avec assistance dynamique sur MNT.
+    """
+
+    def __init__(self, canvas, raster_layer):
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.raster_layer = raster_layer
+        self.start_point = None
+        self.dynamic_path = None
+        self.confirmed_polylines = []
+        self.free_draw_mode = False
+        self.free_draw_points = []
+        self.profile_dock = None
+        self.simplification_enabled = False
+        self.simplification_tolerance = 2
+
+        # Accès persistant au MNT (cache de tuiles décodées)
+        self.raster_cache_bytes = 256 * 1024 ** 2
+        self.raster_reader = None
+        # Copie décompressée du MNT projetée en mémoire (optionnelle) et sa taille maximale
+        self.dem_cache_path = None
+        self.dem_cache_max_bytes = 8 * 1024 ** 3
+        # Échantillonnage des altitudes : 'nearest' (valeur du pixel) ou 'bilinear'
+        self.sampling_mode = NEAREST
+
+        # Demi-largeur du couloir de recherche autour du segment départ/arrivée
+        # (unités du MNT) : le couloir démarre étroit et n'est élargi, jusqu'au
+        # maximum, que si le chemin en longe le bord
+        self.corridor_min_width = 6.0
+        self.corridor_max_width = 80.0
+
+        # Algorithme de recherche ('dijkstra', 'astar' ou 'bidirectional') et
+        # coût ajouté par mètre parcouru, en mètres d'altitude
+        self.search_algorithm = ASTAR
+        self.distance_weight = 0.0
+
+        # Recherche multi-résolution : niveau de la passe grossière (0 = désactivée),
+        # demi-largeur du couloir d'affinage (unités du MNT) et longueur minimale
+        # du déplacement, en pixels, pour l'utiliser
+        self.pyramid_levels = 0
+        self.pyramid_refine_width = 5.0
+        self.pyramid_min_pixels = 256
+
+        # Index de crêtes précalculé : poids de son coût et rayon d'accrochage (pixels)
+        self.ridge_index = None
+        self.ridge_weight = 1.0
+        self.ridge_snap_radius = 2
+
+        # Recherche incrémentale depuis le point de départ (demi-tailles de région en pixels)
+        self.incremental_search = False
+        self.incremental_radius = 128
+        self.incremental_max_radius = 512
+        # État de la recherche (IncrementalSearch), et génération incrémentée à
+        # chaque réglage qui l'invalide : l'état rendu par un calcul lancé avant
+        # le changement est ignoré
+        self.incremental_state = None
+        self.search_generation = 0
+
+        # Chemins déjà calculés (polyligne et profil), par pixels de départ et d'arrivée
+        self.path_cache = LRUCache(256)
+        self.canvas_crs = None
+        self.raster_crs = None
+        # Pixel du MNT du point de départ, calculé une fois par point de départ
+        self.start_pixel_point = None
+        self.start_pixel = None
+
+        # Mesures du chemin critique (désactivées par défaut)
+        self.metrics = Metrics()
+
+        # Calcul du chemin en arrière-plan (la dernière demande l'emporte)
+        self.background_computation = True
+        self.path_task = None
+        self.pending_path_request = None
+        self.path_request_id = 0
+        self.displayed_request_id = 0
+        # Calculs d'arrière-plan en cours (y compris annulés) et lecteurs à
+        # fermer quand plus aucun ne peut les utiliser
+        self.active_path_tasks = set()
+        self.retired_readers = []
+        self.raster_transform = None
+        self.update_raster_transform()
+
+        # Regroupement des mouvements de souris : un calcul au plus par pixel du
+        # MNT survolé et au plus max_path_rate calculs par seconde (0 = sans
+        # limite) ; la dernière position différée est traitée à l'échéance
+        self.max_path_rate = 30.0
+        self.last_move_pixel = None
+        self.last_request_time = 0.0
+        self.trailing_point = None
+        self.trailing_timer = QTimer(self)
+        self.trailing_timer.setSingleShot(True)
+        self.trailing_timer.timeout.connect(self.flush_trailing_move)
+
+        # Rubber band pour la ligne dynamique
+        self.dynamic_rubber_band = QgsRubberBand(self.canvas, QgsWkbTypes.LineGeometry)
+        self.dynamic_rubber_band.setColor(QColor(0, 255, 0))
+        self.dynamic_rubber_band.setWidth(3)
+        self.dynamic_rubber_band.setLineStyle(Qt.DashLine)
+
+        # Rubber band pour les polylignes confirmées
+        self.confirmed_rubber_band = QgsRubberBand(self.canvas, QgsWkbTypes.LineGeometry)
+        self.confirmed_rubber_band.setColor(QColor(0, 0, 220))
+        self.confirmed_rubber_band.setWidth(3)
+
+        # **Ajouter ce code pour le tracé libre**
+        # Rubber band pour le tracé libre
+        self.free_draw_rubber_band = QgsRubberBand(self.canvas, QgsWkbTypes.LineGeometry)
+        self.free_draw_rubber_band.setColor(QColor(0, 255, 255))
+        self.free_draw_rubber_band.setWidth(3)
+        # Le rubber band contient les points cliqués, suivis d'un sommet qui suit
+        # le curseur une fois la souris déplacée
+        self.free_draw_cursor_vertex = False
+
+    def set_profile_dock(self, dock):
+        """Assigne le dock du profil d'élévation."""
+        self.profile_dock = dock
+        # Les chemins en cache n'ont pas de profil si le dock était absent
+        self.path_cache.clear()
+
+    def set_simplification(self, enabled):
+        """
+        Active ou désactive la simplification du tracé.
+        """
+        self.simplification_enabled = enabled
+
+    def set_search_algorithm(self, algorithm):
+        """
+        Choisit l'algorithme de recherche du tracé assisté.
+
+        :param algorithm: ``'dijkstra'``, ``'astar'`` ou ``'bidirectional'``.
+        :type algorithm: str
+        """
+        if algorithm not in (DIJKSTRA, ASTAR, BIDIRECTIONAL):
+            raise ValueError(f"Algorithme de recherche inconnu : {algorithm}")
+        self.search_algorithm = algorithm
+        self.path_cache.clear()
+
+    def set_pyramid_search(self, levels, refine_width=None):
+        """
+        Configure la recherche multi-résolution des grands déplacements.
+
+        :param levels: Niveau de la passe grossière (facteur 2^levels), 0 pour désactiver.
+        :type levels: int
+        :param refine_width: Demi-largeur du couloir d'affinage, en unités du MNT.
+        :type refine_width: float
+        """
+        self.pyramid_levels = max(int(levels), 0)
+        if refine_width is not None:
+            self.pyramid_refine_width = refine_width
+        self.path_cache.clear()
+
+    def set_ridge_index(self, path):
+        """
+        Charge l'index de crêtes précalculé du MNT, ou le retire si ``path`` est None.
+
+        :param path: Chemin de l'index produit par ``build_ridge_index``.
+        :type path: str
+        """
+        if self.ridge_index is not None:
+            self.close_reader(self.ridge_index)
+            self.ridge_index = None
+        if path is not None:
+            self.ridge_index = RasterWindowReader(path, cache_bytes=self.raster_cache_bytes // 4)
+        self.invalidate_search()
+        self.path_cache.clear()
+
+    def set_dem_cache(self, path):
+        """
+        Lit le MNT depuis sa copie projetée en mémoire, ou de nouveau par GDAL
+        si ``path`` est None.
+
+        :param path: Chemin du cache produit par ``build_dem_cache``.
+        :type path: str
+        """
+        self.dem_cache_path = path
+        if self.raster_reader is not None:
+            self.close_reader(self.raster_reader)
+            self.raster_reader = None
+        self.invalidate_search()
+
+    def set_corridor_widths(self, min_width, max_width):
+        """
+        Règle les demi-largeurs minimale et maximale du couloir de recherche.
+
+        :raises ValueError: Si les largeurs ne sont pas positives et croissantes.
+        """
+        if not 0 < min_width <= max_width:
+            raise ValueError(f"Largeurs de couloir invalides : {min_width}, {max_width}")
+        self.corridor_min_width = min_width
+        self.corridor_max_width = max_width
+        self.path_cache.clear()
+
+    def set_incremental_search(self, enabled):
+        """
+        Active ou désactive la recherche incrémentale depuis le point de départ.
+        """
+        self.incremental_search = enabled
+        self.invalidate_search()
+        self.path_cache.clear()
+
+    def invalidate_search(self):
+        """Abandonne la recherche incrémentale, y compris celle d'un calcul en cours."""
+        self.incremental_state = None
+        self.search_generation += 1
+
+    def close_reader(self, reader):
+        """Ferme un lecteur raster dès qu'aucun calcul d'arrière-plan ne peut plus l'utiliser."""
+        if self.active_path_tasks:
+            self.retired_readers.append(reader)
+        else:
+            reader.close()
+
+    def set_free_draw_mode(self, free_draw):
+        """Bascule le mode de tracé libre."""
+        if free_draw:
+            # Entrer en mode tracé libre
+            self.free_draw_mode = True
+            self.cancel_pending_move()
+            self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
+
+            # Initialiser les points du tracé libre avec le dernier point
+            if self.start_point is not None:
+                self.free_draw_points = [self.start_point]
+                self.free_draw_rubber_band.reset(QgsWkbTypes.LineGeometry)
+                self.free_draw_rubber_band.addPoint(self.start_point)
+                self.free_draw_cursor_vertex = False
+            else:
+                # Aucun point de départ défini
+                self.free_draw_points = []
+        else:
+            # Sortir du mode tracé libre
+            self.free_draw_mode = False
+            self.free_draw_rubber_band.reset(QgsWkbTypes.LineGeometry)
+            self.free_draw_cursor_vertex = False
+            if len(self.free_draw_points) >= 2:
+                # Créer une polyligne à partir des points tracés librement
+                free_draw_line = QgsGeometry.fromPolylineXY(self.free_draw_points)
+                # Ajouter aux polylignes confirmées
+                self.confirmed_polylines.append(free_draw_line)
+                self.confirmed_rubber_band.addGeometry(free_draw_line, None)
+                # Mettre à jour le point de départ pour le prochain segment
+                self.start_point = self.free_draw_points[-1]
+            elif len(self.free_draw_points) == 1:
+                # Un seul point cliqué en mode libre
+                self.start_point = self.free_draw_points[0]
+            # Réinitialiser les points du tracé libre
+            self.free_draw_points = []
+
+    def canvasPressEvent(self, event):
+        """Gestion des clics de souris."""
+        map_point = self.toMapCoordinates(event.pos())
+
+        if self.free_draw_mode:
+            # Mode tracé libre : le sommet du curseur devient le point cliqué
+            self.free_draw_points.append(map_point)
+            if self.free_draw_cursor_vertex:
+                self.free_draw_rubber_band.movePoint(map_point)
+                self.free_draw_cursor_vertex = False
+            else:
+                self.free_draw_rubber_band.addPoint(map_point)
+        else:
+            # Le prochain mouvement repart d'un nouveau point de départ
+            self.cancel_pending_move()
+            if self.start_point is None:
+                # Premier clic : définir le point de départ
+                self.start_point = map_point
+            else:
+                # Clic suivant : confirmer le segment jusqu'au point cliqué
+                path_geometry = self.path_to_click(map_point)
+                if path_geometry:
+                    self.dynamic_path = path_geometry
+                    # Ajouter la polyligne confirmée
+                    self.confirmed_polylines.append(path_geometry)
+                    self.confirmed_rubber_band.addGeometry(path_geometry, None)
+                    # Mettre à jour le point de départ pour le prochain segment
+                    self.start_point = path_geometry.asPolyline()[-1]
+                # Réinitialiser la ligne dynamique
+                self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
+
+    def path_to_click(self, map_point):
+        """
+        Chemin du point de départ jusqu'au point cliqué.
+
+        Le chemin affiché peut viser une position antérieure du curseur
+        (mouvement différé, calcul d'arrière-plan en cours) : le chemin
+        jusqu'au pixel cliqué est repris du cache ou calculé immédiatement.
+
+        :return: Polyligne dans le SCR du canevas, ou None.
+        :rtype: QgsGeometry
+        """
+        self.update_raster_transform()
+        cache_key = self.path_cache_key(self.start_point, self.canvas_to_pixel(map_point))
+        cached = self.path_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            self.metrics.count('path_cache_hits')
+            return cached[0]
+        return self.compute_path_now(map_point, cache_key)[0]
+
+    def compute_path_now(self, end_point, cache_key):
+        """
+        Calcule le chemin jusqu'à ``end_point`` dans le thread de l'interface
+        et le conserve dans le cache.
+
+        :return: (géométrie, profil)
+        :rtype: tuple
+        """
+        computation = PathComputation(self)
+        if self.active_path_tasks:
+            # La recherche incrémentale peut être en cours d'extension par un
+            # calcul d'arrière-plan : elle n'est pas partagée
+            computation.search = None
+        path_geometry, profile = computation.compute_dynamic_path(self.start_point, end_point)
+        self.adopt_search(computation)
+        if path_geometry and cache_key is not None:
+            self.path_cache.put(cache_key, (path_geometry, profile))
+        return path_geometry, profile
+
+    #
+    def canvasMoveEvent(self, event):
+        """Gestion des mouvements de souris."""
+        self.metrics.count('mouse_moves')
+        if self.free_draw_mode:
+            current_point = self.toMapCoordinates(event.pos())
+            if self.free_draw_points:
+                # Ligne du dernier point jusqu'au curseur : seul le dernier sommet est déplacé
+                if self.free_draw_cursor_vertex:
+                    self.free_draw_rubber_band.movePoint(current_point)
+                else:
+                    self.free_draw_rubber_band.addPoint(current_point)
+                    self.free_draw_cursor_vertex = True
+        else:
+            # Comportement existant
+            if self.start_point is not None:
+                current_point = self.toMapCoordinates(event.pos())
+                # Calculer le chemin de plus haute altitude
+                self.coalesce_move(current_point)
+
+    def coalesce_move(self, point):
+        """
+        Filtre les mouvements de souris avant le calcul du chemin.
+
+        Un mouvement qui reste sur le pixel du MNT du mouvement précédent est
+        ignoré ; un mouvement arrivant moins de ``1 / max_path_rate`` secondes
+        après le dernier calcul est différé, seul le dernier différé étant
+        calculé à l'échéance.
+
+        La transformation vers le SCR du MNT et le pixel survolé sont calculés
+        une seule fois, puis transmis au calcul du chemin.
+        """
+        self.update_raster_transform()
+        pixel = self.canvas_to_pixel(point)
+        if pixel is not None and pixel == self.last_move_pixel:
+            self.metrics.count('moves_coalesced')
+            return
+        self.last_move_pixel = pixel
+
+        wait = 0.0
+        if self.max_path_rate > 0:
+            wait = self.last_request_time + 1.0 / self.max_path_rate - time.monotonic()
+        if wait > 0:
+            self.metrics.count('moves_deferred')
+            self.trailing_point = point
+            if not self.trailing_timer.isActive():
+                self.trailing_timer.start(int(math.ceil(wait * 1000)))
+            return
+        self.trailing_point = None
+        self.trailing_timer.stop()
+        self.last_request_time = time.monotonic()
+        self.request_dynamic_path(point, pixel)
+
+    def flush_trailing_move(self):
+        """Calcule le chemin vers la dernière position différée."""
+        point, self.trailing_point = self.trailing_point, None
+        if point is None or self.start_point is None or self.free_draw_mode:
+            return
+        self.last_request_time = time.monotonic()
+        self.request_dynamic_path(point)
+
+    def cancel_pending_move(self):
+        """Oublie la position différée et le dernier pixel survolé."""
+        self.trailing_timer.stop()
+        self.trailing_point = None
+        self.last_move_pixel = None
+
+    def canvas_to_pixel(self, point):
+        """
+        Pixel du MNT contenant un point du canevas.
+
+        :return: (ligne, colonne), ou None si le MNT ne peut pas être ouvert.
+        :rtype: tuple
+        """
+        reader = self.get_raster_reader()
+        if reader is None:
+            return None
+        point = QgsPointXY(point)
+        if self.raster_transform is not None:
+            point = self.raster_transform.transform(point)
+        col, row = reader.world_to_pixel(point.x(), point.y())
+        return math.floor(row), math.floor(col)
+
+    def request_dynamic_path(self, end_point, end_pixel=None):
+        """
+        Demande le calcul du chemin dynamique jusqu'à ``end_point``.
+
+        Un seul calcul tourne en arrière-plan à la fois ; une demande arrivant
+        pendant ce calcul remplace la demande en attente précédente, qui ne
+        sera jamais exécutée.
+
+        :param end_pixel: Pixel du MNT de ``end_point`` si l'appelant vient de le
+            calculer, la transformation étant alors déjà à jour.
+        :type end_pixel: tuple
+        """
+        if end_pixel is None:
+            self.update_raster_transform()
+            end_pixel = self.canvas_to_pixel(end_point)
+        self.path_request_id += 1
+        cache_key = self.path_cache_key(self.start_point, end_pixel)
+        cached = self.path_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            self.metrics.count('path_cache_hits')
+            # Affiché immédiatement : les calculs plus anciens sont devenus inutiles
+            self.pending_path_request = None
+            self.displayed_request_id = self.path_request_id
+            self.show_dynamic_path(*cached)
+            return
+        request = (self.path_request_id, self.start_point, end_point, cache_key)
+
+        if not self.background_computation:
+            self.show_dynamic_path(*self.compute_path_now(end_point, cache_key))
+            return
+
+        if self.path_task is not None:
+            self.pending_path_request = request
+        else:
+            self.start_path_task(request)
+
+    def start_path_task(self, request):
+        """Lance le calcul d'une demande de chemin dans le gestionnaire de tâches QGIS."""
+        self.path_task = PathComputationTask(self, PathComputation(self), *request)
+        self.active_path_tasks.add(self.path_task)
+        QgsApplication.taskManager().addTask(self.path_task)
+
+    def adopt_search(self, computation):
+        """Reprend la recherche incrémentale d'un calcul si aucun réglage ne l'a invalidée depuis."""
+        if computation.search_generation == self.search_generation:
+            self.incremental_state = computation.search
+
+    def on_path_task_finished(self, task, result):
+        """
+        Reçoit le résultat d'un calcul d'arrière-plan (thread de l'interface).
+
+        Le résultat est ignoré si le point de départ a changé depuis la demande
+        (clic, réinitialisation, tracé libre) ou si un résultat plus récent est
+        déjà affiché ; la demande en attente éventuelle est ensuite lancée. Un
+        calcul en échec est journalisé et efface le chemin dynamique affiché.
+        """
+        if task is self.path_task:
+            self.path_task = None
+        self.adopt_search(task.computation)
+        self.active_path_tasks.discard(task)
+        if not self.active_path_tasks:
+            for reader in self.retired_readers:
+                reader.close()
+            self.retired_readers = []
+
+        if not result:
+            if task.exception is not None:
+                logger.warning("Échec du calcul du tracé assisté : %r", task.exception)
+            if not self.free_draw_mode and task.start_point == self.start_point \
+                    and task.request_id > self.displayed_request_id:
+                self.displayed_request_id = task.request_id
+                self.dynamic_path = None
+                self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
+
+        if result and task.path_geometry and task.cache_key is not None:
+            self.path_cache.put(task.cache_key, (task.path_geometry, task.profile))
+
+        if result and not self.free_draw_mode and task.start_point == self.start_point \
+                and task.request_id > self.displayed_request_id:
+            self.displayed_request_id = task.request_id
+            self.show_dynamic_path(task.path_geometry, task.profile)
+
+        if self.path_task is None and self.pending_path_request is not None:
+            request, self.pending_path_request = self.pending_path_request, None
+            if request[1] == self.start_point:
+                self.start_path_task(request)
+
+    def path_cache_key(self, start_point, end_pixel):
+        """
+        Clé du cache de chemins : pixels du MNT des deux extrémités et réglages
+        dont dépendent le chemin ou son profil.
+
+        Tous les réglages dont dépend le chemin font partie de la clé, y compris
+        le mode et les rayons de la recherche incrémentale : un réglage modifié
+        directement, sans passer par un ``set_*`` qui vide le cache, ne peut pas
+        servir un chemin calculé avec l'ancienne valeur.
+
+        :param end_pixel: Pixel du MNT de l'arrivée.
+        :type end_pixel: tuple
+        :return: Clé, ou None si le MNT ne peut pas être ouvert.
+        :rtype: tuple
+        """
+        if start_point != self.start_pixel_point:
+            self.start_pixel_point = start_point
+            self.start_pixel = self.canvas_to_pixel(start_point)
+        start_pixel = self.start_pixel
+        if start_pixel is None or end_pixel is None:
+            return None
+        simplification = self.simplification_tolerance if self.simplification_enabled else None
+        settings = (self.corridor_min_width, self.corridor_max_width, self.distance_weight, self.sampling_mode,
+                    self.ridge_weight, self.ridge_snap_radius, self.pyramid_min_pixels, simplification,
+                    self.incremental_search, self.incremental_radius, self.incremental_max_radius)
+        return start_pixel, end_pixel, settings
+
+    def show_dynamic_path(self, path_geometry, profile):
+        """Affiche le chemin dynamique calculé et met à jour le profil."""
+        if path_geometry:
+            self.dynamic_path = path_geometry
+            # Afficher la polyligne dynamique
+            self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
+            self.dynamic_rubber_band.addGeometry(self.dynamic_path, None)
+
+            # Mettre à jour le profil d'élévation
+            if self.profile_dock and profile is not None:
+                self.profile_dock.update_profile(*profile)
+        else:
+            self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
+
+    def get_raster_reader(self):
+        """
+        Retourne le lecteur de fenêtres du MNT, ouvert à la première demande.
+
+        :return: Lecteur du raster, ou None si GDAL ne peut pas l'ouvrir.
+        :rtype: RasterWindowReader
+        """
+        if self.raster_reader is None:
+            source = self.raster_layer.dataProvider().dataSourceUri()
+            try:
+                if self.dem_cache_path is not None:
+                    # Les tuiles décodées ne servent plus qu'aux niveaux de pyramide
+                    self.raster_reader = MemmapRasterReader(source, self.dem_cache_path,
+                                                            cache_bytes=self.raster_cache_bytes // 4)
+                else:
+                    self.raster_reader = RasterWindowReader(source, cache_bytes=self.raster_cache_bytes)
+            except IOError:
+                return None
+        return self.raster_reader
+
+    def update_raster_transform(self):
+        """
+        Met à jour la transformation du SCR du canevas vers celui du MNT.
+
+        Lit les paramètres du canevas : à appeler depuis le thread de l'interface.
+        La transformation n'est reconstruite que si l'un des SCR a changé.
+        """
+        raster_crs = self.raster_layer.crs()
+        canvas_crs = self.canvas.mapSettings().destinationCrs()
+        if canvas_crs == self.canvas_crs and raster_crs == self.raster_crs:
+            return
+        # Les polylignes en cache sont exprimées dans l'ancien SCR du canevas
+        self.canvas_crs = canvas_crs
+        self.raster_crs = raster_crs
+        self.path_cache.clear()
+        self.start_pixel_point = None
+        if raster_crs == canvas_crs:
+            self.raster_transform = None
+        else:
+            self.raster_transform = QgsCoordinateTransform(canvas_crs, raster_crs, QgsProject.instance())
+
+    def get_raster_transform(self):
+        """
+        Retourne la transformation du SCR du canevas vers celui du MNT.
+
+        :return: Transformation, ou None si les deux SCR sont identiques.
+        :rtype: QgsCoordinateTransform
+        """
+        return self.raster_transform
+
+    def reset(self):
+        """Réinitialise l'outil en supprimant les éléments temporaires."""
+        self.start_point = None
+        self.dynamic_path = None
+        self.confirmed_polylines = []
+        self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
+        self.confirmed_rubber_band.reset(QgsWkbTypes.LineGeometry)
+        # **Réinitialiser le tracé libre**
+        self.free_draw_rubber_band.reset(QgsWkbTypes.LineGeometry)
+        self.free_draw_cursor_vertex = False
+        self.free_draw_points = []
+        self.free_draw_mode = False
+        # Abandonner les calculs en cours ou en attente
+        self.cancel_pending_move()
+        self.pending_path_request = None
+        if self.path_task is not None:
+            self.path_task.cancel()
+            self.path_task = None
+        # Fermer le raster et libérer le cache de tuiles
+        if self.raster_reader is not None:
+            self.close_reader(self.raster_reader)
+            self.raster_reader = None
+        if self.ridge_index is not None:
+            self.close_reader(self.ridge_index)
+            self.ridge_index = None
+        self.invalidate_search()
+        self.path_cache.clear()
+
+
+class IncrementalSearch:
+    """
+    Champ de coûts d'une recherche incrémentale depuis un point de départ,
+    conservé d'un mouvement de souris à l'autre.
+    """
+
+    def __init__(self, key, origin, radius, field, ridge=None, valid=None):
+        """
+        :param key: Point de départ (x, y) dans le SCR du MNT et réglages des coûts.
+        :type key: tuple
+        :param origin: Colonne et ligne du coin haut-gauche de la région.
+        :type origin: tuple
+        :param radius: Demi-taille de la région, en pixels.
+        :type radius: int
+        :param field: Recherche depuis le pixel de départ.
+        :type field: SingleSourceSearch
+        :param ridge: Index de crêtes de la région, ou None.
+        :type ridge: numpy.ndarray
+        :param valid: Pixels franchissables, pour l'accrochage à la crête.
+        :type valid: numpy.ndarray
+        """
+        self.key = key
+        self.origin = origin
+        self.radius = radius
+        self.field = field
+        self.ridge = ridge
+        self.valid = valid
+
+
+class PathComputation:
+    """
+    Calcul d'un chemin dynamique, exécutable hors du thread de l'interface.
+
+    Construit dans le thread de l'interface, il y copie les réglages de
+    l'outil et prend le lecteur du MNT, l'index de crêtes, la transformation
+    vers le SCR du MNT et l'état de la recherche incrémentale : un réglage
+    modifié pendant le calcul ne l'affecte pas, et le calcul ne lit ni ne
+    modifie l'outil. La recherche incrémentale mise à jour est reprise par
+    l'outil à la fin du calcul.
+    """
+
+    def __init__(self, tool):
+        """
+        :param tool: Outil émettant la demande (thread de l'interface).
+        :type tool: RidgeDrawingTool
+        """
+        self.reader = tool.get_raster_reader()
+        self.ridge_index = tool.ridge_index
+        self.xform = tool.get_raster_transform()
+        self.metrics = tool.metrics
+        self.search = tool.incremental_state
+        self.search_generation = tool.search_generation
+
+        # Réglages de l'outil au moment de la demande
+        self.corridor_min_width = tool.corridor_min_width
+        self.corridor_max_width = tool.corridor_max_width
+        self.search_algorithm = tool.search_algorithm
+        self.distance_weight = tool.distance_weight
+        self.pyramid_levels = tool.pyramid_levels
+        self.pyramid_refine_width = tool.pyramid_refine_width
+        self.pyramid_min_pixels = tool.pyramid_min_pixels
+        self.ridge_weight = tool.ridge_weight
+        self.ridge_snap_radius = tool.ridge_snap_radius
+        self.incremental_search = tool.incremental_search
+        self.incremental_radius = tool.incremental_radius
+        self.incremental_max_radius = tool.incremental_max_radius
+        self.sampling_mode = tool.sampling_mode
+        self.simplification_enabled = tool.simplification_enabled
+        self.simplification_tolerance = tool.simplification_tolerance
+        self.with_profile = tool.profile_dock is not None
+
+    def compute_dynamic_path(self, start_point, end_point):
+        """
+        Calcule le chemin dynamique et son profil d'élévation.
+
+        N'accède ni à l'interface ni à l'outil : peut être exécuté hors du
+        thread principal.
+
+        :return: (polyligne ou None, (distances, altitudes) ou None)
+        :rtype: tuple
+        """
+        with self.metrics.timer('path_total'):
+            path_geometry = self.calculate_highest_path(start_point, end_point)
+            if not path_geometry:
+                return None, None
+            # Altitudes des sommets lues une seule fois, pour la simplification et le profil
+            elevations = self.sample_elevations(path_geometry.asPolyline())
+            # **Appliquer la simplification si activée**
+            if self.simplification_enabled:
+                with self.metrics.timer('simplify'):
+                    path_geometry, elevations = self.simplify_geometry(path_geometry, elevations)
+            profile = None
+            if self.with_profile:
+                with self.metrics.timer('profile'):
+                    profile = self.compute_elevation_profile(path_geometry, elevations)
+        return path_geometry, profile
+
+    def calculate_highest_path(self, start_point, end_point):
+        """Calcul du chemin de plus haute altitude entre deux points dans le buffer."""
+        if self.incremental_search:
+            path_geometry = self.calculate_incremental_path(start_point, end_point)
+            if path_geometry is not None:
+                return path_geometry
+
+        # Travailler dans le SCR du raster
+        xform = self.xform
+        if xform is not None:
+            start_point = xform.transform(start_point)
+            end_point = xform.transform(end_point)
+        start = (start_point.x(), start_point.y())
+        end = (end_point.x(), end_point.y())
+
+        # Accès au raster (jeu de données ouvert une seule fois pour la session)
+        reader = self.reader
+        if reader is None:
+            return None
+        gt = reader.geotransform
+
+        # Recherche multi-résolution pour les grands déplacements
+        drag_pixels = math.hypot(end[0] - start[0], end[1] - start[1]) / abs(gt[1])
+        if self.pyramid_levels > 0 and drag_pixels > self.pyramid_min_pixels:
+            with self.metrics.timer('pyramid_search'):
+                result = coarse_to_fine_path(reader, start, end, self.corridor_max_width,
+                                             self.pyramid_levels, self.pyramid_refine_width,
+                                             self.search_algorithm, self.get_step_cost(reader))
+            if result is None:
+                return None
+            return self.path_to_geometry(reader, *result, xform)
+
+        # Chemin dans le couloir autour du segment départ/arrivée
+        result = highest_path(reader, start, end, self.corridor_min_width, self.search_algorithm,
+                              self.get_step_cost(reader), self.ridge_index, self.ridge_weight,
+                              self.ridge_snap_radius, self.metrics, self.corridor_max_width)
+        if result is None:
+            return None
+
+        # Conversion du chemin en polyligne, ramenée dans le SCR du canevas
+        return self.path_to_geometry(reader, *result, xform)
+
+    def calculate_incremental_path(self, start_point, end_point):
+        """
+        Calcul du chemin de plus haute altitude par recherche incrémentale.
+
+        Le champ de coûts depuis le point de départ est conservé d'un mouvement
+        de souris à l'autre : tant que le curseur reste dans la région déjà
+        chargée, seul le complément d'expansion et la remontée du chemin sont
+        calculés. La région est agrandie lorsque le curseur en sort ; le champ
+        mis à jour remplace ``search``, repris par l'outil en fin de calcul.
+
+        :return: Polyligne, ou None si le curseur est hors de la région maximale.
+        :rtype: QgsGeometry
+        """
+        reader = self.reader
+        if reader is None:
+            return None
+
+        xform = self.xform
+        if xform is not None:
+            start_point = xform.transform(start_point)
+            end_point = xform.transform(end_point)
+        start_col, start_row = (math.floor(v) for v in reader.world_to_pixel(start_point.x(), start_point.y()))
+        end_col, end_row = (math.floor(v) for v in reader.world_to_pixel(end_point.x(), end_point.y()))
+
+        # Le champ n'est réutilisable que pour le même départ et les mêmes coûts
+        key = ((start_point.x(), start_point.y()), self.get_step_cost(reader), self.ridge_weight)
+        needed = max(abs(end_col - start_col), abs(end_row - start_row)) + 2
+        search = self.search
+        if search is None or search.key != key or needed > search.radius:
+            previous = search.radius if search is not None and search.key == key else 0
+            radius = max(self.incremental_radius, 2 * previous, needed)
+            if radius > self.incremental_max_radius:
+                return None
+
+            # Nouvelle région carrée centrée sur le pixel de départ
+            xoff, yoff = start_col - radius, start_row - radius
+            data_array = read_window(reader, xoff, yoff, 2 * radius + 1, 2 * radius + 1, self.metrics)
+            cost, ridge = self.search_cost(data_array, None, xoff, yoff)
+            source = nearest_valid_pixel(~np.isinf(cost), radius, radius)
+            if source is None:
+                return None
+            field = SingleSourceSearch(cost, source, self.get_step_cost(reader))
+            valid = ~np.isinf(cost) if ridge is not None else None
+            search = self.search = IncrementalSearch(key, (xoff, yoff), radius, field, ridge, valid)
+
+        xoff, yoff = search.origin
+        end_node = (end_row - yoff, end_col - xoff)
+        if search.ridge is not None and search.field.contains(*end_node):
+            end_node = snap_to_ridge(search.ridge, search.valid, *end_node, self.ridge_snap_radius)
+        expanded = search.field.expanded
+        with self.metrics.timer('search'):
+            path = search.field.path_to(*end_node)
+        self.metrics.count('nodes_expanded', search.field.expanded - expanded)
+        if path is None:
+            return None
+        return self.path_to_geometry(reader, path, xoff, yoff, xform)
+
+    def path_to_geometry(self, reader, path, xoff, yoff, xform):
+        """
+        Convertit un chemin de pixels d'une fenêtre en polyligne du canevas.
+
+        :param reader: Lecteur du MNT ayant servi au calcul du chemin.
+        :type reader: RasterWindowReader
+        :param path: Pixels (ligne, colonne) relatifs à la fenêtre.
+        :type path: numpy.ndarray
+        :param xoff: Colonne du coin haut-gauche de la fenêtre dans le raster.
+        :type xoff: int
+        :param yoff: Ligne du coin haut-gauche de la fenêtre dans le raster.
+        :type yoff: int
+        :param xform: Transformation canevas vers raster, ou None.
+        :type xform: QgsCoordinateTransform
+        :rtype: QgsGeometry
+        """
+        xy = path_points(reader, path, xoff, yoff)
+        geometry = QgsGeometry.fromPolylineXY([QgsPointXY(x, y) for x, y in xy.tolist()])
+        if xform is not None:
+            geometry.transform(xform, QgsCoordinateTransform.ReverseTransform)
+        return geometry
+
+    def get_step_cost(self, reader):
+        """Coût par pixel parcouru correspondant à ``distance_weight``."""
+        return self.distance_weight * abs(reader.geotransform[1])
+
+    def search_cost(self, data_array, mask, xoff, yoff):
+        """
+        Grille de coûts d'une fenêtre du MNT pour la recherche de crête.
+
+        Si un index de crêtes est chargé, son coût pondéré par ``ridge_weight``
+        s'ajoute au coût d'altitude.
+
+        :return: (coûts, index de crêtes de la fenêtre ou None)
+        :rtype: tuple
+        """
+        return search_cost(data_array, mask, xoff, yoff, self.ridge_index, self.ridge_weight, self.metrics)
+
+    def sample_elevations(self, points):
+        """
+        Échantillonne le MNT en une liste de points du canevas.
+
+        Les points sont reprojetés en une seule opération puis lus depuis le
+        cache de tuiles du lecteur raster.
+
+        :param points: Points dans le SCR du canevas.
+        :type points: list of QgsPointXY
+        :return: Altitudes, NaN hors du raster ou sur nodata.
+        :rtype: numpy.ndarray
+        """
+        reader = self.reader
+        if reader is None or not points:
+            return np.full(len(points), np.nan)
+
+        xform = self.xform
+        if xform is not None:
+            multipoint = QgsGeometry.fromMultiPointXY(points)
+            multipoint.transform(xform)
+            points = multipoint.asMultiPoint()
+
+        with self.metrics.timer('sampling'):
+            xs = np.fromiter((point.x() for point in points), dtype=np.float64, count=len(points))
+            ys = np.fromiter((point.y() for point in points), dtype=np.float64, count=len(points))
+            return reader.sample(xs, ys, self.sampling_mode)
+
+    def simplify_geometry(self, geometry, elevations=None):
+        """
+        Simplifie la géométrie tout en préservant, dans l'ordre, les sommets
+        locaux du profil d'altitude.
+
+        Un sommet local domine les points de la polyligne situés à moins de
+        ``simplification_tolerance`` de part et d'autre.
+
+        :param elevations: Altitudes des sommets de la polyligne, lues si absentes.
+        :type elevations: numpy.ndarray
+        :return: (polyligne simplifiée, altitudes de ses sommets)
+        :rtype: tuple
+        """
+        points = geometry.asPolyline()
+        if elevations is None:
+            elevations = self.sample_elevations(points)
+        if len(points) <= 2:
+            return geometry, elevations
+
+        xy = np.array([(point.x(), point.y()) for point in points])
+        keep = simplify_path(xy, elevations, self.simplification_tolerance)
+        simplified_geometry = QgsGeometry.fromPolylineXY([points[i] for i in keep.tolist()])
+        return simplified_geometry, elevations[keep]
+
+    def compute_elevation_profile(self, geometry, elevations=None):
+        """
+        Extrait les distances cumulées et les altitudes le long de la polyligne.
+
+        :param elevations: Altitudes des sommets déjà lues, ou None pour les lire.
+        :type elevations: numpy.ndarray
+
+        :return: (distances, altitudes), ou None pour une géométrie vide.
+        :rtype: tuple
+        """
+        points = geometry.asPolyline()
+        if not points:
+            return None
+
+        # Altitudes de tous les sommets en une seule lecture
+        if elevations is None:
+            elevations = self.sample_elevations(points)
+        xy = np.array([(point.x(), point.y()) for point in points])
+        return elevation_profile(xy, elevations)
+
+
+class TalwegDrawingTool(QgsMapTool):
+    """
+    Outil de tracé de talweg : suit vers l'aval les directions d'écoulement
+    précalculées du MNT depuis le point survolé, et confirme le tracé au clic.
+    """
+
+    def __init__(self, canvas, raster_layer):
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.raster_layer = raster_layer
+        self.flow_grids = None
+        self.confirmed_polylines = []
+        # Rayon d'accrochage au talweg le plus proche du curseur, en pixels
+        self.snap_radius = 3
+
+        raster_crs = self.raster_layer.crs()
+        canvas_crs = self.canvas.mapSettings().destinationCrs()
+        if raster_crs == canvas_crs:
+            self.raster_transform = None
+        else:
+            self.raster_transform = QgsCoordinateTransform(canvas_crs, raster_crs, QgsProject.instance())
+
+        # Rubber band pour le talweg survolé
+        self.dynamic_rubber_band = QgsRubberBand(self.canvas, QgsWkbTypes.LineGeometry)
+        self.dynamic_rubber_band.setColor(QColor(0, 160, 255))
+        self.dynamic_rubber_band.setWidth(3)
+        self.dynamic_rubber_band.setLineStyle(Qt.DashLine)
+
+        # Rubber band pour les talwegs confirmés
+        self.confirmed_rubber_band = QgsRubberBand(self.canvas, QgsWkbTypes.LineGeometry)
+        self.confirmed_rubber_band.setColor(QColor(0, 0, 220))
+        self.confirmed_rubber_band.setWidth(3)
+
+    def set_flow_grids(self, path):
+        """
+        Charge les grilles d'écoulement du MNT.
+
+        :param path: Répertoire produit par ``build_flow_grids``.
+        :type path: str
+        """
+        self.flow_grids = FlowGrids(path)
+
+    def canvasMoveEvent(self, event):
+        """Affiche le talweg issu du point survolé."""
+        geometry = self.trace_from(self.toMapCoordinates(event.pos()))
+        if geometry is None:
+            self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
+        else:
+            self.dynamic_rubber_band.setToGeometry(geometry, None)
+
+    def canvasPressEvent(self, event):
+        """Confirme le talweg issu du point cliqué."""
+        if self.flow_grids is None:
+            QMessageBox.information(None, "Information", "Calcul des directions d'écoulement en cours.")
+            return
+        geometry = self.trace_from(self.toMapCoordinates(event.pos()))
+        if geometry is None:
+            return
+        self.confirmed_polylines.append(geometry)
+        self.confirmed_rubber_band.addGeometry(geometry, None)
+
+    def trace_from(self, map_point):
+        """
+        Talweg issu d'un point du canevas, jusqu'au bord du MNT.
+
+        :param map_point: Point dans le SCR du canevas.
+        :type map_point: QgsPointXY
+        :return: Polyligne dans le SCR du canevas, ou None hors du MNT.
+        :rtype: QgsGeometry
+        """
+        grids = self.flow_grids
+        if grids is None:
+            return None
+        point = QgsPointXY(map_point)
+        if self.raster_transform is not None:
+            point = self.raster_transform.transform(point)
+        col, row = grids.world_to_pixel(point.x(), point.y())
+        row, col = int(math.floor(row)), int(math.floor(col))
+        if not grids.contains(row, col):
+            return None
+        row, col = grids.snap_to_channel(row, col, self.snap_radius)
+        path = grids.trace_downstream(row, col)
+        if len(path) < 2:
+            return None
+
+        xs, ys = grids.pixel_to_world(path[:, 1] + 0.5, path[:, 0] + 0.5)
+        geometry = QgsGeometry.fromPolylineXY([QgsPointXY(x, y) for x, y in zip(xs.tolist(), ys.tolist())])
+        if self.raster_transform is not None:
+            geometry.transform(self.raster_transform, QgsCoordinateTransform.ReverseTransform)
+        return geometry
+
+    def reset(self):
+        """Réinitialise l'outil en supprimant les éléments temporaires."""
+        self.confirmed_polylines = []
+        self.dynamic_rubber_band.reset(QgsWkbTypes.LineGeometry)
+        self.confirmed_rubber_band.reset(QgsWkbTypes.LineGeometry)
+        self.flow_grids = None
@@ -0,0 +1,213 @@
+"""
+tasks.py
+
+Tâches d'arrière-plan du plugin, exécutées par le gestionnaire de tâches QGIS.
+"""
+
+from qgis.core import QgsTask
+
+from .terrain.dem_cache import build_dem_cache
+from .terrain.hillshade import build_hillshade
+from .terrain.hydrology import build_flow_grids
+from .terrain.mosaic import build_mosaic
+from .terrain.overviews import build_overviews, needs_overviews
+from .terrain.ridge_index import build_ridge_index
+
+
+class MosaicTask(QgsTask):
+    """
+    Tâche d'arrière-plan construisant (ou retrouvant en cache) la mosaïque VRT des dalles.
+    """
+
+    def __init__(self, sources):
+        super().__init__("Mosaïque MNT", QgsTask.CanCancel)
+        self.sources = sources
+        self.mosaic_path = None
+        self.exception = None
+
+    def run(self):
+        """Construction de la mosaïque (thread de travail)."""
+        try:
+            self.mosaic_path = build_mosaic(self.sources, progress=self.setProgress,
+                                            is_canceled=self.isCanceled)
+        except (IOError, OSError, RuntimeError) as e:
+            self.exception = e
+            return False
+        return self.mosaic_path is not None
+
+
+class HillshadeTask(QgsTask):
+    """
+    Tâche d'arrière-plan calculant (ou retrouvant en cache) l'ombrage d'un MNT
+    avec le moteur NumPy.
+    """
+
+    def __init__(self, source, params):
+        """
+        :param params: Paramètres d'ombrage (``hillshade_params`` du plugin).
+        :type params: dict
+        """
+        super().__init__("Ombrage", QgsTask.CanCancel)
+        self.source = source
+        self.params = params
+        self.hillshade_path = None
+        self.exception = None
+
+    def run(self):
+        """Calcul de l'ombrage (thread de travail)."""
+        params = self.params
+        try:
+            self.hillshade_path = build_hillshade(self.source, params['BAND'], z_factor=params['Z_FACTOR'],
+                                                  azimuth=params['AZIMUTH'], altitude=params['ALTITUDE'],
+                                                  multidirectional=params['MULTIDIRECTIONAL'],
+                                                  progress=self.setProgress, is_canceled=self.isCanceled)
+        except (IOError, OSError, RuntimeError) as e:
+            self.exception = e
+            return False
+        return self.hillshade_path is not None
+
+
+class OverviewTask(QgsTask):
+    """
+    Tâche d'arrière-plan construisant les aperçus manquants d'un ensemble de rasters.
+    """
+
+    def __init__(self, sources):
+        """
+        :param sources: Identifiants des couches, par chemin de raster.
+        :type sources: dict
+        """
+        super().__init__("Aperçus raster", QgsTask.CanCancel)
+        self.sources = sources
+        self.built = []
+        self.exception = None
+
+    def run(self):
+        """Construction des aperçus (thread de travail)."""
+        pending = [source for source in self.sources if needs_overviews(source)]
+        for done, source in enumerate(pending):
+            def progress(value, done=done):
+                self.setProgress((done + value / 100.0) * 100.0 / len(pending))
+            try:
+                if not build_overviews(source, progress=progress, is_canceled=self.isCanceled):
+                    return False
+            except (IOError, OSError, RuntimeError) as e:
+                self.exception = e
+                return False
+            self.built.append(source)
+        return True
+
+
+class DemCacheTask(QgsTask):
+    """
+    Tâche d'arrière-plan convertissant (ou retrouvant en cache) le MNT en
+    tableau projetable en mémoire.
+    """
+
+    def __init__(self, source, cache_dir, max_bytes):
+        super().__init__("Cache MNT", QgsTask.CanCancel)
+        self.source = source
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache_path = None
+        self.too_large = False
+        self.exception = None
+
+    def run(self):
+        """Conversion du MNT (thread de travail)."""
+        try:
+            self.cache_path = build_dem_cache(self.source, cache_dir=self.cache_dir, max_bytes=self.max_bytes,
+                                              progress=self.setProgress, is_canceled=self.isCanceled)
+        except (IOError, OSError, RuntimeError) as e:
+            self.exception = e
+            return False
+        self.too_large = self.cache_path is None and not self.isCanceled()
+        return self.cache_path is not None
+
+
+class RidgeIndexTask(QgsTask):
+    """
+    Tâche d'arrière-plan calculant (ou retrouvant en cache) l'index de crêtes d'un MNT.
+    """
+
+    def __init__(self, source, radius=15):
+        super().__init__("Index de crêtes", QgsTask.CanCancel)
+        self.source = source
+        self.radius = radius
+        self.index_path = None
+        self.exception = None
+
+    def run(self):
+        """Calcul de l'index (thread de travail)."""
+        try:
+            self.index_path = build_ridge_index(self.source, self.radius, progress=self.setProgress,
+                                                is_canceled=self.isCanceled)
+        except (IOError, OSError, RuntimeError) as e:
+            self.exception = e
+            return False
+        return self.index_path is not None
+
+
+class FlowGridsTask(QgsTask):
+    """
+    Tâche d'arrière-plan calculant (ou retrouvant en cache) les grilles
+    d'écoulement d'un MNT.
+    """
+
+    def __init__(self, source):
+        super().__init__("Directions d'écoulement", QgsTask.CanCancel)
+        self.source = source
+        self.grids_path = None
+        self.exception = None
+
+    def run(self):
+        """Calcul des grilles (thread de travail)."""
+        try:
+            self.grids_path = build_flow_grids(self.source, progress=self.setProgress,
+                                               is_canceled=self.isCanceled)
+        except (IOError, OSError, RuntimeError) as e:
+            self.exception = e
+            return False
+        return self.grids_path is not None
+
+
+class PathComputationTask(QgsTask):
+    """
+    Tâche d'arrière-plan calculant le chemin dynamique d'une demande.
+    """
+
+    def __init__(self, tool, computation, request_id, start_point, end_point, cache_key=None):
+        """
+        :param tool: Outil ayant émis la demande, qui reçoit le résultat.
+        :type tool: RidgeDrawingTool
+        :param computation: Calcul préparé dans le thread de l'interface.
+        :type computation: PathComputation
+        :param request_id: Numéro croissant de la demande.
+        :type request_id: int
+        :param cache_key: Clé sous laquelle conserver le résultat, ou None.
+        :type cache_key: tuple
+        """
+        super().__init__("Tracé assisté", QgsTask.CanCancel | getattr(QgsTask, 'Hidden', 0))
+        self.tool = tool
+        self.computation = computation
+        self.request_id = request_id
+        self.start_point = start_point
+        self.end_point = end_point
+        self.cache_key = cache_key
+        self.path_geometry = None
+        self.profile = None
+        self.exception = None
+
+    def run(self):
+        """Calcul du chemin (thread de travail) : seul ``computation`` est utilisé."""
+        try:
+            self.path_geometry, self.profile = self.computation.compute_dynamic_path(self.start_point,
+                                                                                     self.end_point)
+        except Exception as e:
+            self.exception = e
+            return False
+        return not self.isCanceled()
+
+    def finished(self, result):
+        """Transmission du résultat à l'outil (thread de l'interface)."""
+        self.tool.on_path_task_finished(self, result)
@@ -0,0 +1,11 @@
+"""
+terrain
+
+Algorithmes de terrain (recherche de chemin, accès raster, échantillonnage)
+travaillant directement sur des tableaux NumPy, sans dépendance à QGIS.
+
+Le module :mod:`.ridge_path` regroupe la chaîne du tracé assisté (fenêtre du
+couloir, coûts, recherche, profil, simplification) appelée par l'outil de
+tracé ; :mod:`.benchmark` la mesure sur des MNT synthétiques en ligne de
+commande (``python -m terrain.benchmark``).
+"""
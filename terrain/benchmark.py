@@ -0,0 +1,303 @@
+"""
+benchmark.py
+
+Banc de mesure de la chaîne du tracé assisté sur des MNT synthétiques, hors
+de QGIS : pour chaque relief et chaque taille, des tracés de longueurs
+variées sont calculés et chaque étape (lecture, coûts, recherche, points,
+échantillonnage, simplification, profil) est chronométrée. Une seconde passe
+sous ``tracemalloc`` mesure le pic de mémoire allouée par étape.
+
+Avec ``--imports``, le banc mesure plutôt le temps d'import du plugin au
+démarrage de QGIS et des modules chargés à la première utilisation des
+outils, chacun dans un interpréteur neuf où QGIS est déjà importé.
+
+Utilisation depuis le répertoire du plugin ::
+
+    python -m terrain.benchmark --sizes 512 2048 --kinds ridge holes --requests 100
+    python -m terrain.benchmark --imports --import-budget 50
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from .metrics import Metrics
+from .path_engine import ASTAR, BIDIRECTIONAL, DIJKSTRA
+from .raster_window import ArrayRasterReader
+from .ridge_path import elevation_profile, highest_path, path_points, simplify_path
+from .sampling import NEAREST
+from .synthetic import KINDS, synthetic_dem
+
+# Taille de pixel des MNT synthétiques, en mètres
+PIXEL_SIZE = 1.0
+# Étapes rapportées, dans l'ordre de la chaîne
+STAGES = ('read', 'cost', 'search', 'points', 'sampling', 'simplify', 'profile', 'total')
+
+# Répertoire du plugin (paquet Python chargé par QGIS)
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules du plugin chargés à la première utilisation des outils
+DEFERRED_MODULES = ('tasks', 'map_tools', 'docks')
+# Dépendances lourdes dont l'import est différé
+HEAVY_DEPENDENCIES = ('numpy', 'osgeo.gdal', 'matplotlib.backends.backend_qt5agg')
+# Mesure du temps d'import d'un module, QGIS étant déjà chargé comme dans l'application
+_IMPORT_SCRIPT = """
+import sys, time
+for name in ('qgis.core', 'qgis.gui', 'qgis.PyQt.QtWidgets'):
+    try:
+        __import__(name)
+    except ImportError:
+        pass
+t0 = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - t0)
+"""
+
+
+class MemoryMetrics(Metrics):
+    """
+    Mesures enregistrant, au lieu des durées, le pic de mémoire allouée par
+    étape (en octets), lu par ``tracemalloc``. Les étapes ne doivent pas être
+    imbriquées.
+    """
+
+    def __init__(self):
+        super().__init__(enabled=True)
+        self.peaks = {}
+
+    def timer(self, stage):
+        return _MemoryProbe(self, stage)
+
+
+class _MemoryProbe:
+    """Pic de mémoire allouée pendant un bloc, relatif à l'entrée dans le bloc."""
+
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        tracemalloc.reset_peak()
+        self.start = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc):
+        peak = tracemalloc.get_traced_memory()[1] - self.start
+        self.metrics.peaks[self.stage] = max(self.metrics.peaks.get(self.stage, 0), peak)
+        return False
+
+
+def snap_to_summit(dem, row, col, radius):
+    """Pixel le plus haut à moins de ``radius`` pixels (carré) de (row, col), comme un clic sur une crête."""
+    r0, c0 = max(int(row) - radius, 0), max(int(col) - radius, 0)
+    window = np.nan_to_num(dem[r0:int(row) + radius + 1, c0:int(col) + radius + 1], nan=-np.inf)
+    r, c = np.unravel_index(np.argmax(window), window.shape)
+    return r0 + r + 0.5, c0 + c + 0.5
+
+
+def drag_requests(dem, count, max_drag, seed=0, snap=0):
+    """
+    Couples (départ, arrivée) de tracés, en coordonnées du MNT synthétique.
+
+    Les départs sont tirés dans la moitié centrale du MNT et les longueurs
+    uniformément entre 10 pixels et ``max_drag``. Avec ``snap`` > 0, les
+    extrémités sont ramenées au point le plus haut à moins de ``snap`` pixels,
+    comme lorsque l'utilisateur suit une crête.
+
+    :rtype: list of tuple
+    """
+    rows, cols = dem.shape
+    rng = np.random.default_rng(seed)
+    requests = []
+    for _ in range(count):
+        start = rng.uniform((rows / 4, cols / 4), (3 * rows / 4, 3 * cols / 4))
+        angle = rng.uniform(0, 2 * np.pi)
+        length = rng.uniform(10, max_drag)
+        end = np.clip(start + length * np.array([np.sin(angle), np.cos(angle)]), 0, (rows - 1, cols - 1))
+        points = (start, end)
+        if snap > 0:
+            points = [snap_to_summit(dem, r, c, snap) for r, c in points]
+        # Pixel (ligne, colonne) -> (x, y) avec la géotransformation du banc
+        requests.append(tuple((c * PIXEL_SIZE, -r * PIXEL_SIZE) for r, c in points))
+    return requests
+
+
+def run_request(reader, start, end, args, metrics=None):
+    """Exécute la chaîne complète du tracé pour un déplacement."""
+    metrics = metrics or Metrics()
+    result = highest_path(reader, start, end, args.corridor, args.algorithm,
+                          args.step_cost * PIXEL_SIZE, metrics=metrics, max_width=args.max_corridor)
+    if result is None:
+        return
+    with metrics.timer('points'):
+        xy = path_points(reader, *result)
+    with metrics.timer('sampling'):
+        elevations = reader.sample(xy[:, 0], xy[:, 1], NEAREST)
+    with metrics.timer('simplify'):
+        keep = simplify_path(xy, elevations, args.tolerance)
+    with metrics.timer('profile'):
+        elevation_profile(xy[keep], elevations[keep])
+
+
+def benchmark(kind, size, args):
+    """
+    Mesure la chaîne du tracé sur un MNT synthétique carré de côté ``size``.
+
+    :return: Ligne de résultats : durées par étape, compteurs et pics mémoire.
+    :rtype: dict
+    """
+    dem = synthetic_dem(kind, (size, size), args.seed)
+    geotransform = (0.0, PIXEL_SIZE, 0.0, 0.0, 0.0, -PIXEL_SIZE)
+    requests = drag_requests(dem, args.requests, min(args.max_drag, size / 2), args.seed, args.snap)
+
+    # Latences : cache de tuiles chaud comme lors d'un tracé interactif
+    reader = ArrayRasterReader(dem, geotransform)
+    metrics = Metrics(enabled=True, window=len(requests))
+    for start, end in requests:
+        t0 = time.perf_counter()
+        run_request(reader, start, end, args, metrics)
+        metrics.record('total', time.perf_counter() - t0)
+    summary = metrics.summary()
+    reader.close()
+
+    # Mémoire : quelques tracés sous tracemalloc, cache de tuiles froid. Le pic
+    # de la chaîne complète est mesuré à part, les sondes d'étape le réinitialisant.
+    memory = MemoryMetrics()
+    tracemalloc.start()
+    try:
+        reader = ArrayRasterReader(dem, geotransform)
+        with memory.timer('total'):
+            for start, end in requests[:args.memory_requests]:
+                run_request(reader, start, end, args, None)
+        reader.close()
+        reader = ArrayRasterReader(dem, geotransform)
+        for start, end in requests[:args.memory_requests]:
+            run_request(reader, start, end, args, memory)
+        reader.close()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'kind': kind,
+        'size': size,
+        'requests': len(requests),
+        'dem_mb': dem.nbytes / 1024 ** 2,
+        'stages': summary['stages'],
+        'counters': summary['counters'],
+        'peak_mb': {stage: peak / 1024 ** 2 for stage, peak in memory.peaks.items()},
+    }
+
+
+def import_time(module, repeat=5):
+    """
+    Temps médian d'import d'un module dans un interpréteur neuf.
+
+    :param module: Nom complet du module, importable depuis le répertoire parent du plugin.
+    :type module: str
+    :return: (durée en millisecondes ou None, message d'erreur ou None)
+    :rtype: tuple
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (os.path.dirname(PLUGIN_DIR), env.get('PYTHONPATH'))))
+    times = []
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT, module],
+                                 capture_output=True, text=True, env=env)
+        if process.returncode != 0:
+            lines = process.stderr.strip().splitlines()
+            return None, lines[-1] if lines else f"code {process.returncode}"
+        times.append(1000 * float(process.stdout.strip().splitlines()[-1]))
+    return float(np.median(times)), None
+
+
+def import_report(budget_ms, repeat=5):
+    """
+    Affiche les temps d'import du plugin et de ses modules différés.
+
+    :param budget_ms: Temps d'import maximal du chargement du plugin, en millisecondes.
+    :type budget_ms: float
+    :return: True si le chargement du plugin respecte le budget.
+    :rtype: bool
+    """
+    package = os.path.basename(PLUGIN_DIR)
+    plugin = f"{package}.assist_mnt"
+    modules = [plugin] + [f"{package}.{name}" for name in DEFERRED_MODULES] + list(HEAVY_DEPENDENCIES)
+    within_budget = True
+    print(f"{'module':<45} {'ms':>9}")
+    for module in modules:
+        ms, error = import_time(module, repeat)
+        if ms is None:
+            print(f"{module:<45} {'-':>9}  indisponible : {error}")
+            within_budget = within_budget and module != plugin
+            continue
+        note = ''
+        if module == plugin:
+            within_budget = ms <= budget_ms
+            note = f"  budget {budget_ms:.0f} ms : {'respecté' if within_budget else 'DÉPASSÉ'}"
+        print(f"{module:<45} {ms:>9.1f}{note}")
+    return within_budget
+
+
+def print_report(rows):
+    """Affiche un tableau par MNT : centiles de latence et pic mémoire par étape."""
+    for row in rows:
+        counters = row['counters']
+        print(f"\n{row['kind']} {row['size']}x{row['size']} ({row['dem_mb']:.1f} Mo, "
+              f"{row['requests']} tracés, {counters.get('pixels_read', 0) / row['requests']:.0f} pixels lus "
+              f"et {counters.get('nodes_expanded', 0) / row['requests']:.0f} pixels développés par tracé, "
+              f"{counters.get('corridor_widenings', 0)} élargissements du couloir)")
+        print(f"  {'étape':<10} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'pic Mo':>9}")
+        for stage in STAGES:
+            stats = row['stages'].get(stage)
+            if stats is None:
+                continue
+            peak = row['peak_mb'].get(stage)
+            peak = f"{peak:>9.2f}" if peak is not None else f"{'-':>9}"
+            print(f"  {stage:<10} {stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} "
+                  f"{stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f} {peak}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de mesure du tracé assisté sur MNT synthétiques")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[512, 2048], help="côtés des MNT en pixels")
+    parser.add_argument('--kinds', nargs='+', default=sorted(KINDS), choices=sorted(KINDS),
+                        help="reliefs synthétiques")
+    parser.add_argument('--requests', type=int, default=100, help="nombre de tracés par MNT")
+    parser.add_argument('--memory-requests', type=int, default=10,
+                        help="nombre de tracés de la passe mémoire")
+    parser.add_argument('--max-drag', type=float, default=300, help="longueur maximale d'un tracé, en pixels")
+    parser.add_argument('--snap', type=int, default=15,
+                        help="rayon, en pixels, d'accrochage des extrémités au point le plus haut (0 : aucun)")
+    parser.add_argument('--corridor', type=float, default=6, help="demi-largeur initiale du couloir, en mètres")
+    parser.add_argument('--max-corridor', type=float, default=80,
+                        help="demi-largeur maximale du couloir, en mètres (égale à --corridor : couloir fixe)")
+    parser.add_argument('--algorithm', default=ASTAR, choices=[DIJKSTRA, ASTAR, BIDIRECTIONAL])
+    parser.add_argument('--step-cost', type=float, default=0.0, help="coût par mètre parcouru")
+    parser.add_argument('--tolerance', type=float, default=2.0, help="tolérance de simplification, en mètres")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="fichier où écrire les résultats détaillés")
+    parser.add_argument('--imports', action='store_true',
+                        help="mesurer les temps d'import du plugin au lieu du tracé")
+    parser.add_argument('--import-budget', type=float, default=50,
+                        help="temps d'import maximal du chargement du plugin, en millisecondes")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        sys.exit(0 if import_report(args.import_budget) else 1)
+
+    rows = [benchmark(kind, size, args) for size in args.sizes for kind in args.kinds]
+    print_report(rows)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
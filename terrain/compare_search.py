@@ -0,0 +1,86 @@
+"""
+compare_search.py
+
+Comparaison des algorithmes de recherche de chemin sur des MNT synthétiques :
+nombre de pixels développés, temps de calcul et égalité du chemin avec
+Dijkstra (implémentation de référence).
+
+Utilisation depuis le répertoire du plugin ::
+
+    python -m terrain.compare_search --size 400 --step-cost 0.5
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from .corridor import corridor_mask
+from .path_engine import ASTAR, BIDIRECTIONAL, DIJKSTRA, elevation_cost, search_path
+from .synthetic import ridge_dem
+
+
+def path_cost(cost, path, step_cost):
+    """Coût total d'un chemin de pixels selon le modèle du moteur."""
+    steps = np.hypot(*np.diff(path, axis=0).T)
+    return float(cost[path[1:, 0], path[1:, 1]].sum() + step_cost * steps.sum())
+
+
+def compare(cost, start, end, step_cost=0.0):
+    """
+    Exécute chaque algorithme sur le même problème.
+
+    :return: Une ligne de résultats par algorithme.
+    :rtype: list of dict
+    """
+    results = []
+    reference = None
+    for algorithm in (DIJKSTRA, ASTAR, BIDIRECTIONAL):
+        t0 = time.perf_counter()
+        path, expanded = search_path(cost, start, end, algorithm, step_cost)
+        elapsed = time.perf_counter() - t0
+        total = path_cost(cost, path, step_cost) if path is not None else None
+        if reference is None:
+            reference = (path, total)
+        results.append({
+            'algorithm': algorithm,
+            'ms': elapsed * 1000,
+            'expanded': expanded,
+            'cost': total,
+            'same_path': path is not None and reference[0] is not None
+                         and np.array_equal(path, reference[0]),
+            'same_cost': total is not None and reference[1] is not None
+                         and np.isclose(total, reference[1]),
+        })
+    return results
+
+
+def scenarios(size, seed):
+    """Problèmes de test : segment long dans un couloir de 20 pixels, diagonale sans couloir."""
+    dem = ridge_dem((size, size), seed)
+    crest_row = size // 2
+    start, end = (crest_row, 0), (crest_row, size - 1)
+    mask = corridor_mask(dem.shape, (0, 0), (1, 1), (0.5, crest_row + 0.5),
+                         (size - 0.5, crest_row + 0.5), 20)
+    yield 'couloir', elevation_cost(dem, mask), start, end
+    yield 'diagonale', elevation_cost(dem), (size // 4, 0), (3 * size // 4, size - 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comparaison des algorithmes de recherche de chemin")
+    parser.add_argument('--size', type=int, default=400, help="côté du MNT en pixels")
+    parser.add_argument('--step-cost', type=float, default=0.0, help="coût par pixel parcouru")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'scénario':<10} {'algorithme':<14} {'ms':>8} {'développés':>11} "
+          f"{'coût':>12} {'même chemin':>12} {'même coût':>10}")
+    for name, cost, start, end in scenarios(args.size, args.seed):
+        for row in compare(cost, start, end, args.step_cost):
+            total = f"{row['cost']:.3f}" if row['cost'] is not None else '-'
+            print(f"{name:<10} {row['algorithm']:<14} {row['ms']:>8.1f} {row['expanded']:>11} "
+                  f"{total:>12} {str(row['same_path']):>12} {str(row['same_cost']):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+corridor.py
+
+Masque du couloir de recherche autour du segment départ/arrivée.
+"""
+
+import numpy as np
+
+
+def segment_distance(shape, origin, pixel_size, start, end):
+    """
+    Distance de chaque centre de pixel d'une fenêtre au segment [start, end].
+
+    :param shape: Dimensions (lignes, colonnes) de la fenêtre.
+    :type shape: tuple
+    :param origin: Coordonnées (x, y) du coin haut-gauche de la fenêtre.
+    :type origin: tuple
+    :param pixel_size: Taille de pixel (x, y), y négatif pour un raster nord en haut.
+    :type pixel_size: tuple
+    :param start: Extrémité (x, y) du segment.
+    :type start: tuple
+    :param end: Extrémité (x, y) du segment.
+    :type end: tuple
+    :return: Distances, dans l'unité des coordonnées.
+    :rtype: numpy.ndarray
+    """
+    rows, cols = shape
+    xs = origin[0] + (np.arange(cols) + 0.5) * pixel_size[0]
+    ys = origin[1] + (np.arange(rows) + 0.5) * pixel_size[1]
+    px = xs[np.newaxis, :] - start[0]
+    py = ys[:, np.newaxis] - start[1]
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        return np.hypot(px, py)
+    # Projection du centre de pixel sur le segment, bornée à ses extrémités
+    t = np.clip((px * dx + py * dy) / length2, 0.0, 1.0)
+    return np.hypot(px - t * dx, py - t * dy)
+
+
+def corridor_mask(shape, origin, pixel_size, start, end, width):
+    """
+    Pixels dont le centre est à moins de ``width`` du segment [start, end].
+
+    Équivalent raster du test ``buffer(width).contains(centre)`` sur la ligne
+    départ/arrivée (extrémités arrondies).
+
+    :return: Masque booléen de la fenêtre.
+    :rtype: numpy.ndarray
+    """
+    return segment_distance(shape, origin, pixel_size, start, end) < width
+
+
+def dilate(mask, radius):
+    """
+    Dilatation d'un masque par un carré de demi-côté ``radius`` pixels.
+
+    Calculée par sommes glissantes le long de chaque axe, en temps linéaire
+    quel que soit le rayon.
+
+    :rtype: numpy.ndarray
+    """
+    if radius <= 0:
+        return mask.copy()
+    out = mask
+    for axis in (0, 1):
+        counts = np.cumsum(out, axis=axis, dtype=np.int32)
+        n = out.shape[axis]
+        upper = np.take(counts, np.minimum(np.arange(n) + radius, n - 1), axis=axis)
+        lower_index = np.arange(n) - radius - 1
+        lower = np.take(counts, np.maximum(lower_index, 0), axis=axis)
+        shape = [1, 1]
+        shape[axis] = n
+        lower = np.where((lower_index >= 0).reshape(shape), lower, 0)
+        out = (upper - lower) > 0
+    return out
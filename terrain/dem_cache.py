@@ -0,0 +1,143 @@
+"""
+dem_cache.py
+
+Copie décompressée d'un MNT, projetée en mémoire, pour la recherche de chemin
+sur de très grands rasters.
+
+Le MNT est converti une fois en tableau ``.npy`` float32 (NaN pour nodata) ;
+les fenêtres entièrement contenues dans le raster sont ensuite des vues NumPy
+sur ce tableau, sans décodage ni allocation. Le nom du cache dépend de la date
+de modification et de la taille du MNT source : une modification du MNT
+invalide automatiquement le cache.
+"""
+
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from .raster_window import RasterWindowReader
+from .sidecar import remove_stale, sidecar_path
+
+SIDECAR_TAG = 'dem'
+# Taille maximale d'un cache, en octets
+DEFAULT_MAX_BYTES = 8 * 1024 ** 3
+# Hauteur des bandes de lignes copiées en une fois
+BUILD_STRIP = 512
+
+
+def dem_cache_path(source, band=1, cache_dir=None):
+    """
+    Chemin du cache projeté en mémoire associé à un MNT.
+
+    :rtype: str
+    """
+    return sidecar_path(source, SIDECAR_TAG, str(band), cache_dir, extension='.npy')
+
+
+def build_dem_cache(source, band=1, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES,
+                    progress=None, is_canceled=None):
+    """
+    Convertit un MNT en tableau ``.npy`` projetable en mémoire, ou retourne le
+    cache existant.
+
+    :param source: Chemin du MNT.
+    :type source: str
+    :param band: Numéro de la bande des altitudes.
+    :type band: int
+    :param cache_dir: Répertoire du cache (à côté du MNT par défaut).
+    :type cache_dir: str
+    :param max_bytes: Taille maximale du cache ; au-delà, aucun cache n'est créé.
+    :type max_bytes: int
+    :param progress: Fonction recevant l'avancement en pourcentage.
+    :type progress: function
+    :param is_canceled: Fonction indiquant si la conversion doit être interrompue.
+    :type is_canceled: function
+    :return: Chemin du cache, ou None si le MNT dépasse ``max_bytes`` ou si la
+        conversion a été interrompue.
+    :rtype: str
+    """
+    path = dem_cache_path(source, band, cache_dir)
+    if os.path.exists(path):
+        return path
+    # Les caches d'une version antérieure du MNT sont obsolètes
+    remove_stale(path)
+
+    reader = RasterWindowReader(source, band, cache_bytes=0)
+    try:
+        if reader.width * reader.height * np.dtype(np.float32).itemsize > max_bytes:
+            return None
+        partial = path + '.partial'
+        array = open_memmap(partial, mode='w+', dtype=np.float32, shape=(reader.height, reader.width))
+        for y in range(0, reader.height, BUILD_STRIP):
+            if is_canceled is not None and is_canceled():
+                del array
+                os.remove(partial)
+                return None
+            rows = min(BUILD_STRIP, reader.height - y)
+            array[y:y + rows] = reader.read_window(0, y, reader.width, rows)
+            if progress is not None:
+                progress(100.0 * (y + rows) / reader.height)
+        array.flush()
+        del array
+    finally:
+        reader.close()
+    os.replace(partial, path)
+    return path
+
+
+class MemmapRasterReader(RasterWindowReader):
+    """
+    Lecteur de fenêtres servant la pleine résolution depuis le cache projeté en
+    mémoire d'un MNT.
+
+    Les fenêtres entièrement contenues dans le raster sont des vues en lecture
+    seule du cache ; les autres fenêtres et les niveaux de pyramide sont
+    assemblés comme par :class:`RasterWindowReader`.
+    """
+
+    def __init__(self, source, cache_path, band=1, cache_bytes=64 * 1024 ** 2):
+        """
+        :param source: Chemin du MNT (géoréférencement).
+        :type source: str
+        :param cache_path: Chemin produit par :func:`build_dem_cache`.
+        :type cache_path: str
+        :raises IOError: Si le MNT ou le cache ne peuvent pas être ouverts.
+        """
+        super().__init__(source, band, cache_bytes)
+        try:
+            self.array = np.load(cache_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            raise IOError(f"Cache MNT illisible : {cache_path}") from e
+        if self.array.shape != (self.height, self.width):
+            raise IOError(f"Cache MNT incohérent avec {source}")
+
+    def read_window(self, xoff, yoff, xsize, ysize, level=0):
+        """
+        Lit une fenêtre de la bande en float32.
+
+        Au niveau 0, une fenêtre entièrement contenue dans le raster est une vue
+        en lecture seule du cache.
+
+        :rtype: numpy.ndarray
+        """
+        if (level == 0 and xoff >= 0 and yoff >= 0
+                and xoff + xsize <= self.width and yoff + ysize <= self.height):
+            with self.lock:
+                if self.array is None:
+                    raise IOError(f"Raster fermé : {self.source}")
+                return self.array[yoff:yoff + ysize, xoff:xoff + xsize]
+        return super().read_window(xoff, yoff, xsize, ysize, level)
+
+    def _tile(self, tx, ty, level=0):
+        """Tuile (tx, ty) ; au niveau 0, vue du cache sans passer par le cache de tuiles."""
+        if level > 0:
+            return super()._tile(tx, ty, level)
+        ox, oy = tx * self.tile_width, ty * self.tile_height
+        return self.array[oy:oy + self.tile_height, ox:ox + self.tile_width]
+
+    def close(self):
+        """Libère le cache de tuiles, la projection du cache et ferme le jeu de données."""
+        super().close()
+        with self.lock:
+            self.array = None
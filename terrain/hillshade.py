@@ -0,0 +1,211 @@
+"""
+hillshade.py
+
+Ombrage d'un MNT calculé par tuiles en parallèle.
+
+Les pentes sont estimées par la méthode de Horn sur le voisinage 3x3, avec les
+mêmes formules que ``gdaldem hillshade`` (mode simple et multidirectionnel) :
+le résultat est identique à celui de GDAL à l'arrondi près. Chaque tuile est
+lue avec une marge d'un pixel, si bien que les tuiles sont indépendantes ;
+elles sont calculées par un groupe de threads (la lecture GDAL et les calculs
+NumPy sur de grands tableaux libèrent le GIL) puis écrites dans un GeoTIFF
+tuilé et compressé, complété par des aperçus. Seules quelques tuiles par
+thread sont soumises d'avance, si bien que la mémoire ne dépend pas de la
+taille du MNT.
+"""
+
+import math
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+from osgeo import gdal
+
+from .overviews import overview_factors
+from .raster_window import RasterWindowReader
+from .sidecar import remove_stale, sidecar_path
+
+SIDECAR_TAG = 'hillshade'
+# Côté des tuiles de calcul, en pixels
+BUILD_TILE = 1024
+# Nombre de tuiles soumises d'avance par thread de calcul
+IN_FLIGHT_PER_WORKER = 2
+# Valeur nodata de l'ombrage (bords et voisinages incomplets)
+NODATA = 0
+
+
+def hillshade(window, pixel_size, z_factor=1.0, scale=1.0, azimuth=315.0, altitude=45.0,
+              multidirectional=False):
+    """
+    Ombrage d'une fenêtre de MNT bordée d'un pixel de marge.
+
+    :param window: Altitudes (lignes + 2, colonnes + 2), NaN pour nodata.
+    :type window: numpy.ndarray
+    :param pixel_size: Taille de pixel (x, y) de la géotransformation, y négatif
+        pour un raster nord en haut.
+    :type pixel_size: tuple
+    :param z_factor: Exagération verticale.
+    :type z_factor: float
+    :param scale: Rapport entre unités horizontales et verticales.
+    :type scale: float
+    :param azimuth: Azimut de la lumière, en degrés (ignoré en mode multidirectionnel).
+    :type azimuth: float
+    :param altitude: Hauteur de la lumière au-dessus de l'horizon, en degrés.
+    :type altitude: float
+    :param multidirectional: Combinaison pondérée des éclairages à 225, 270, 315 et 360 degrés.
+    :type multidirectional: bool
+    :return: Ombrage en octets (lignes, colonnes), 0 si un voisin est nodata.
+    :rtype: numpy.ndarray
+    """
+    w = window.astype(np.float64)
+    a, b, c = w[:-2, :-2], w[:-2, 1:-1], w[:-2, 2:]
+    d, f = w[1:-1, :-2], w[1:-1, 2:]
+    g, h, i = w[2:, :-2], w[2:, 1:-1], w[2:, 2:]
+    # Gradients de Horn, signes et unités de gdaldem
+    x = ((a + 2 * d + g) - (c + 2 * f + i)) / pixel_size[0]
+    y = ((g + 2 * h + i) - (a + 2 * b + c)) / pixel_size[1]
+    xx_plus_yy = x * x + y * y
+
+    z = z_factor / (8 * scale)
+    alt = math.radians(altitude)
+    sin_alt = math.sin(alt)
+    cos_alt_z = math.cos(alt) * z
+    norm = np.sqrt(1 + z * z * xx_plus_yy)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if not multidirectional:
+            az = math.radians(azimuth)
+            cang = 254 * (sin_alt - (y * math.cos(az) - x * math.sin(az)) * cos_alt_z) / norm
+            shade = np.where(cang <= 0, 1.0, 1.0 + cang)
+        else:
+            # Éclairages pondérés par sin²(aspect - azimut) (USGS, Mark 1992)
+            diagonal = math.cos(math.radians(225)) * cos_alt_z
+            val225 = np.maximum(sin_alt + (x - y) * diagonal, 0)
+            val270 = np.maximum(sin_alt - x * cos_alt_z, 0)
+            val315 = np.maximum(sin_alt + (x + y) * diagonal, 0)
+            val360 = np.maximum(sin_alt - y * cos_alt_z, 0)
+            weight225 = 0.5 * xx_plus_yy - x * y
+            weight315 = xx_plus_yy - weight225
+            weighted = (weight225 * val225 + x * x * val270 + weight315 * val315 + y * y * val360) / xx_plus_yy
+            shade = np.where(xx_plus_yy == 0, 1.0 + 254 * sin_alt, 1.0 + 127 * weighted / norm)
+
+    shade = np.rint(shade)
+    # Le pixel central n'intervient pas dans les gradients mais doit être valide
+    shade[np.isnan(shade) | np.isnan(w[1:-1, 1:-1])] = NODATA
+    return shade.astype(np.uint8)
+
+
+def hillshade_path(source, params, cache_dir=None):
+    """
+    Chemin du fichier d'ombrage associé à un MNT et à des paramètres d'ombrage.
+
+    :rtype: str
+    """
+    key = '|'.join(f"{name}={params[name]}" for name in sorted(params))
+    return sidecar_path(source, SIDECAR_TAG, key, cache_dir)
+
+
+def build_hillshade(source, band=1, z_factor=1.0, scale=1.0, azimuth=315.0, altitude=45.0,
+                    multidirectional=False, cache_dir=None, workers=None,
+                    progress=None, is_canceled=None):
+    """
+    Calcule l'ombrage d'un MNT, ou retourne celui déjà en cache.
+
+    :param source: Chemin du MNT.
+    :type source: str
+    :param band: Numéro de la bande des altitudes.
+    :type band: int
+    :param cache_dir: Répertoire de l'ombrage (à côté du MNT par défaut).
+    :type cache_dir: str
+    :param workers: Nombre de threads de calcul (nombre de processeurs par défaut).
+    :type workers: int
+    :param progress: Fonction recevant l'avancement en pourcentage.
+    :type progress: function
+    :param is_canceled: Fonction indiquant si le calcul doit être interrompu.
+    :type is_canceled: function
+    :return: Chemin de l'ombrage, ou None si le calcul a été interrompu.
+    :rtype: str
+    """
+    params = {'band': band, 'z_factor': z_factor, 'scale': scale, 'azimuth': azimuth,
+              'altitude': altitude, 'multidirectional': multidirectional}
+    path = hillshade_path(source, params, cache_dir)
+    if os.path.exists(path):
+        return path
+    # Les ombrages d'une version antérieure du MNT ou d'autres paramètres sont obsolètes
+    remove_stale(path)
+
+    reader = RasterWindowReader(source, band, cache_bytes=0)
+    width, height = reader.width, reader.height
+    pixel_size = (reader.geotransform[1], reader.geotransform[5])
+    partial = path + '.partial'
+    driver = gdal.GetDriverByName('GTiff')
+    output = driver.Create(partial, width, height, 1, gdal.GDT_Byte,
+                           ['TILED=YES', 'COMPRESS=DEFLATE', 'PREDICTOR=2', 'BIGTIFF=IF_SAFER'])
+    output.SetGeoTransform(reader.geotransform)
+    output.SetProjection(reader.dataset.GetProjection())
+    output_band = output.GetRasterBand(1)
+    output_band.SetNoDataValue(NODATA)
+    reader.close()
+
+    # Un jeu de données GDAL par thread : les lectures ne se bloquent pas entre elles
+    local = threading.local()
+    readers = []
+
+    def shade_tile(x, y):
+        if is_canceled is not None and is_canceled():
+            return None
+        if not hasattr(local, 'reader'):
+            local.reader = RasterWindowReader(source, band, cache_bytes=0)
+            readers.append(local.reader)
+        w = min(BUILD_TILE, width - x)
+        h = min(BUILD_TILE, height - y)
+        # Marge d'un pixel : hors du raster, elle vaut NaN et le bord reste nodata
+        window = local.reader.read_window(x - 1, y - 1, w + 2, h + 2)
+        return hillshade(window, pixel_size, z_factor, scale, azimuth, altitude, multidirectional)
+
+    tiles = [(x, y) for y in range(0, height, BUILD_TILE) for x in range(0, width, BUILD_TILE)]
+    queued = iter(tiles)
+    workers = workers or os.cpu_count() or 1
+    canceled = False
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Au plus IN_FLIGHT_PER_WORKER tuiles par thread sont soumises d'avance :
+        # les tuiles ombrées en attente d'écriture ne s'accumulent pas en mémoire
+        pending = deque((tile, executor.submit(shade_tile, *tile))
+                        for tile in islice(queued, IN_FLIGHT_PER_WORKER * workers))
+        done = 0
+        # Les tuiles sont écrites dans l'ordre par le thread appelant
+        while pending:
+            (x, y), future = pending.popleft()
+            shade = future.result()
+            if shade is None:
+                canceled = True
+                break
+            output_band.WriteArray(shade, x, y)
+            tile = next(queued, None)
+            if tile is not None:
+                pending.append((tile, executor.submit(shade_tile, *tile)))
+            done += 1
+            if progress is not None:
+                progress(90.0 * done / len(tiles))
+        for _, future in pending:
+            future.cancel()
+    for tile_reader in readers:
+        tile_reader.close()
+
+    if canceled:
+        output_band = output = None
+        os.remove(partial)
+        return None
+
+    factors = overview_factors(width, height)
+    if factors:
+        output.BuildOverviews('AVERAGE', factors)
+    if progress is not None:
+        progress(100.0)
+    output_band.FlushCache()
+    output_band = output = None
+    os.replace(partial, path)
+    return path
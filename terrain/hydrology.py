@@ -0,0 +1,588 @@
+"""
+hydrology.py
+
+Directions d'écoulement D8 et accumulation de flux d'un MNT, pour le tracé
+des talwegs.
+
+Les dépressions sont comblées en deux niveaux. Chaque pixel est rattaché au
+fond de cuvette où mène la plus forte pente, puis une inondation prioritaire
+(Priority-Flood) du graphe des cuvettes, reliées par leurs cols, donne le
+niveau de débordement de chacune. Chaque pixel s'écoule vers son voisin le
+plus bas de la surface comblée ; les zones plates, dont les cuvettes comblées,
+sont drainées vers leur exutoire par un parcours en largeur. L'accumulation de
+flux est ensuite propagée d'amont en aval par lots NumPy de pixels dont tous
+les donneurs ont été traités.
+
+Seule l'inondation du graphe des cuvettes est une boucle Python ; tous les
+traitements par pixel sont vectorisés, par bandes de lignes ou par lots. Les
+grilles (MNT bordé, directions, étiquettes des cuvettes, nombre de donneurs,
+accumulation) sont des tableaux ``.npy`` projetés en mémoire
+(``numpy.memmap``) : la mémoire ne limite pas la taille du MNT. Le résultat
+est enregistré dans un répertoire annexe au MNT et réutilisé tant que
+celui-ci n'est pas modifié.
+"""
+
+import heapq
+import json
+import math
+import os
+import shutil
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from .path_engine import NEIGHBOR_OFFSETS
+from .raster_window import RasterWindowReader, invert_geotransform
+from .sidecar import remove_stale, sidecar_path
+
+SIDECAR_TAG = 'hydro'
+# Hauteur des bandes de lignes lues et initialisées en une fois
+BUILD_STRIP = 512
+
+# Codes de direction : 0 pour un pixel non encore orienté, k + 1 pour un
+# écoulement vers le voisin NEIGHBOR_OFFSETS[k], NODATA hors du MNT
+UNVISITED = 0
+NODATA = 255
+# Nombre de donneurs d'un pixel dont l'accumulation a été propagée
+DONE = 255
+
+
+def _flat_offsets(width):
+    """Décalages à plat des 8 voisins dans une grille bordée de largeur ``width``."""
+    return [di * width + dj for di, dj in NEIGHBOR_OFFSETS]
+
+
+def flow_grids_path(source, cache_dir=None):
+    """
+    Chemin du répertoire des grilles d'écoulement associé à un MNT.
+
+    :rtype: str
+    """
+    return sidecar_path(source, SIDECAR_TAG, '', cache_dir, extension='')
+
+
+def _load_elevation(reader, path):
+    """
+    Copie le MNT, bande par bande, dans un tableau projeté en mémoire bordé
+    d'un pixel NaN.
+    """
+    height, width = reader.height, reader.width
+    elevation = open_memmap(path, mode='w+', dtype=np.float32, shape=(height + 2, width + 2))
+    elevation[0] = np.nan
+    elevation[-1] = np.nan
+    elevation[:, 0] = np.nan
+    elevation[:, -1] = np.nan
+    for y in range(0, height, BUILD_STRIP):
+        rows = min(BUILD_STRIP, height - y)
+        elevation[1 + y:1 + y + rows, 1:-1] = reader.read_window(0, y, width, rows)
+    return elevation
+
+
+class _Canceled(Exception):
+    """Interruption du calcul demandée par l'appelant."""
+
+
+def _strips(rows, report=None):
+    """
+    Bandes de lignes [a, b[ de l'intérieur d'une grille bordée de ``rows`` lignes.
+
+    :param report: Fonction recevant la fraction de la grille déjà parcourue.
+    :type report: function
+    """
+    for a in range(1, rows - 1, BUILD_STRIP):
+        if report is not None:
+            report(a / rows)
+        yield a, min(a + BUILD_STRIP, rows - 1)
+
+
+def _lowest_neighbor(surface, direction, report=None):
+    """
+    Affecte à chaque pixel valide la direction de son voisin le plus bas,
+    s'il est strictement plus bas que lui.
+
+    Les pixels voisins d'un pixel nodata ou du bord s'écoulent hors du MNT,
+    vers ce voisin ; les pixels sans voisin plus bas (fonds de cuvette, zones
+    plates) reçoivent le code UNVISITED.
+
+    :param surface: Altitudes de la grille bordée d'un pixel NaN.
+    :type surface: numpy.ndarray
+    :param direction: Reçoit les codes de direction (même forme que ``surface``).
+    :type direction: numpy.ndarray
+    """
+    rows, width = surface.shape
+    direction[0] = NODATA
+    direction[-1] = NODATA
+    for a, b in _strips(rows, report):
+        # Bande de lignes [a, b[ avec une ligne de marge de chaque côté
+        z = surface[a - 1:b + 1]
+        nodata = np.isnan(z)
+        lowest = z[1:-1, 1:-1].copy()
+        codes = np.full(lowest.shape, UNVISITED, dtype=np.uint8)
+        for k, (di, dj) in enumerate(NEIGHBOR_OFFSETS):
+            neighbor = z[1 + di:1 + di + b - a, 1 + dj:width - 1 + dj]
+            lower = neighbor < lowest
+            np.copyto(lowest, neighbor, where=lower)
+            np.copyto(codes, k + 1, where=lower)
+        # Le premier voisin nodata rencontré donne la direction d'écoulement
+        for k in reversed(range(len(NEIGHBOR_OFFSETS))):
+            di, dj = NEIGHBOR_OFFSETS[k]
+            np.copyto(codes, k + 1, where=nodata[1 + di:1 + di + b - a, 1 + dj:width - 1 + dj])
+        np.copyto(codes, NODATA, where=nodata[1:-1, 1:-1])
+        direction[a:b, 0] = NODATA
+        direction[a:b, -1] = NODATA
+        direction[a:b, 1:-1] = codes
+
+
+def _label_basins(direction, labels, report=None):
+    """
+    Rattache chaque pixel valide au puits où mènent ses directions : 0 pour
+    les pixels qui s'écoulent hors du MNT, 1 à n pour les n fonds de cuvette.
+
+    Les étiquettes sont propagées des puits vers l'amont, par lots NumPy de
+    donneurs des pixels étiquetés au lot précédent.
+
+    :param labels: Reçoit les étiquettes (entiers, même forme que ``direction``).
+    :type labels: numpy.ndarray
+    :return: Nombre de cuvettes.
+    :rtype: int
+    """
+    rows, width = direction.shape
+    receivers = np.array([0] + _flat_offsets(width), dtype=np.int64)
+    # Le voisin situé en -NEIGHBOR_OFFSETS[k] s'écoule vers le pixel s'il porte le code k + 1
+    upstream = [(-offset, k + 1) for k, offset in enumerate(_flat_offsets(width))]
+    codes = np.asarray(direction).reshape(-1)
+    flat = np.asarray(labels).reshape(-1)
+    count = 0
+    for a, b in _strips(rows, report):
+        index = np.flatnonzero(codes[a * width:b * width] != NODATA) + a * width
+        sinks = index[codes[index] == UNVISITED]
+        outlets = index[codes[index] != UNVISITED]
+        outlets = outlets[codes[outlets + receivers[codes[outlets]]] == NODATA]
+        flat[outlets] = 0
+        flat[sinks] = np.arange(count + 1, count + 1 + sinks.size)
+        count += sinks.size
+        ready = np.concatenate((outlets, sinks))
+        while ready.size:
+            found = []
+            for offset, code in upstream:
+                donor = ready + offset
+                drains = codes[donor] == code
+                donor = donor[drains]
+                flat[donor] = flat[ready[drains]]
+                found.append(donor)
+            ready = np.concatenate(found)
+    return count
+
+
+def _min_by_key(keys, values):
+    """
+    Minimum de ``values`` pour chaque valeur distincte de ``keys``.
+
+    :return: Clés distinctes triées et minimums correspondants.
+    :rtype: tuple
+    """
+    order = np.argsort(keys, kind='stable')
+    keys, values = keys[order], values[order]
+    if keys.size == 0:
+        return keys, values
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.minimum.reduceat(values, starts)
+
+
+def _spill_edges(elevation, direction, labels, count, report=None):
+    """
+    Cols entre cuvettes voisines : pour chaque couple d'étiquettes adjacentes,
+    la plus basse des altitudes de passage (maximum des deux pixels voisins).
+
+    :param count: Nombre de cuvettes, retourné par :func:`_label_basins`.
+    :type count: int
+    :return: Clés des couples (``bas * (count + 1) + haut``) et altitudes des cols.
+    :rtype: tuple
+    """
+    rows, width = elevation.shape
+    stride = count + 1
+    keys, levels = [], []
+    for a, b in _strips(rows, report):
+        # Bande de lignes [a, b[ avec une ligne de marge en dessous ; chaque
+        # couple de voisins est vu une fois, depuis son pixel le plus haut
+        z = elevation[a:b + 1]
+        basin = labels[a:b + 1]
+        valid = direction[a:b + 1] != NODATA
+        n = b - a
+        found_keys, found_levels = [], []
+        for di, dj in ((0, 1), (1, -1), (1, 0), (1, 1)):
+            here = np.s_[:n, 1:-1]
+            there = np.s_[di:di + n, 1 + dj:width - 1 + dj]
+            pair = valid[here] & valid[there] & (basin[here] != basin[there])
+            first = basin[here][pair].astype(np.int64)
+            second = basin[there][pair].astype(np.int64)
+            found_keys.append(np.minimum(first, second) * stride + np.maximum(first, second))
+            found_levels.append(np.maximum(z[here][pair], z[there][pair]))
+        strip_keys, strip_levels = _min_by_key(np.concatenate(found_keys), np.concatenate(found_levels))
+        keys.append(strip_keys)
+        levels.append(strip_levels)
+    return _min_by_key(np.concatenate(keys), np.concatenate(levels))
+
+
+def _spill_levels(keys, levels, count):
+    """
+    Niveau de débordement de chaque cuvette, par inondation prioritaire du
+    graphe des cuvettes depuis l'extérieur du MNT (étiquette 0).
+
+    :return: Niveaux indexés par étiquette (-inf pour l'extérieur).
+    :rtype: numpy.ndarray
+    """
+    stride = count + 1
+    first, second = keys // stride, keys % stride
+    source = np.concatenate((first, second))
+    order = np.argsort(source, kind='stable')
+    start = np.searchsorted(source[order], np.arange(count + 2)).tolist()
+    target = np.concatenate((second, first))[order].tolist()
+    passes = np.concatenate((levels, levels))[order].tolist()
+
+    spill = [math.inf] * stride
+    spill[0] = -math.inf
+    done = bytearray(stride)
+    heap = [(-math.inf, 0)]
+    heappush, heappop = heapq.heappush, heapq.heappop
+    while heap:
+        level, basin = heappop(heap)
+        if done[basin]:
+            continue
+        done[basin] = 1
+        for j in range(start[basin], start[basin + 1]):
+            other = target[j]
+            if done[other]:
+                continue
+            reach = passes[j] if passes[j] > level else level
+            if reach < spill[other]:
+                spill[other] = reach
+                heappush(heap, (reach, other))
+    return np.array(spill)
+
+
+def _fill(elevation, labels, spill, report=None):
+    """
+    Comble les cuvettes : chaque pixel est relevé au niveau de débordement de
+    sa cuvette.
+    """
+    for a, b in _strips(elevation.shape[0], report):
+        level = spill[labels[a:b]].astype(np.float32)
+        # np.maximum propage les NaN des pixels nodata
+        elevation[a:b] = np.maximum(elevation[a:b], level)
+
+
+def _drain_flats(surface, direction, report=None):
+    """
+    Oriente les zones plates de la surface comblée vers leur exutoire.
+
+    Les pixels plats sont parcourus en largeur, par lots NumPy, depuis les
+    pixels orientés de même altitude : chacun s'écoule vers le pixel depuis
+    lequel il a été atteint.
+    """
+    rows, width = surface.shape
+    z = np.asarray(surface).reshape(-1)
+    codes = np.asarray(direction).reshape(-1)
+    # Un pixel plat situé en +NEIGHBOR_OFFSETS[k] s'écoule vers le pixel (direction opposée)
+    downstream = [(offset, len(NEIGHBOR_OFFSETS) - k) for k, offset in enumerate(_flat_offsets(width))]
+    for a, b in _strips(rows, report):
+        # Premier lot : pixels orientés de la bande voisins d'un pixel plat
+        flat = direction[a - 1:b + 1] == UNVISITED
+        if not flat.any():
+            continue
+        near = np.zeros((b - a, width - 2), dtype=bool)
+        for di, dj in NEIGHBOR_OFFSETS:
+            near |= flat[1 + di:1 + di + b - a, 1 + dj:width - 1 + dj]
+        near &= ~flat[1:-1, 1:-1] & (direction[a:b, 1:-1] != NODATA)
+        near_rows, near_cols = np.nonzero(near)
+        ready = (near_rows + a) * width + near_cols + 1
+        while ready.size:
+            found = []
+            for offset, code in downstream:
+                flat = ready + offset
+                drains = (codes[flat] == UNVISITED) & (z[flat] == z[ready])
+                flat = flat[drains]
+                codes[flat] = code
+                found.append(flat)
+            ready = np.concatenate(found)
+
+
+def _stage(progress, is_canceled, start, span):
+    """
+    Fonction d'avancement d'une étape du calcul, couvrant les pourcentages
+    [start, start + span].
+
+    :raises _Canceled: Si le calcul doit être interrompu.
+    """
+    def report(fraction):
+        if is_canceled is not None and is_canceled():
+            raise _Canceled
+        if progress is not None:
+            progress(start + span * fraction)
+    return report
+
+
+def flow_directions(elevation, direction, labels, progress=None, is_canceled=None):
+    """
+    Comble les dépressions du MNT et affecte à chaque pixel valide sa
+    direction d'écoulement.
+
+    Chaque pixel est d'abord rattaché au fond de cuvette où mène la plus
+    forte pente. Le niveau de débordement de chaque cuvette est obtenu par
+    inondation prioritaire du graphe des cuvettes, reliées par leurs cols :
+    la boucle Python ne porte que sur les cuvettes, tout le reste est traité
+    par bandes de lignes NumPy. Chaque pixel s'écoule ensuite vers son voisin
+    le plus bas de la surface comblée, et les zones plates vers leur exutoire.
+
+    :param elevation: MNT bordé d'un pixel NaN, comblé en place.
+    :type elevation: numpy.ndarray
+    :param direction: Reçoit les codes de direction (uint8, même forme).
+    :type direction: numpy.ndarray
+    :param labels: Grille de travail (entiers, même forme).
+    :type labels: numpy.ndarray
+    :return: False si le calcul a été interrompu.
+    :rtype: bool
+    """
+    try:
+        _lowest_neighbor(elevation, direction, _stage(progress, is_canceled, 0.0, 10.0))
+        count = _label_basins(direction, labels, _stage(progress, is_canceled, 10.0, 20.0))
+        keys, levels = _spill_edges(elevation, direction, labels, count,
+                                    _stage(progress, is_canceled, 30.0, 10.0))
+        spill = _spill_levels(keys, levels, count)
+        _fill(elevation, labels, spill, _stage(progress, is_canceled, 40.0, 10.0))
+        _lowest_neighbor(elevation, direction, _stage(progress, is_canceled, 50.0, 10.0))
+        _drain_flats(elevation, direction, _stage(progress, is_canceled, 60.0, 20.0))
+    except _Canceled:
+        return False
+    return True
+
+
+def _count_donors(direction, donors):
+    """
+    Nombre de voisins s'écoulant vers chaque pixel, calculé par bandes de lignes.
+
+    :param direction: Codes de direction de la grille bordée.
+    :type direction: numpy.ndarray
+    :param donors: Reçoit le nombre de donneurs (uint8, même forme que ``direction``).
+    :type donors: numpy.ndarray
+    """
+    rows, width = direction.shape
+    donors[0] = 0
+    donors[-1] = 0
+    for a in range(1, rows - 1, BUILD_STRIP):
+        b = min(a + BUILD_STRIP, rows - 1)
+        # Bande de lignes [a, b[ avec une ligne de marge de chaque côté
+        codes = direction[a - 1:b + 1]
+        count = np.zeros((b - a, width - 2), dtype=np.uint8)
+        # Le voisin situé en -NEIGHBOR_OFFSETS[k] s'écoule vers le pixel s'il porte le code k + 1
+        for k, (di, dj) in enumerate(NEIGHBOR_OFFSETS):
+            count += codes[1 - di:1 - di + b - a, 1 - dj:width - 1 - dj] == k + 1
+        donors[a:b, 0] = 0
+        donors[a:b, -1] = 0
+        donors[a:b, 1:-1] = count
+
+
+def flow_accumulation(direction, accumulation, donors, progress=None, is_canceled=None):
+    """
+    Accumulation de flux : nombre de pixels drainés par chaque pixel, lui compris.
+
+    Les pixels sans donneur d'une bande de lignes forment le premier lot ;
+    chaque lot ajoute son accumulation à celle de ses exutoires, et les
+    exutoires dont tous les donneurs sont traités forment le lot suivant. Un
+    lot n'est jamais plus grand que le précédent : la mémoire reste bornée
+    par la taille d'une bande.
+
+    :param direction: Codes de direction de la grille bordée.
+    :type direction: numpy.ndarray
+    :param accumulation: Reçoit l'accumulation (float32, même forme que ``direction``).
+    :type accumulation: numpy.ndarray
+    :param donors: Grille de travail (uint8, même forme que ``direction``).
+    :type donors: numpy.ndarray
+    :return: False si le calcul a été interrompu.
+    :rtype: bool
+    """
+    rows, width = direction.shape
+    for a in range(0, rows, BUILD_STRIP):
+        accumulation[a:a + BUILD_STRIP] = direction[a:a + BUILD_STRIP] != NODATA
+    _count_donors(direction, donors)
+
+    receivers = np.array([0] + _flat_offsets(width), dtype=np.int64)
+    # Vues ndarray à plat : l'indexation d'un memmap crée des sous-classes coûteuses
+    codes = np.asarray(direction).reshape(-1)
+    acc = np.asarray(accumulation).reshape(-1)
+    pending = np.asarray(donors).reshape(-1)
+    for a in range(1, rows - 1, BUILD_STRIP):
+        if is_canceled is not None and is_canceled():
+            return False
+        b = min(a + BUILD_STRIP, rows - 1)
+        ready = np.flatnonzero((donors[a:b] == 0) & (direction[a:b] != NODATA)) + a * width
+        while ready.size:
+            pending[ready] = DONE
+            target = ready + receivers[codes[ready]]
+            inside = codes[target] != NODATA
+            ready, target = ready[inside], target[inside]
+            # Plusieurs pixels du lot peuvent s'écouler vers le même exutoire
+            outlets, inverse = np.unique(target, return_inverse=True)
+            acc[outlets] += np.bincount(inverse, weights=acc[ready]).astype(np.float32)
+            pending[outlets] -= np.bincount(inverse).astype(np.uint8)
+            ready = outlets[pending[outlets] == 0]
+        if progress is not None:
+            progress(80.0 + 20.0 * b / rows)
+    return True
+
+
+def build_flow_grids(source, cache_dir=None, progress=None, is_canceled=None):
+    """
+    Calcule les grilles d'écoulement d'un MNT, ou retourne celles déjà en cache.
+
+    :param source: Chemin du MNT.
+    :type source: str
+    :param cache_dir: Répertoire des grilles (à côté du MNT par défaut).
+    :type cache_dir: str
+    :param progress: Fonction recevant l'avancement en pourcentage.
+    :type progress: function
+    :param is_canceled: Fonction indiquant si le calcul doit être interrompu.
+    :type is_canceled: function
+    :return: Répertoire des grilles, ou None si le calcul a été interrompu.
+    :rtype: str
+    """
+    path = flow_grids_path(source, cache_dir)
+    if os.path.isdir(path):
+        return path
+    # Les grilles d'une version antérieure du MNT sont obsolètes
+    remove_stale(path)
+
+    reader = RasterWindowReader(source, cache_bytes=64 * 1024 ** 2)
+    partial = path + '.partial'
+    os.makedirs(partial)
+    try:
+        elevation = _load_elevation(reader, os.path.join(partial, 'elevation.npy'))
+        shape = elevation.shape
+        direction = open_memmap(os.path.join(partial, 'direction.npy'), mode='w+',
+                                dtype=np.uint8, shape=shape)
+        # Étiquettes sur 32 bits tant que le nombre de pixels le permet
+        label_type = np.int32 if elevation.size < 2 ** 31 else np.int64
+        labels = open_memmap(os.path.join(partial, 'labels.npy'), mode='w+',
+                             dtype=label_type, shape=shape)
+        completed = flow_directions(elevation, direction, labels, progress, is_canceled)
+        # Le MNT et les étiquettes ne sont plus utiles une fois les directions affectées
+        del elevation, labels
+        os.remove(os.path.join(partial, 'elevation.npy'))
+        os.remove(os.path.join(partial, 'labels.npy'))
+        if not completed:
+            del direction
+            shutil.rmtree(partial, ignore_errors=True)
+            return None
+
+        accumulation = open_memmap(os.path.join(partial, 'accumulation.npy'), mode='w+',
+                                   dtype=np.float32, shape=shape)
+        donors = open_memmap(os.path.join(partial, 'donors.npy'), mode='w+',
+                             dtype=np.uint8, shape=shape)
+        completed = flow_accumulation(direction, accumulation, donors, progress, is_canceled)
+        del donors
+        if not completed:
+            del direction, accumulation
+            shutil.rmtree(partial, ignore_errors=True)
+            return None
+
+        direction.flush()
+        accumulation.flush()
+        with open(os.path.join(partial, 'grid.json'), 'w') as f:
+            json.dump({'geotransform': list(reader.geotransform),
+                       'width': reader.width, 'height': reader.height}, f)
+    finally:
+        reader.close()
+
+    # Seules les directions et l'accumulation sont conservées
+    del direction, accumulation
+    os.remove(os.path.join(partial, 'donors.npy'))
+    os.replace(partial, path)
+    return path
+
+
+class FlowGrids:
+    """
+    Grilles d'écoulement précalculées d'un MNT, projetées en mémoire.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Répertoire produit par :func:`build_flow_grids`.
+        :type path: str
+        """
+        with open(os.path.join(path, 'grid.json')) as f:
+            grid = json.load(f)
+        self.path = path
+        self.width = grid['width']
+        self.height = grid['height']
+        self.geotransform = tuple(grid['geotransform'])
+        self.inv_geotransform = invert_geotransform(self.geotransform)
+        self.direction = np.load(os.path.join(path, 'direction.npy'), mmap_mode='r')
+        self.accumulation = np.load(os.path.join(path, 'accumulation.npy'), mmap_mode='r')
+        self.codes = memoryview(self.direction.reshape(-1))
+        self.receivers = [0] + _flat_offsets(self.width + 2)
+
+    def world_to_pixel(self, x, y):
+        """
+        Convertit des coordonnées du raster en coordonnées pixel (non arrondies).
+
+        :return: (colonne, ligne)
+        :rtype: tuple
+        """
+        gt = self.inv_geotransform
+        return gt[0] + x * gt[1] + y * gt[2], gt[3] + x * gt[4] + y * gt[5]
+
+    def pixel_to_world(self, col, row):
+        """
+        Convertit des coordonnées pixel (fractionnaires) en coordonnées du raster.
+
+        :return: (x, y)
+        :rtype: tuple
+        """
+        gt = self.geotransform
+        return gt[0] + col * gt[1] + row * gt[2], gt[3] + col * gt[4] + row * gt[5]
+
+    def contains(self, row, col):
+        """Indique si le pixel appartient au MNT et n'est pas nodata."""
+        return (0 <= row < self.height and 0 <= col < self.width
+                and self.direction[row + 1, col + 1] != NODATA)
+
+    def snap_to_channel(self, row, col, radius):
+        """
+        Pixel d'accumulation maximale dans un carré de demi-côté ``radius``
+        autour de (row, col) : le talweg le plus proche du point cliqué.
+
+        :return: (ligne, colonne)
+        :rtype: tuple
+        """
+        r0, c0 = max(row - radius, 0), max(col - radius, 0)
+        window = self.accumulation[r0 + 1:row + radius + 2, c0 + 1:col + radius + 2]
+        if window.size == 0 or not window.any():
+            return row, col
+        i, j = np.unravel_index(np.argmax(window), window.shape)
+        return r0 + int(i), c0 + int(j)
+
+    def trace_downstream(self, row, col, max_steps=None):
+        """
+        Suit les directions d'écoulement depuis (row, col) jusqu'au bord du MNT
+        ou à un pixel nodata.
+
+        :param max_steps: Nombre maximal de pixels parcourus (illimité par défaut).
+        :type max_steps: int
+        :return: Pixels (ligne, colonne) du talweg, de l'amont vers l'aval.
+        :rtype: numpy.ndarray
+        """
+        if not self.contains(row, col):
+            return np.empty((0, 2), dtype=np.int64)
+        width = self.width + 2
+        current = (row + 1) * width + col + 1
+        path = [current]
+        codes, receivers = self.codes, self.receivers
+        while max_steps is None or len(path) < max_steps:
+            following = current + receivers[codes[current]]
+            if codes[following] == NODATA:
+                break
+            path.append(following)
+            current = following
+        flat = np.array(path, dtype=np.int64)
+        return np.column_stack((flat // width - 1, flat % width - 1))
@@ -0,0 +1,77 @@
+"""
+lru.py
+
+Cache LRU borné par une taille totale, avec compteurs de succès/échecs.
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache LRU dont la capacité est exprimée dans l'unité retournée par ``sizeof``
+    (nombre d'entrées par défaut, octets pour des tableaux NumPy par exemple).
+    """
+
+    def __init__(self, max_size, sizeof=None):
+        """
+        :param max_size: Taille totale maximale des entrées conservées.
+        :type max_size: int
+        :param sizeof: Fonction retournant la taille d'une valeur (1 par défaut).
+        :type sizeof: function
+        """
+        self.max_size = max_size
+        self.sizeof = sizeof or (lambda value: 1)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Retourne la valeur associée à ``key`` et la marque comme récemment utilisée."""
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Ajoute une valeur puis évince les entrées les plus anciennes si nécessaire."""
+        if key in self._entries:
+            self.size -= self.sizeof(self._entries.pop(key))
+        self._entries[key] = value
+        self.size += self.sizeof(value)
+        # L'entrée la plus récente est toujours conservée, même si elle dépasse le budget
+        while self.size > self.max_size and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= self.sizeof(evicted)
+
+    def clear(self):
+        """Vide le cache sans réinitialiser les compteurs."""
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self):
+        """
+        Retourne les statistiques du cache.
+
+        :return: Succès, échecs, taux de succès, nombre d'entrées et taille occupée.
+        :rtype: dict
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self._entries),
+            'size': self.size,
+        }
@@ -0,0 +1,160 @@
+"""
+metrics.py
+
+Instrumentation légère du chemin critique du tracé : durées par étape (avec
+centiles sur une fenêtre glissante) et compteurs.
+
+Désactivée, l'instrumentation se réduit à un test d'attribut : ``timer``
+retourne un gestionnaire de contexte vide partagé et ``count`` ne fait rien.
+Le module n'utilise que la bibliothèque standard : il est importé au
+chargement du plugin.
+"""
+
+import csv
+import json
+import threading
+import time
+from collections import deque
+
+# Nombre de mesures conservées par étape
+DEFAULT_WINDOW = 500
+# Centiles rapportés
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, q):
+    """
+    Centile ``q`` (0 à 100) de valeurs triées, par interpolation linéaire
+    entre rangs (méthode par défaut de ``numpy.percentile``).
+
+    :type values: list
+    :rtype: float
+    """
+    position = (len(values) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+class _NullTimer:
+    """Gestionnaire de contexte vide utilisé quand l'instrumentation est désactivée."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    """Mesure la durée d'un bloc et l'enregistre dans l'étape ``stage``."""
+
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """
+    Durées par étape et compteurs, partageables entre threads.
+    """
+
+    def __init__(self, enabled=False, window=DEFAULT_WINDOW):
+        """
+        :param enabled: Active l'enregistrement des mesures.
+        :type enabled: bool
+        :param window: Nombre de mesures conservées par étape pour les centiles.
+        :type window: int
+        """
+        self.enabled = enabled
+        self.window = window
+        self.durations = {}
+        self.calls = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def timer(self, stage):
+        """
+        Gestionnaire de contexte mesurant la durée du bloc pour l'étape ``stage``.
+
+        :type stage: str
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, stage)
+
+    def record(self, stage, seconds):
+        """Enregistre une durée, en secondes, pour l'étape ``stage``."""
+        if not self.enabled:
+            return
+        with self.lock:
+            if stage not in self.durations:
+                self.durations[stage] = deque(maxlen=self.window)
+                self.calls[stage] = 0
+            self.durations[stage].append(seconds)
+            self.calls[stage] += 1
+
+    def count(self, name, value=1):
+        """Ajoute ``value`` au compteur ``name``."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        """Efface toutes les mesures."""
+        with self.lock:
+            self.durations = {}
+            self.calls = {}
+            self.counters = {}
+
+    def summary(self):
+        """
+        Résumé des mesures : pour chaque étape, nombre d'appels, moyenne, centiles
+        et maximum en millisecondes sur la fenêtre glissante ; valeur de chaque compteur.
+
+        :return: {'stages': {étape: {...}}, 'counters': {nom: valeur}}
+        :rtype: dict
+        """
+        with self.lock:
+            samples = {stage: sorted(1000.0 * value for value in values)
+                       for stage, values in self.durations.items()}
+            calls = dict(self.calls)
+            counters = dict(self.counters)
+        stages = {}
+        for stage, values in sorted(samples.items()):
+            stats = {'calls': calls[stage], 'mean_ms': sum(values) / len(values), 'max_ms': values[-1]}
+            for q in PERCENTILES:
+                stats[f"p{q}_ms"] = percentile(values, q)
+            stages[stage] = stats
+        return {'stages': stages, 'counters': counters}
+
+    def dump_json(self, path):
+        """Écrit le résumé des mesures dans un fichier JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def dump_csv(self, path):
+        """Écrit le résumé des mesures dans un fichier CSV (une ligne par étape ou compteur)."""
+        summary = self.summary()
+        fields = ['name', 'calls', 'mean_ms'] + [f"p{q}_ms" for q in PERCENTILES] + ['max_ms', 'value']
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for stage, stats in summary['stages'].items():
+                writer.writerow(dict(stats, name=stage))
+            for name, value in sorted(summary['counters'].items()):
+                writer.writerow({'name': name, 'value': value})
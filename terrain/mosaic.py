@@ -0,0 +1,76 @@
+"""
+mosaic.py
+
+Mosaïque virtuelle (VRT GDAL) d'un ensemble de dalles de MNT.
+
+Le VRT ne fait que référencer les dalles : sa construction ne lit que leurs
+en-têtes et les pixels ne sont décodés qu'à la lecture, pour la zone lue.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from osgeo import gdal
+
+
+def mosaic_path(sources, cache_dir=None):
+    """
+    Chemin du VRT associé à un ensemble de dalles.
+
+    Le nom dépend des chemins, dates de modification et tailles des dalles :
+    la mosaïque d'un même ensemble est réutilisée tant qu'aucune dalle n'a changé.
+
+    :param sources: Chemins des dalles.
+    :type sources: list
+    :param cache_dir: Répertoire du VRT (répertoire temporaire par défaut).
+    :type cache_dir: str
+    :rtype: str
+    """
+    digest = hashlib.sha1()
+    for source in sorted(os.path.abspath(s) for s in sources):
+        stat = os.stat(source)
+        digest.update(f"{source}|{stat.st_mtime_ns}|{stat.st_size}\n".encode('utf-8'))
+    if cache_dir is None:
+        cache_dir = tempfile.gettempdir()
+    return os.path.join(cache_dir, f"mosaic_{digest.hexdigest()[:12]}.vrt")
+
+
+def build_mosaic(sources, cache_dir=None, progress=None, is_canceled=None):
+    """
+    Construit la mosaïque VRT des dalles, ou retourne celle déjà construite.
+
+    :param sources: Chemins des dalles.
+    :type sources: list
+    :param progress: Fonction recevant l'avancement en pourcentage.
+    :type progress: function
+    :param is_canceled: Fonction indiquant si la construction doit être interrompue.
+    :type is_canceled: function
+    :return: Chemin du VRT, ou None si la construction a été interrompue.
+    :rtype: str
+    :raises IOError: Si GDAL ne peut pas construire la mosaïque.
+    """
+    path = mosaic_path(sources, cache_dir)
+    if os.path.exists(path):
+        return path
+
+    def callback(complete, message, data):
+        if progress is not None:
+            progress(100.0 * complete)
+        # GDAL abandonne la construction si le rappel retourne 0
+        return 0 if is_canceled is not None and is_canceled() else 1
+
+    partial = path + '.partial.vrt'
+    vrt = gdal.BuildVRT(partial, list(sources), callback=callback)
+    if is_canceled is not None and is_canceled():
+        vrt = None
+        if os.path.exists(partial):
+            os.remove(partial)
+        return None
+    if vrt is None:
+        raise IOError(f"Impossible de construire la mosaïque de {len(sources)} dalles")
+    vrt.FlushCache()
+    vrt = None
+    # Renommé dans le même répertoire : les chemins relatifs éventuels restent valides
+    os.replace(partial, path)
+    return path
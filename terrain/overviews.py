@@ -0,0 +1,86 @@
+"""
+overviews.py
+
+Aperçus (pyramides) GDAL des rasters affichés et lus par le plugin.
+
+Sans aperçus, l'affichage à petite échelle lit la pleine résolution. Les
+aperçus sont moyennés : la recherche multi-résolution ne les utilise pas et
+construit ses propres niveaux par maximum (voir ``RasterWindowReader``). Les
+aperçus d'un fichier ouvert en lecture seule sont écrits dans un fichier
+externe ``.ovr`` compressé, sans modifier le raster.
+"""
+
+from osgeo import gdal
+
+# Les aperçus sont construits jusqu'à ce que leur plus grand côté passe sous cette taille
+OVERVIEW_MIN_SIZE = 256
+# Options de création des aperçus externes
+OVERVIEW_CONFIG = {
+    'COMPRESS_OVERVIEW': 'DEFLATE',
+    'PREDICTOR_OVERVIEW': '2',
+    'BIGTIFF_OVERVIEW': 'IF_SAFER',
+}
+
+
+def overview_factors(width, height):
+    """Facteurs de réduction des aperçus : 2, 4, 8... jusqu'à OVERVIEW_MIN_SIZE pixels."""
+    factors = []
+    factor = 2
+    while max(width, height) / factor >= OVERVIEW_MIN_SIZE:
+        factors.append(factor)
+        factor *= 2
+    return factors
+
+
+def needs_overviews(source):
+    """
+    Indique si un raster est assez grand pour justifier des aperçus et n'en a pas.
+
+    :rtype: bool
+    """
+    dataset = gdal.Open(source)
+    if dataset is None:
+        return False
+    band = dataset.GetRasterBand(1)
+    return bool(overview_factors(dataset.RasterXSize, dataset.RasterYSize)) and band.GetOverviewCount() == 0
+
+
+def build_overviews(source, resampling='AVERAGE', progress=None, is_canceled=None):
+    """
+    Construit les aperçus externes d'un raster.
+
+    :param source: Chemin du raster.
+    :type source: str
+    :param resampling: Méthode de rééchantillonnage GDAL.
+    :type resampling: str
+    :param progress: Fonction recevant l'avancement en pourcentage.
+    :type progress: function
+    :param is_canceled: Fonction indiquant si le calcul doit être interrompu.
+    :type is_canceled: function
+    :return: False si le calcul a été interrompu.
+    :rtype: bool
+    :raises IOError: Si le raster ne peut pas être ouvert.
+    """
+    dataset = gdal.Open(source)
+    if dataset is None:
+        raise IOError(f"Impossible d'ouvrir le raster {source}")
+    factors = overview_factors(dataset.RasterXSize, dataset.RasterYSize)
+    if not factors:
+        return True
+
+    def callback(complete, message, data):
+        if progress is not None:
+            progress(100.0 * complete)
+        # GDAL abandonne le calcul si le rappel retourne 0
+        return 0 if is_canceled is not None and is_canceled() else 1
+
+    previous = {key: gdal.GetThreadLocalConfigOption(key) for key in OVERVIEW_CONFIG}
+    for key, value in OVERVIEW_CONFIG.items():
+        gdal.SetThreadLocalConfigOption(key, value)
+    try:
+        dataset.BuildOverviews(resampling, factors, callback=callback)
+    finally:
+        for key, value in previous.items():
+            gdal.SetThreadLocalConfigOption(key, value)
+        dataset = None
+    return not (is_canceled is not None and is_canceled())
@@ -0,0 +1,412 @@
+"""
+path_engine.py
+
+Moteur de recherche du chemin de moindre coût directement sur la grille du MNT.
+
+Le graphe n'est jamais construit : chaque pixel est identifié par son indice
+à plat dans une grille bordée d'une marge infranchissable d'un pixel, ce qui
+évite tout test de bornes lors du parcours des 8 voisins.
+"""
+
+import heapq
+import math
+
+import numpy as np
+
+INF = math.inf
+SQRT2 = math.sqrt(2)
+
+# Algorithmes de recherche disponibles
+DIJKSTRA = 'dijkstra'
+ASTAR = 'astar'
+BIDIRECTIONAL = 'bidirectional'
+
+# Décalages (ligne, colonne) des 8 voisins
+NEIGHBOR_OFFSETS = (
+    (-1, -1), (-1, 0), (-1, 1),
+    (0, -1), (0, 1),
+    (1, -1), (1, 0), (1, 1),
+)
+
+
+def elevation_cost(elevation, mask=None):
+    """
+    Construit la grille de coût associée à un MNT pour la recherche de crête.
+
+    Le coût d'entrée dans un pixel vaut ``max(z) - z`` : c'est l'ancien poids
+    ``-z`` décalé d'une constante afin de rester positif, condition nécessaire
+    à Dijkstra.
+
+    :param elevation: Fenêtre d'altitudes.
+    :type elevation: numpy.ndarray
+    :param mask: Pixels autorisés (True) ou None pour tous.
+    :type mask: numpy.ndarray
+    :return: Grille de coûts, ``inf`` pour les pixels infranchissables.
+    :rtype: numpy.ndarray
+    """
+    z = np.asarray(elevation, dtype=np.float64)
+    valid = ~np.isnan(z)
+    if mask is not None:
+        valid &= mask
+    cost = np.full(z.shape, INF)
+    if valid.any():
+        cost[valid] = z[valid].max() - z[valid]
+    return cost
+
+
+def nearest_valid_pixel(valid, row, col):
+    """
+    Retourne le pixel valide le plus proche de (row, col).
+
+    :param valid: Masque des pixels valides.
+    :type valid: numpy.ndarray
+    :return: (ligne, colonne) ou None si aucun pixel n'est valide.
+    :rtype: tuple
+    """
+    rows, cols = valid.shape
+    if 0 <= row < rows and 0 <= col < cols and valid[row, col]:
+        return int(row), int(col)
+    candidates = np.flatnonzero(valid)
+    if candidates.size == 0:
+        return None
+    r, c = np.divmod(candidates, cols)
+    best = candidates[np.argmin((r - row) ** 2 + (c - col) ** 2)]
+    return tuple(int(v) for v in divmod(int(best), cols))
+
+
+def least_cost_path(cost, start, end, algorithm=DIJKSTRA, step_cost=0.0):
+    """
+    Calcule le chemin de moindre coût entre deux pixels (8-connexité).
+
+    Le coût d'un déplacement est le coût du pixel d'arrivée, augmenté de
+    ``step_cost`` fois la longueur du pas (1 ou racine de 2, en pixels).
+
+    :param cost: Grille de coûts (``inf`` = infranchissable).
+    :type cost: numpy.ndarray
+    :param start: Pixel de départ (ligne, colonne).
+    :type start: tuple
+    :param end: Pixel d'arrivée (ligne, colonne).
+    :type end: tuple
+    :param algorithm: ``'dijkstra'``, ``'astar'`` ou ``'bidirectional'``.
+    :type algorithm: str
+    :param step_cost: Coût par pixel parcouru.
+    :type step_cost: float
+    :return: Tableau (n, 2) des pixels du chemin, ou None s'il n'existe pas.
+    :rtype: numpy.ndarray
+    """
+    return search_path(cost, start, end, algorithm, step_cost)[0]
+
+
+def search_path(cost, start, end, algorithm=DIJKSTRA, step_cost=0.0):
+    """
+    Identique à :func:`least_cost_path`, en retournant aussi le nombre de
+    pixels développés par la recherche.
+
+    :return: (chemin ou None, nombre de pixels développés)
+    :rtype: tuple
+    """
+    if algorithm == DIJKSTRA:
+        search = SingleSourceSearch(cost, start, step_cost)
+        path = search.path_to(*end)
+    elif algorithm == ASTAR:
+        search = AStarSearch(cost, start, end, step_cost)
+        path = search.run()
+    elif algorithm == BIDIRECTIONAL:
+        search = BidirectionalSearch(cost, start, end, step_cost)
+        path = search.run()
+    else:
+        raise ValueError(f"Algorithme de recherche inconnu : {algorithm}")
+    return path, search.expanded
+
+
+class _GridSearch:
+    """
+    Grille de coûts bordée d'une marge infranchissable, indexée à plat.
+    """
+
+    def __init__(self, cost, step_cost):
+        self.rows, self.cols = cost.shape
+        self.width = self.cols + 2
+        padded = np.full((self.rows + 2, self.width), INF)
+        padded[1:-1, 1:-1] = cost
+        self.costs = padded.ravel().tolist()
+        self.step_cost = step_cost
+        # (décalage à plat, coût de déplacement) pour chacun des 8 voisins
+        self.steps = [(di * self.width + dj, step_cost * math.hypot(di, dj))
+                      for di, dj in NEIGHBOR_OFFSETS]
+        self.expanded = 0
+
+    def _flat(self, row, col):
+        """Indice à plat du pixel (ligne, colonne) dans la grille bordée."""
+        return (row + 1) * self.width + col + 1
+
+    def contains(self, row, col):
+        """Indique si le pixel appartient à la grille de recherche."""
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def heuristic(self, anchor, reverse=False):
+        """
+        Minorant admissible et cohérent du coût restant jusqu'à ``anchor``
+        (ou, si ``reverse``, du coût depuis ``anchor``), pour chaque pixel.
+
+        Un chemin 8-connexe entre deux pixels entre au moins une fois dans chaque
+        colonne (et chaque ligne) qui les sépare : la somme des coûts minimaux de
+        ces colonnes (resp. lignes) minore donc le coût des pixels traversés,
+        et la distance octile minore la longueur parcourue.
+
+        :param anchor: Indice à plat de la cible (ou de la source si ``reverse``).
+        :type anchor: int
+        :return: Minorants indexés à plat.
+        :rtype: list
+        """
+        grid = np.asarray(self.costs).reshape(-1, self.width)
+        anchor_row, anchor_col = divmod(anchor, self.width)
+        bounds = []
+        for axis, anchor_index in ((1, anchor_row), (0, anchor_col)):
+            minima = grid.min(axis=axis)
+            minima[np.isinf(minima)] = 0.0
+            prefix = np.concatenate(([0.0], np.cumsum(minima)))
+            index = np.arange(minima.size)
+            start, end = (anchor_index, index) if reverse else (index, np.full_like(index, anchor_index))
+            # Somme des minima sur ]start, end] si start < end, sur [end, start[ sinon
+            bounds.append(np.where(start < end, prefix[end + 1] - prefix[start + 1], prefix[start] - prefix[end]))
+        row_bound, col_bound = bounds
+
+        dr = np.abs(np.arange(grid.shape[0]) - anchor_row)[:, np.newaxis]
+        dc = np.abs(np.arange(grid.shape[1]) - anchor_col)[np.newaxis, :]
+        octile = np.maximum(dr, dc) + (SQRT2 - 1) * np.minimum(dr, dc)
+        h = np.maximum(row_bound[:, np.newaxis], col_bound[np.newaxis, :]) + self.step_cost * octile
+        return h.ravel().tolist()
+
+
+class SingleSourceSearch(_GridSearch):
+    """
+    Dijkstra à source unique, interrompu dès que la cible demandée est atteinte
+    et repris là où il s'était arrêté pour la cible suivante.
+
+    Les pixels déjà définitivement atteints sont servis par simple remontée
+    des prédécesseurs : tant que la source ne change pas, chaque nouvelle cible
+    ne coûte que l'expansion des pixels qui n'avaient pas encore été atteints.
+    """
+
+    def __init__(self, cost, source, step_cost=0.0):
+        """
+        :param cost: Grille de coûts (``inf`` = infranchissable).
+        :type cost: numpy.ndarray
+        :param source: Pixel source (ligne, colonne).
+        :type source: tuple
+        :param step_cost: Coût par pixel parcouru.
+        :type step_cost: float
+        """
+        super().__init__(cost, step_cost)
+        self.source = self._flat(*source)
+        self.dist = [INF] * len(self.costs)
+        self.pred = [-1] * len(self.costs)
+        self.closed = bytearray(len(self.costs))
+        self.heap = []
+        if self.costs[self.source] != INF:
+            self.dist[self.source] = 0.0
+            self.heap.append((0.0, self.source))
+
+    def settle(self, target):
+        """
+        Poursuit l'expansion jusqu'à ce que ``target`` (indice à plat) soit atteint.
+
+        :return: True si la cible est atteignable.
+        :rtype: bool
+        """
+        closed = self.closed
+        if closed[target]:
+            return True
+        if self.costs[target] == INF:
+            return False
+
+        costs, dist, pred, heap = self.costs, self.dist, self.pred, self.heap
+        steps = self.steps
+        heappop, heappush = heapq.heappop, heapq.heappush
+        while heap:
+            d, u = heappop(heap)
+            if closed[u]:
+                continue
+            closed[u] = 1
+            self.expanded += 1
+            for off, move in steps:
+                v = u + off
+                nd = d + costs[v] + move
+                if nd < dist[v]:
+                    dist[v] = nd
+                    pred[v] = u
+                    heappush(heap, (nd, v))
+            if u == target:
+                return True
+        return False
+
+    def path_to(self, row, col):
+        """
+        Chemin de moindre coût de la source jusqu'au pixel (ligne, colonne).
+
+        :return: Tableau (n, 2) des pixels du chemin, ou None s'il n'existe pas.
+        :rtype: numpy.ndarray
+        """
+        if not self.contains(row, col):
+            return None
+        target = self._flat(row, col)
+        if not self.settle(target):
+            return None
+        return _backtrack(self.pred, self.source, target, self.width)
+
+
+class AStarSearch(_GridSearch):
+    """
+    A* guidé par le minorant :meth:`_GridSearch.heuristic`.
+    """
+
+    def __init__(self, cost, source, target, step_cost=0.0):
+        """
+        :param cost: Grille de coûts (``inf`` = infranchissable).
+        :type cost: numpy.ndarray
+        :param source: Pixel de départ (ligne, colonne).
+        :type source: tuple
+        :param target: Pixel d'arrivée (ligne, colonne).
+        :type target: tuple
+        :param step_cost: Coût par pixel parcouru.
+        :type step_cost: float
+        """
+        super().__init__(cost, step_cost)
+        self.source = self._flat(*source)
+        self.target = self._flat(*target)
+
+    def run(self):
+        """
+        :return: Tableau (n, 2) des pixels du chemin, ou None s'il n'existe pas.
+        :rtype: numpy.ndarray
+        """
+        source, target = self.source, self.target
+        costs, steps = self.costs, self.steps
+        if costs[source] == INF or costs[target] == INF:
+            return None
+
+        h = self.heuristic(target)
+        dist = [INF] * len(costs)
+        pred = [-1] * len(costs)
+        closed = bytearray(len(costs))
+        dist[source] = 0.0
+        heap = [(h[source], 0.0, source)]
+        heappop, heappush = heapq.heappop, heapq.heappush
+        while heap:
+            _, d, u = heappop(heap)
+            if closed[u]:
+                continue
+            closed[u] = 1
+            self.expanded += 1
+            if u == target:
+                return _backtrack(pred, source, target, self.width)
+            for off, move in steps:
+                v = u + off
+                nd = d + costs[v] + move
+                if nd < dist[v]:
+                    dist[v] = nd
+                    pred[v] = u
+                    heappush(heap, (nd + h[v], nd, v))
+        return None
+
+
+class BidirectionalSearch(AStarSearch):
+    """
+    A* bidirectionnel à potentiels équilibrés.
+
+    Les recherches avant (depuis la source) et arrière (depuis la cible, sur les
+    arcs inversés) utilisent les potentiels ``(h_cible - h_source) / 2`` et son
+    opposé, ce qui garantit des coûts réduits positifs des deux côtés ; la
+    recherche s'arrête dès que la somme des deux sommets de tas atteint le
+    meilleur chemin déjà connu.
+    """
+
+    def run(self):
+        """
+        :return: Tableau (n, 2) des pixels du chemin, ou None s'il n'existe pas.
+        :rtype: numpy.ndarray
+        """
+        source, target = self.source, self.target
+        costs, steps = self.costs, self.steps
+        if costs[source] == INF or costs[target] == INF:
+            return None
+        if source == target:
+            return _backtrack([], source, target, self.width)
+
+        # Potentiels équilibrés
+        potential = ((np.array(self.heuristic(target)) - np.array(self.heuristic(source, reverse=True))) / 2).tolist()
+
+        n = len(costs)
+        # Distance depuis la source (avant) et jusqu'à la cible (arrière)
+        dist_f, dist_r = [INF] * n, [INF] * n
+        pred, succ = [-1] * n, [-1] * n
+        closed_f, closed_r = bytearray(n), bytearray(n)
+        dist_f[source] = 0.0
+        dist_r[target] = 0.0
+        heap_f = [(potential[source], 0.0, source)]
+        heap_r = [(-potential[target], 0.0, target)]
+        best, meeting = INF, -1
+        heappop, heappush = heapq.heappop, heapq.heappush
+
+        while heap_f and heap_r:
+            if heap_f[0][0] + heap_r[0][0] >= best:
+                break
+            if heap_f[0][0] <= heap_r[0][0]:
+                _, d, u = heappop(heap_f)
+                if closed_f[u]:
+                    continue
+                closed_f[u] = 1
+                self.expanded += 1
+                for off, move in steps:
+                    v = u + off
+                    nd = d + costs[v] + move
+                    if nd < dist_f[v]:
+                        dist_f[v] = nd
+                        pred[v] = u
+                        heappush(heap_f, (nd + potential[v], nd, v))
+                        if nd + dist_r[v] < best:
+                            best, meeting = nd + dist_r[v], v
+            else:
+                _, d, u = heappop(heap_r)
+                if closed_r[u]:
+                    continue
+                closed_r[u] = 1
+                self.expanded += 1
+                # Arc inversé v -> u : le coût est celui de l'entrée dans u
+                entry = costs[u]
+                for off, move in steps:
+                    v = u - off
+                    if costs[v] == INF:
+                        continue
+                    nd = d + entry + move
+                    if nd < dist_r[v]:
+                        dist_r[v] = nd
+                        succ[v] = u
+                        heappush(heap_r, (nd - potential[v], nd, v))
+                        if dist_f[v] + nd < best:
+                            best, meeting = dist_f[v] + nd, v
+
+        if meeting < 0:
+            return None
+        forward = _backtrack(pred, source, meeting, self.width)
+        node, tail = meeting, []
+        while node != target:
+            node = succ[node]
+            tail.append(node)
+        if not tail:
+            return forward
+        rows, cols = np.divmod(np.array(tail), self.width)
+        return np.vstack((forward, np.column_stack((rows - 1, cols - 1))))
+
+
+def _backtrack(pred, source, target, width):
+    """Remonte le tableau des prédécesseurs et retourne les pixels (ligne, colonne) non bordés."""
+    path = [target]
+    node = target
+    while node != source:
+        node = pred[node]
+        path.append(node)
+    flat = np.array(path[::-1])
+    r, c = np.divmod(flat, width)
+    return np.column_stack((r - 1, c - 1))
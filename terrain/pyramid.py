@@ -0,0 +1,89 @@
+"""
+pyramid.py
+
+Recherche de chemin multi-résolution : résolution sur un niveau réduit de la
+pyramide, puis affinage à pleine résolution dans un couloir étroit autour du
+chemin grossier.
+"""
+
+import math
+
+import numpy as np
+
+from .corridor import corridor_mask, dilate
+from .path_engine import ASTAR, elevation_cost, least_cost_path, nearest_valid_pixel
+
+
+def _window_path(reader, level, xoff, yoff, data, mask, start, end, algorithm, step_cost):
+    """Chemin de moindre coût dans une fenêtre du niveau ``level`` (pixels relatifs à la fenêtre)."""
+    cost = elevation_cost(data, mask)
+    valid = ~np.isinf(cost)
+    factor = 2 ** level
+    nodes = []
+    for x, y in (start, end):
+        col, row = reader.world_to_pixel(x, y)
+        nodes.append(nearest_valid_pixel(valid, math.floor(row / factor) - yoff,
+                                         math.floor(col / factor) - xoff))
+    if nodes[0] is None or nodes[1] is None:
+        return None
+    return least_cost_path(cost, nodes[0], nodes[1], algorithm, step_cost * factor)
+
+
+def coarse_to_fine_path(reader, start, end, corridor_width, levels, refine_width,
+                        algorithm=ASTAR, step_cost=0.0):
+    """
+    Chemin de plus haute altitude en deux passes (grossière puis pleine résolution).
+
+    :param reader: Lecteur du MNT.
+    :type reader: RasterWindowReader
+    :param start: Point de départ (x, y) dans le SCR du raster.
+    :type start: tuple
+    :param end: Point d'arrivée (x, y) dans le SCR du raster.
+    :type end: tuple
+    :param corridor_width: Demi-largeur du couloir de la passe grossière, en unités du SCR.
+    :type corridor_width: float
+    :param levels: Niveau de pyramide de la passe grossière (facteur 2^levels).
+    :type levels: int
+    :param refine_width: Demi-largeur du couloir d'affinage autour du chemin grossier.
+    :type refine_width: float
+    :param step_cost: Coût par pixel pleine résolution parcouru.
+    :type step_cost: float
+    :return: (pixels du chemin pleine résolution, colonne et ligne de la fenêtre)
+        ou None si aucun chemin n'est trouvé.
+    :rtype: tuple
+    """
+    gt = reader.geotransform
+    factor = 2 ** levels
+
+    # Passe grossière sur l'emprise du couloir
+    corners = [reader.world_to_pixel(x, y)
+               for x in (min(start[0], end[0]) - corridor_width, max(start[0], end[0]) + corridor_width)
+               for y in (min(start[1], end[1]) - corridor_width, max(start[1], end[1]) + corridor_width)]
+    xoff = math.floor(min(c for c, _ in corners) / factor)
+    yoff = math.floor(min(r for _, r in corners) / factor)
+    xsize = math.ceil(max(c for c, _ in corners) / factor) - xoff
+    ysize = math.ceil(max(r for _, r in corners) / factor) - yoff
+    if xsize <= 0 or ysize <= 0:
+        return None
+    coarse = reader.read_window(xoff, yoff, xsize, ysize, levels)
+    origin = reader.pixel_to_world(xoff * factor, yoff * factor)
+    pixel_size = (gt[1] * factor, gt[5] * factor)
+    mask = corridor_mask(coarse.shape, origin, pixel_size, start, end, corridor_width)
+    coarse_path = _window_path(reader, levels, xoff, yoff, coarse, mask, start, end, algorithm, step_cost)
+    if coarse_path is None:
+        return None
+
+    # Couloir d'affinage : pixels grossiers du chemin dilatés, ramenés à pleine résolution
+    on_path = np.zeros(coarse.shape, dtype=bool)
+    on_path[coarse_path[:, 0], coarse_path[:, 1]] = True
+    on_path = dilate(on_path, math.ceil(refine_width / abs(pixel_size[0])))
+    rows, cols = np.nonzero(on_path)
+    r0, r1, c0, c1 = rows.min(), rows.max() + 1, cols.min(), cols.max() + 1
+    refine_mask = np.kron(on_path[r0:r1, c0:c1], np.ones((factor, factor), dtype=bool))
+
+    fine_xoff, fine_yoff = (xoff + c0) * factor, (yoff + r0) * factor
+    fine = reader.read_window(fine_xoff, fine_yoff, refine_mask.shape[1], refine_mask.shape[0])
+    path = _window_path(reader, 0, fine_xoff, fine_yoff, fine, refine_mask, start, end, algorithm, step_cost)
+    if path is None:
+        return None
+    return path, fine_xoff, fine_yoff
@@ -0,0 +1,288 @@
+"""
+raster_window.py
+
+Accès persistant à une bande raster GDAL avec cache de blocs décodés.
+
+Le jeu de données reste ouvert pendant toute la session de tracé et les
+fenêtres demandées sont assemblées à partir de tuiles alignées sur les blocs
+natifs du fichier : des fenêtres successives qui se recouvrent ne décodent
+que les tuiles nouvelles.
+"""
+
+import math
+import threading
+
+import numpy as np
+
+from .lru import LRUCache
+from .sampling import NEAREST, sample_grid
+
+# Taille visée pour une tuile du cache, en pixels
+TILE_TARGET = 256
+# Largeur maximale d'une tuile (fichiers organisés en bandes de lignes)
+TILE_MAX_WIDTH = 1024
+
+
+def invert_geotransform(geotransform):
+    """
+    Inverse d'une géotransformation GDAL, calculée comme ``gdal.InvGeoTransform``.
+
+    :param geotransform: Géotransformation pixel -> monde.
+    :type geotransform: tuple
+    :return: Géotransformation monde -> pixel, ou None si elle n'est pas inversible.
+    :rtype: tuple
+    """
+    g0, g1, g2, g3, g4, g5 = geotransform
+    det = g1 * g5 - g2 * g4
+    if abs(det) < 1e-15:
+        return None
+    inv = 1.0 / det
+    return ((g2 * g3 - g0 * g5) * inv, g5 * inv, -g2 * inv,
+            (g0 * g4 - g1 * g3) * inv, -g4 * inv, g1 * inv)
+
+
+def _tile_length(block, target, cap=None):
+    """Multiple de la taille de bloc native le plus proche de ``target``."""
+    if cap is not None and block > cap:
+        return cap
+    if block >= target:
+        return block
+    return block * math.ceil(target / block)
+
+
+class RasterWindowReader:
+    """
+    Lecteur de fenêtres d'une bande raster, avec cache LRU de tuiles.
+    """
+
+    def __init__(self, source, band=1, cache_bytes=256 * 1024 ** 2):
+        """
+        :param source: Chemin ou URI GDAL du raster.
+        :type source: str
+        :param band: Numéro de la bande à lire.
+        :type band: int
+        :param cache_bytes: Budget mémoire du cache de tuiles, en octets.
+        :type cache_bytes: int
+        :raises IOError: Si le raster ne peut pas être ouvert.
+        """
+        # GDAL n'est importé qu'à l'ouverture d'un fichier : les lecteurs sur
+        # tableau (MNT synthétiques, tests) s'en passent
+        from osgeo import gdal
+
+        self.source = source
+        self.dataset = gdal.Open(source)
+        if self.dataset is None:
+            raise IOError(f"Impossible d'ouvrir le raster {source}")
+        self.band = self.dataset.GetRasterBand(band)
+        self.width = self.dataset.RasterXSize
+        self.height = self.dataset.RasterYSize
+        self.geotransform = self.dataset.GetGeoTransform()
+        self.inv_geotransform = invert_geotransform(self.geotransform)
+        if self.inv_geotransform is None:
+            raise IOError(f"Géotransformation non inversible pour {source}")
+        self.nodata = self.band.GetNoDataValue()
+
+        block_x, block_y = self.band.GetBlockSize()
+        self.tile_width = min(_tile_length(block_x, TILE_TARGET, TILE_MAX_WIDTH), self.width)
+        self.tile_height = min(_tile_length(block_y, TILE_TARGET), self.height)
+        self.cache = LRUCache(cache_bytes, sizeof=lambda tile: tile.nbytes)
+        # Un jeu de données GDAL ne doit pas être lu par deux threads à la fois
+        self.lock = threading.Lock()
+
+    def world_to_pixel(self, x, y):
+        """
+        Convertit des coordonnées du raster en coordonnées pixel (non arrondies).
+
+        :return: (colonne, ligne)
+        :rtype: tuple
+        """
+        gt = self.inv_geotransform
+        return gt[0] + x * gt[1] + y * gt[2], gt[3] + x * gt[4] + y * gt[5]
+
+    def pixel_to_world(self, col, row):
+        """
+        Convertit des coordonnées pixel (fractionnaires) en coordonnées du raster.
+
+        :return: (x, y)
+        :rtype: tuple
+        """
+        gt = self.geotransform
+        return gt[0] + col * gt[1] + row * gt[2], gt[3] + col * gt[4] + row * gt[5]
+
+    def level_size(self, level):
+        """
+        Dimensions de la bande au niveau de pyramide ``level``.
+
+        Au niveau k, un pixel couvre 2^k x 2^k pixels pleine résolution.
+
+        :return: (largeur, hauteur)
+        :rtype: tuple
+        """
+        factor = 2 ** level
+        return -(-self.width // factor), -(-self.height // factor)
+
+    def read_window(self, xoff, yoff, xsize, ysize, level=0):
+        """
+        Lit une fenêtre de la bande en float32.
+
+        Les pixels hors du raster et les pixels nodata valent NaN.
+
+        :param level: Niveau de pyramide ; les décalages et tailles sont alors
+            exprimés en pixels de ce niveau.
+        :type level: int
+        :return: Tableau (ysize, xsize).
+        :rtype: numpy.ndarray
+        """
+        with self.lock:
+            if self.dataset is None:
+                raise IOError(f"Raster fermé : {self.source}")
+            return self._assemble(xoff, yoff, xsize, ysize, level)
+
+    def _assemble(self, xoff, yoff, xsize, ysize, level):
+        """Assemble une fenêtre à partir des tuiles du niveau ``level`` (verrou acquis)."""
+        out = np.full((ysize, xsize), np.nan, dtype=np.float32)
+        width, height = self.level_size(level)
+        x0, y0 = max(xoff, 0), max(yoff, 0)
+        x1, y1 = min(xoff + xsize, width), min(yoff + ysize, height)
+        if x0 >= x1 or y0 >= y1:
+            return out
+
+        tw, th = self.tile_width, self.tile_height
+        for ty in range(y0 // th, (y1 - 1) // th + 1):
+            for tx in range(x0 // tw, (x1 - 1) // tw + 1):
+                tile = self._tile(tx, ty, level)
+                ox, oy = tx * tw, ty * th
+                sx0, sx1 = max(x0, ox), min(x1, ox + tile.shape[1])
+                sy0, sy1 = max(y0, oy), min(y1, oy + tile.shape[0])
+                out[sy0 - yoff:sy1 - yoff, sx0 - xoff:sx1 - xoff] = \
+                    tile[sy0 - oy:sy1 - oy, sx0 - ox:sx1 - ox]
+        return out
+
+    def sample(self, xs, ys, mode=NEAREST):
+        """
+        Échantillonne la bande en un ensemble de points du système du raster.
+
+        La plus petite fenêtre englobant les points est lue depuis le cache de
+        tuiles, puis échantillonnée en une seule passe.
+
+        :param xs: Abscisses des points.
+        :type xs: numpy.ndarray
+        :param ys: Ordonnées des points.
+        :type ys: numpy.ndarray
+        :param mode: ``'nearest'`` ou ``'bilinear'``.
+        :type mode: str
+        :return: Altitudes, NaN hors du raster ou sur nodata.
+        :rtype: numpy.ndarray
+        """
+        cols, rows = self.world_to_pixel(np.asarray(xs, dtype=np.float64),
+                                         np.asarray(ys, dtype=np.float64))
+        if cols.size == 0:
+            return np.empty(0)
+        # Une marge d'un pixel couvre les voisins de l'interpolation bilinéaire
+        xoff = max(int(np.floor(np.nanmin(cols))) - 1, 0)
+        yoff = max(int(np.floor(np.nanmin(rows))) - 1, 0)
+        xend = min(int(np.floor(np.nanmax(cols))) + 2, self.width)
+        yend = min(int(np.floor(np.nanmax(rows))) + 2, self.height)
+        if xoff >= xend or yoff >= yend:
+            return np.full(cols.shape, np.nan)
+        window = self.read_window(xoff, yoff, xend - xoff, yend - yoff)
+        values = sample_grid(window, cols - xoff, rows - yoff, mode)
+        # Les points hors du raster ne doivent pas être extrapolés depuis le bord
+        outside = (cols < 0) | (cols >= self.width) | (rows < 0) | (rows >= self.height)
+        values[outside] = np.nan
+        return values
+
+    def _tile(self, tx, ty, level=0):
+        """
+        Retourne la tuile (tx, ty) du niveau ``level``, calculée si elle n'est pas en cache.
+
+        Le niveau 0 est décodé depuis le fichier ; un niveau supérieur est
+        toujours construit en réduisant 2x2 le niveau inférieur par le maximum,
+        qui préserve les crêtes. Les aperçus GDAL, moyennés pour l'affichage,
+        ne sont pas utilisés : ils abaisseraient les crêtes de la passe grossière.
+        """
+        key = (level, tx, ty)
+        tile = self.cache.get(key)
+        if tile is None:
+            width, height = self.level_size(level)
+            ox, oy = tx * self.tile_width, ty * self.tile_height
+            w = min(self.tile_width, width - ox)
+            h = min(self.tile_height, height - oy)
+            if level == 0:
+                tile = self.band.ReadAsArray(ox, oy, w, h).astype(np.float32)
+                if self.nodata is not None:
+                    tile[tile == np.float32(self.nodata)] = np.nan
+            else:
+                finer = self._assemble(2 * ox, 2 * oy, 2 * w, 2 * h, level - 1)
+                tile = np.fmax(np.fmax(finer[0::2, 0::2], finer[0::2, 1::2]),
+                               np.fmax(finer[1::2, 0::2], finer[1::2, 1::2]))
+            self.cache.put(key, tile)
+        return tile
+
+    def stats(self):
+        """Statistiques du cache de tuiles (succès, échecs, taille...)."""
+        return self.cache.stats()
+
+    def close(self):
+        """Libère le cache et ferme le jeu de données."""
+        with self.lock:
+            self.cache.clear()
+            self.band = None
+            self.dataset = None
+
+
+class ArrayRasterReader(RasterWindowReader):
+    """
+    Lecteur de fenêtres sur un tableau d'altitudes en mémoire (MNT
+    synthétiques, mesures de performance), sans fichier GDAL.
+
+    Les niveaux de pyramide sont construits par réduction 2x2 au maximum,
+    comme pour un raster GDAL.
+    """
+
+    def __init__(self, array, geotransform=(0.0, 1.0, 0.0, 0.0, 0.0, -1.0), cache_bytes=64 * 1024 ** 2):
+        """
+        :param array: Altitudes (lignes, colonnes), NaN pour nodata.
+        :type array: numpy.ndarray
+        :param geotransform: Géotransformation GDAL du tableau.
+        :type geotransform: tuple
+        :raises IOError: Si la géotransformation n'est pas inversible.
+        """
+        self.source = '<tableau>'
+        self.array = np.asarray(array, dtype=np.float32)
+        self.dataset = None
+        self.band = None
+        self.height, self.width = self.array.shape
+        self.geotransform = tuple(geotransform)
+        self.inv_geotransform = invert_geotransform(self.geotransform)
+        if self.inv_geotransform is None:
+            raise IOError("Géotransformation non inversible")
+        self.nodata = None
+        self.tile_width = min(TILE_TARGET, self.width)
+        self.tile_height = min(TILE_TARGET, self.height)
+        self.cache = LRUCache(cache_bytes, sizeof=lambda tile: tile.nbytes)
+        self.lock = threading.Lock()
+
+    def read_window(self, xoff, yoff, xsize, ysize, level=0):
+        """
+        Lit une fenêtre du tableau en float32 (copie), NaN hors du tableau.
+
+        :rtype: numpy.ndarray
+        """
+        with self.lock:
+            if self.array is None:
+                raise IOError(f"Raster fermé : {self.source}")
+            return self._assemble(xoff, yoff, xsize, ysize, level)
+
+    def _tile(self, tx, ty, level=0):
+        """Tuile (tx, ty) ; au niveau 0, vue du tableau sans passer par le cache."""
+        if level > 0:
+            return super()._tile(tx, ty, level)
+        ox, oy = tx * self.tile_width, ty * self.tile_height
+        return self.array[oy:oy + self.tile_height, ox:ox + self.tile_width]
+
+    def close(self):
+        """Libère le cache de tuiles et le tableau."""
+        with self.lock:
+            self.cache.clear()
+            self.array = None
@@ -0,0 +1,163 @@
+"""
+ridge_index.py
+
+Index de crêtes précalculé d'un MNT : indice de position topographique (TPI,
+écart entre l'altitude d'un pixel et la moyenne de son voisinage), positif sur
+les crêtes et négatif dans les fonds de vallée.
+
+L'index est calculé tuile par tuile (mémoire bornée) et enregistré dans un
+fichier GeoTIFF annexe dont le nom dépend du chemin, de la date de
+modification et de la taille du MNT source : une modification du MNT
+invalide automatiquement l'index.
+"""
+
+import os
+
+import numpy as np
+
+from .raster_window import RasterWindowReader
+from .sidecar import remove_stale, sidecar_path
+
+# Côté des tuiles de calcul, en pixels
+BUILD_TILE = 1024
+SIDECAR_TAG = 'ridge'
+
+
+def box_sum(a, radius):
+    """
+    Somme de ``a`` sur un carré de demi-côté ``radius`` centré sur chaque pixel
+    (le carré est tronqué aux bords du tableau).
+
+    :rtype: numpy.ndarray
+    """
+    rows, cols = a.shape
+    integral = np.zeros((rows + 1, cols + 1))
+    integral[1:, 1:] = np.cumsum(np.cumsum(a, axis=0), axis=1)
+    r0 = np.clip(np.arange(rows) - radius, 0, rows)
+    r1 = np.clip(np.arange(rows) + radius + 1, 0, rows)
+    c0 = np.clip(np.arange(cols) - radius, 0, cols)
+    c1 = np.clip(np.arange(cols) + radius + 1, 0, cols)
+    return (integral[r1][:, c1] - integral[r0][:, c1]
+            - integral[r1][:, c0] + integral[r0][:, c0])
+
+
+def topographic_position_index(elevation, radius):
+    """
+    Indice de position topographique : altitude moins la moyenne des altitudes
+    valides du voisinage carré de demi-côté ``radius``.
+
+    :param elevation: Altitudes, NaN pour nodata.
+    :type elevation: numpy.ndarray
+    :param radius: Demi-côté du voisinage, en pixels.
+    :type radius: int
+    :return: TPI en float32, NaN sur nodata.
+    :rtype: numpy.ndarray
+    """
+    valid = ~np.isnan(elevation)
+    sums = box_sum(np.where(valid, elevation, 0.0), radius)
+    counts = box_sum(valid.astype(np.float64), radius)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        tpi = elevation - sums / counts
+    return tpi.astype(np.float32)
+
+
+def ridge_cost(tpi):
+    """
+    Coût positif associé à l'index de crêtes : nul sur le pixel le plus marqué
+    de la fenêtre, croissant vers les vallées ; nul sur nodata.
+
+    :rtype: numpy.ndarray
+    """
+    valid = ~np.isnan(tpi)
+    cost = np.zeros(tpi.shape)
+    if valid.any():
+        cost[valid] = tpi[valid].max() - tpi[valid]
+    return cost
+
+
+def snap_to_ridge(tpi, valid, row, col, radius):
+    """
+    Pixel valide d'index maximal dans un carré de demi-côté ``radius`` autour de
+    (row, col).
+
+    :return: (ligne, colonne), ou le pixel d'origine si aucun pixel n'est indexé.
+    :rtype: tuple
+    """
+    r0, c0 = max(row - radius, 0), max(col - radius, 0)
+    window = np.where(valid[r0:row + radius + 1, c0:col + radius + 1],
+                      tpi[r0:row + radius + 1, c0:col + radius + 1], np.nan)
+    if window.size == 0 or np.isnan(window).all():
+        return row, col
+    i, j = np.unravel_index(np.nanargmax(window), window.shape)
+    return r0 + int(i), c0 + int(j)
+
+
+def ridge_index_path(source, radius, cache_dir=None):
+    """
+    Chemin du fichier d'index de crêtes associé à un MNT.
+
+    Par défaut, l'index est placé à côté du MNT ; si ce répertoire n'est pas
+    accessible en écriture, dans le répertoire temporaire.
+
+    :rtype: str
+    """
+    return sidecar_path(source, SIDECAR_TAG, str(radius), cache_dir)
+
+
+def build_ridge_index(source, radius=15, cache_dir=None, progress=None, is_canceled=None):
+    """
+    Calcule l'index de crêtes d'un MNT, ou retourne l'index déjà en cache.
+
+    :param source: Chemin du MNT.
+    :type source: str
+    :param radius: Demi-côté du voisinage du TPI, en pixels.
+    :type radius: int
+    :param cache_dir: Répertoire de l'index (à côté du MNT par défaut).
+    :type cache_dir: str
+    :param progress: Fonction recevant l'avancement en pourcentage.
+    :type progress: function
+    :param is_canceled: Fonction indiquant si le calcul doit être interrompu.
+    :type is_canceled: function
+    :return: Chemin de l'index, ou None si le calcul a été interrompu.
+    :rtype: str
+    """
+    from osgeo import gdal
+
+    path = ridge_index_path(source, radius, cache_dir)
+    if os.path.exists(path):
+        return path
+
+    # Les index d'une version antérieure du MNT sont obsolètes
+    remove_stale(path)
+
+    reader = RasterWindowReader(source, cache_bytes=64 * 1024 ** 2)
+    partial = path + '.partial'
+    driver = gdal.GetDriverByName('GTiff')
+    output = driver.Create(partial, reader.width, reader.height, 1, gdal.GDT_Float32,
+                           ['TILED=YES', 'COMPRESS=DEFLATE', 'PREDICTOR=3', 'BIGTIFF=IF_SAFER'])
+    output.SetGeoTransform(reader.geotransform)
+    output.SetProjection(reader.dataset.GetProjection())
+    band = output.GetRasterBand(1)
+    band.SetNoDataValue(float('nan'))
+
+    tiles = [(x, y) for y in range(0, reader.height, BUILD_TILE) for x in range(0, reader.width, BUILD_TILE)]
+    for done, (x, y) in enumerate(tiles):
+        if is_canceled is not None and is_canceled():
+            band = output = None
+            reader.close()
+            os.remove(partial)
+            return None
+        w = min(BUILD_TILE, reader.width - x)
+        h = min(BUILD_TILE, reader.height - y)
+        # Marge de ``radius`` pixels pour que le voisinage soit complet en bord de tuile
+        window = reader.read_window(x - radius, y - radius, w + 2 * radius, h + 2 * radius)
+        tpi = topographic_position_index(window, radius)
+        band.WriteArray(tpi[radius:radius + h, radius:radius + w], x, y)
+        if progress is not None:
+            progress(100.0 * (done + 1) / len(tiles))
+
+    band.FlushCache()
+    band = output = None
+    reader.close()
+    os.replace(partial, path)
+    return path
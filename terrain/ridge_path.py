@@ -0,0 +1,358 @@
+"""
+ridge_path.py
+
+Chaîne de calcul du tracé assisté, sans dépendance à QGIS : fenêtre du
+couloir, coûts, recherche du chemin, coordonnées de ses pixels, profil et
+simplification.
+
+Toutes les coordonnées sont exprimées dans le système du raster ; l'outil de
+tracé se charge des reprojections depuis et vers le canevas. Chaque étape est
+mesurée dans l'objet :class:`~.metrics.Metrics` fourni (désactivé par défaut),
+sous les mêmes noms que dans l'outil et le banc de mesure.
+"""
+
+import math
+
+import numpy as np
+
+from .corridor import segment_distance
+from .metrics import Metrics
+from .path_engine import ASTAR, elevation_cost, nearest_valid_pixel, search_path
+from .ridge_index import ridge_cost, snap_to_ridge
+from .simplify import simplify_polyline
+
+# Mesures ignorées quand l'appelant n'en fournit pas
+_NO_METRICS = Metrics()
+# Part des pixels du chemin pressés contre le bord du couloir qui déclenche son élargissement
+PRESSED_SHARE = 0.05
+# Facteur d'élargissement du couloir : chaque élargissement relance toute la
+# recherche, un facteur élevé limite leur nombre
+CORRIDOR_GROWTH = 4.0
+
+
+def read_window(reader, xoff, yoff, xsize, ysize, metrics=None):
+    """
+    Lit une fenêtre du MNT en comptant les pixels lus.
+
+    :type reader: RasterWindowReader
+    :rtype: numpy.ndarray
+    """
+    metrics = metrics or _NO_METRICS
+    with metrics.timer('read'):
+        data_array = reader.read_window(xoff, yoff, xsize, ysize)
+    metrics.count('pixels_read', data_array.size)
+    return data_array
+
+
+def search_cost(data_array, mask, xoff, yoff, ridge_index=None, ridge_weight=1.0, metrics=None):
+    """
+    Grille de coûts d'une fenêtre du MNT pour la recherche de crête.
+
+    Si un index de crêtes est fourni, son coût pondéré par ``ridge_weight``
+    s'ajoute au coût d'altitude.
+
+    :param ridge_index: Lecteur de l'index de crêtes, ou None.
+    :type ridge_index: RasterWindowReader
+    :return: (coûts, index de crêtes de la fenêtre ou None)
+    :rtype: tuple
+    """
+    metrics = metrics or _NO_METRICS
+    with metrics.timer('cost'):
+        cost = elevation_cost(data_array, mask)
+        if ridge_index is None:
+            return cost, None
+        ridge = ridge_index.read_window(xoff, yoff, data_array.shape[1], data_array.shape[0])
+        return cost + ridge_weight * ridge_cost(ridge), ridge
+
+
+def corridor_window(reader, start, end, corridor_width):
+    """
+    Fenêtre pixel englobant le couloir autour du segment [start, end].
+
+    :return: (colonne, ligne, largeur, hauteur), ou None pour une fenêtre vide.
+    :rtype: tuple
+    """
+    xmin = min(start[0], end[0]) - corridor_width
+    xmax = max(start[0], end[0]) + corridor_width
+    ymin = min(start[1], end[1]) - corridor_width
+    ymax = max(start[1], end[1]) + corridor_width
+
+    xoff1, yoff1 = reader.world_to_pixel(xmin, ymax)
+    xoff2, yoff2 = reader.world_to_pixel(xmax, ymin)
+    xoff = int(min(xoff1, xoff2))
+    yoff = int(min(yoff1, yoff2))
+    xsize = int(abs(xoff2 - xoff1))
+    ysize = int(abs(yoff2 - yoff1))
+    if xsize == 0 or ysize == 0:
+        return None
+    return xoff, yoff, xsize, ysize
+
+
+def _corridor_search(cost, ridge, origin, pixel_size, start, end, algorithm, step_cost,
+                     snap_radius, metrics):
+    """Chemin de moindre coût d'une grille dont l'origine est ``origin`` (pixels relatifs à la grille)."""
+    valid = ~np.isinf(cost)
+    # Pixels valides les plus proches des points de départ et d'arrivée
+    start_node = nearest_valid_pixel(valid, math.floor((start[1] - origin[1]) / pixel_size[1]),
+                                     math.floor((start[0] - origin[0]) / pixel_size[0]))
+    end_node = nearest_valid_pixel(valid, math.floor((end[1] - origin[1]) / pixel_size[1]),
+                                   math.floor((end[0] - origin[0]) / pixel_size[0]))
+    if start_node is None or end_node is None:
+        return None
+    # Accrocher l'extrémité libre à la crête la plus marquée à proximité
+    if ridge is not None:
+        end_node = snap_to_ridge(ridge, valid, *end_node, snap_radius)
+
+    with metrics.timer('search'):
+        path, expanded = search_path(cost, start_node, end_node, algorithm, step_cost)
+    metrics.count('nodes_expanded', expanded)
+    return path
+
+
+class _CorridorGrid:
+    """
+    Fenêtre du MNT autour du segment départ/arrivée, lue au fur et à mesure de
+    l'élargissement du couloir.
+
+    Les tableaux sont alloués pour le couloir le plus large, mais seule la
+    partie couvrant le couloir courant, bordée d'un pixel, est lue : un
+    élargissement ne lit et ne calcule que les bandes ajoutées autour de la
+    partie déjà lue. Les coûts des pixels déjà dans le couloir ne sont
+    recalculés que si l'altitude de référence du coût augmente.
+    """
+
+    def __init__(self, reader, start, end, max_width, ridge_index=None, ridge_weight=1.0, metrics=None):
+        """
+        :param max_width: Demi-largeur maximale du couloir, en unités du SCR.
+        :type max_width: float
+        :param ridge_index: Lecteur de l'index de crêtes, ou None.
+        :type ridge_index: RasterWindowReader
+        """
+        self.reader = reader
+        self.start = start
+        self.end = end
+        self.ridge_index = ridge_index
+        self.ridge_weight = ridge_weight
+        self.metrics = metrics or _NO_METRICS
+        gt = reader.geotransform
+        self.pixel_size = (gt[1], gt[5])
+        # Un pixel plus proche du bord que sa diagonale touche le bord
+        self.edge = math.hypot(gt[1], gt[5])
+
+        self.window = corridor_window(reader, start, end, max_width + self.edge)
+        if self.window is None:
+            return
+        self.xoff, self.yoff, xsize, ysize = self.window
+        self.origin = (gt[0] + self.xoff * gt[1], gt[3] + self.yoff * gt[5])
+        self.elevation = np.empty((ysize, xsize), dtype=np.float32)
+        self.ridge = np.empty((ysize, xsize), dtype=np.float32) if ridge_index is not None else None
+        self.distance = np.empty((ysize, xsize))
+        self.cost = np.empty((ysize, xsize))
+        # Partie lue (ligne, ligne de fin, colonne, colonne de fin), demi-largeur
+        # du couloir et références des coûts d'altitude et de crête
+        self.bounds = None
+        self.width = 0.0
+        self.elevation_ref = -np.inf
+        self.ridge_ref = -np.inf
+
+    def _pixel_cost(self, rows, cols):
+        """Coûts des pixels (rows, cols) pour les références courantes, NaN sur nodata."""
+        cost = self.elevation_ref - self.elevation[rows, cols].astype(np.float64)
+        if self.ridge is not None:
+            tpi = self.ridge[rows, cols]
+            cost += self.ridge_weight * np.where(np.isnan(tpi), 0.0, self.ridge_ref - tpi)
+        return cost
+
+    def grow(self, width):
+        """
+        Étend la partie lue au couloir de demi-largeur ``width``.
+
+        :return: Tranches (lignes, colonnes) de la partie lue, ou None si elle est vide.
+        :rtype: tuple
+        """
+        sub = corridor_window(self.reader, self.start, self.end, width + self.edge)
+        if sub is None:
+            return None
+        ysize, xsize = self.cost.shape
+        r0, c0 = max(sub[1] - self.yoff, 0), max(sub[0] - self.xoff, 0)
+        r1, c1 = min(sub[1] + sub[3] - self.yoff, ysize), min(sub[0] + sub[2] - self.xoff, xsize)
+        if self.bounds is None:
+            strips = [(r0, r1, c0, c1)]
+        else:
+            # Bandes ajoutées autour de la partie déjà lue
+            b_r0, b_r1, b_c0, b_c1 = self.bounds
+            r0, r1, c0, c1 = min(r0, b_r0), max(r1, b_r1), min(c0, b_c0), max(c1, b_c1)
+            strips = [(r0, b_r0, c0, c1), (b_r1, r1, c0, c1), (b_r0, b_r1, c0, b_c0), (b_r0, b_r1, b_c1, c1)]
+        strips = [strip for strip in strips if strip[0] < strip[1] and strip[2] < strip[3]]
+        if r0 >= r1 or c0 >= c1:
+            return None
+
+        with self.metrics.timer('read'):
+            for sr0, sr1, sc0, sc1 in strips:
+                args = (self.xoff + sc0, self.yoff + sr0, sc1 - sc0, sr1 - sr0)
+                self.elevation[sr0:sr1, sc0:sc1] = self.reader.read_window(*args)
+                if self.ridge is not None:
+                    self.ridge[sr0:sr1, sc0:sc1] = self.ridge_index.read_window(*args)
+                self.metrics.count('pixels_read', (sr1 - sr0) * (sc1 - sc0))
+
+        with self.metrics.timer('cost'):
+            elevation_ref, ridge_ref = self.elevation_ref, self.ridge_ref
+            for sr0, sr1, sc0, sc1 in strips:
+                origin = (self.origin[0] + sc0 * self.pixel_size[0], self.origin[1] + sr0 * self.pixel_size[1])
+                self.distance[sr0:sr1, sc0:sc1] = segment_distance((sr1 - sr0, sc1 - sc0), origin,
+                                                                   self.pixel_size, self.start, self.end)
+                self.cost[sr0:sr1, sc0:sc1] = np.inf
+                if self.ridge is not None:
+                    tpi = self.ridge[sr0:sr1, sc0:sc1]
+                    if not np.isnan(tpi).all():
+                        self.ridge_ref = max(self.ridge_ref, float(np.nanmax(tpi)))
+
+            rows, cols = slice(r0, r1), slice(c0, c1)
+            distance = self.distance[rows, cols]
+            inside = (distance < width) & ~np.isnan(self.elevation[rows, cols])
+            added = inside & (distance >= self.width)
+            if added.any():
+                self.elevation_ref = max(self.elevation_ref, float(self.elevation[rows, cols][added].max()))
+            # Une référence plus haute décale les coûts de tout le couloir
+            if self.elevation_ref != elevation_ref or self.ridge_ref != ridge_ref:
+                added = inside
+            added_rows, added_cols = np.nonzero(added)
+            added_rows += r0
+            added_cols += c0
+            self.cost[added_rows, added_cols] = self._pixel_cost(added_rows, added_cols)
+
+        self.bounds = (r0, r1, c0, c1)
+        self.width = width
+        return rows, cols
+
+    def pressed_against_edge(self, path, share=PRESSED_SHARE):
+        """
+        Indique si un chemin longe le bord du couloir courant : au moins une
+        part ``share`` de ses pixels touche le bord et jouxte un pixel, juste
+        au-delà, moins coûteux qu'eux. Un couloir plus large pourrait alors
+        donner un meilleur chemin ; un pixel isolé plus haut hors du couloir,
+        dû au bruit du MNT, ne suffit pas.
+
+        :param path: Pixels (ligne, colonne) du chemin dans la fenêtre.
+        :type path: numpy.ndarray
+        :param share: Part minimale des pixels du chemin pressés contre le bord.
+        :type share: float
+        :rtype: bool
+        """
+        distance = self.distance
+        touching = path[distance[path[:, 0], path[:, 1]] > self.width - self.edge]
+        own = self.cost[touching[:, 0], touching[:, 1]]
+        pressed = np.zeros(len(touching), dtype=bool)
+        # La partie lue est bordée d'un pixel au-delà du couloir
+        r0, r1, c0, c1 = self.bounds
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                r = np.clip(touching[:, 0] + dr, r0, r1 - 1)
+                c = np.clip(touching[:, 1] + dc, c0, c1 - 1)
+                beyond = distance[r, c] >= self.width
+                pressed[beyond] |= self._pixel_cost(r[beyond], c[beyond]) < own[beyond]
+        return np.count_nonzero(pressed) >= max(1.0, share * len(path))
+
+
+def highest_path(reader, start, end, corridor_width, algorithm=ASTAR, step_cost=0.0,
+                 ridge_index=None, ridge_weight=1.0, snap_radius=2, metrics=None, max_width=None):
+    """
+    Chemin de plus haute altitude entre deux points, dans un couloir autour du
+    segment qui les relie.
+
+    Le couloir a d'abord une demi-largeur ``corridor_width``. Si le chemin
+    longe son bord et que des pixels plus hauts se trouvent juste au-delà, le
+    couloir est élargi d'un facteur ``CORRIDOR_GROWTH``, jusqu'à ``max_width``,
+    et le chemin recalculé : seules les bandes ajoutées au couloir sont lues
+    dans le MNT.
+
+    :param reader: Lecteur du MNT.
+    :type reader: RasterWindowReader
+    :param start: Point de départ (x, y) dans le SCR du raster.
+    :type start: tuple
+    :param end: Point d'arrivée (x, y) dans le SCR du raster.
+    :type end: tuple
+    :param corridor_width: Demi-largeur initiale du couloir, en unités du SCR.
+    :type corridor_width: float
+    :param step_cost: Coût par pixel parcouru.
+    :type step_cost: float
+    :param ridge_index: Lecteur de l'index de crêtes, ou None.
+    :type ridge_index: RasterWindowReader
+    :param snap_radius: Rayon, en pixels, d'accrochage de l'arrivée à la crête.
+    :type snap_radius: int
+    :type metrics: Metrics
+    :param max_width: Demi-largeur maximale du couloir (``corridor_width`` par
+        défaut : couloir fixe).
+    :type max_width: float
+    :return: (pixels (ligne, colonne) du chemin relatifs à la fenêtre, colonne
+        et ligne de la fenêtre), ou None si aucun chemin n'est trouvé.
+    :rtype: tuple
+    """
+    metrics = metrics or _NO_METRICS
+    max_width = max(corridor_width, max_width or corridor_width)
+    grid = _CorridorGrid(reader, start, end, max_width, ridge_index, ridge_weight, metrics)
+    if grid.window is None:
+        return None
+
+    width = corridor_width
+    while True:
+        part = grid.grow(width)
+        if part is not None:
+            rows, cols = part
+            path = _corridor_search(grid.cost[rows, cols], grid.ridge[rows, cols] if grid.ridge is not None else None,
+                                    (grid.origin[0] + cols.start * grid.pixel_size[0],
+                                     grid.origin[1] + rows.start * grid.pixel_size[1]),
+                                    grid.pixel_size, start, end, algorithm, step_cost, snap_radius, metrics)
+            if path is not None:
+                path = path + (rows.start, cols.start)
+                if width >= max_width or not grid.pressed_against_edge(path):
+                    return path, grid.xoff, grid.yoff
+        if width >= max_width:
+            return None
+        metrics.count('corridor_widenings')
+        width = min(CORRIDOR_GROWTH * width, max_width)
+
+
+def path_points(reader, path, xoff, yoff):
+    """
+    Coordonnées des centres des pixels d'un chemin.
+
+    :param path: Pixels (ligne, colonne) relatifs à la fenêtre.
+    :type path: numpy.ndarray
+    :return: Coordonnées (n, 2) dans le SCR du raster.
+    :rtype: numpy.ndarray
+    """
+    xs, ys = reader.pixel_to_world(xoff + path[:, 1] + 0.5, yoff + path[:, 0] + 0.5)
+    return np.column_stack((xs, ys))
+
+
+def elevation_profile(xy, elevations):
+    """
+    Distances cumulées le long d'une polyligne et altitudes de ses sommets.
+
+    :param xy: Coordonnées (n, 2) des sommets.
+    :type xy: numpy.ndarray
+    :param elevations: Altitudes des sommets, NaN pour nodata.
+    :type elevations: numpy.ndarray
+    :return: (distances, altitudes avec nodata ramené à 0)
+    :rtype: tuple
+    """
+    xy = np.asarray(xy, dtype=np.float64)
+    distances = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(xy, axis=0).T))))
+    return distances, np.nan_to_num(elevations, nan=0.0)
+
+
+def simplify_path(xy, elevations, tolerance):
+    """
+    Simplifie une polyligne en conservant les sommets locaux qui dominent les
+    points situés à moins de ``tolerance`` de part et d'autre.
+
+    :return: Indices croissants des sommets conservés.
+    :rtype: numpy.ndarray
+    """
+    xy = np.asarray(xy, dtype=np.float64)
+    if len(xy) <= 2:
+        return np.arange(len(xy))
+    step = float(np.median(np.hypot(*np.diff(xy, axis=0).T)))
+    peak_radius = math.ceil(tolerance / step) if step > 0 else 1
+    return simplify_polyline(xy, elevations, tolerance, peak_radius)
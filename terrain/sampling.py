@@ -0,0 +1,60 @@
+"""
+sampling.py
+
+Échantillonnage vectorisé d'une grille d'altitudes en coordonnées pixel.
+"""
+
+import numpy as np
+
+NEAREST = 'nearest'
+BILINEAR = 'bilinear'
+
+
+def sample_grid(grid, cols, rows, mode=NEAREST):
+    """
+    Échantillonne une grille en des positions pixel fractionnaires.
+
+    Le pixel (i, j) couvre ``[j, j + 1[ x [i, i + 1[`` ; son centre est en
+    ``(j + 0.5, i + 0.5)``. Les positions hors de la grille valent NaN, et en
+    mode bilinéaire tout voisin NaN (nodata) donne NaN.
+
+    :param grid: Grille d'altitudes (NaN pour nodata).
+    :type grid: numpy.ndarray
+    :param cols: Colonnes fractionnaires.
+    :type cols: numpy.ndarray
+    :param rows: Lignes fractionnaires.
+    :type rows: numpy.ndarray
+    :param mode: ``'nearest'`` ou ``'bilinear'``.
+    :type mode: str
+    :return: Altitudes échantillonnées (float64).
+    :rtype: numpy.ndarray
+    """
+    cols = np.asarray(cols, dtype=np.float64)
+    rows = np.asarray(rows, dtype=np.float64)
+    height, width = grid.shape
+    out = np.full(cols.shape, np.nan)
+
+    if mode == NEAREST:
+        j = np.floor(cols).astype(np.int64)
+        i = np.floor(rows).astype(np.int64)
+        inside = (i >= 0) & (i < height) & (j >= 0) & (j < width)
+        out[inside] = grid[i[inside], j[inside]]
+        return out
+
+    if mode != BILINEAR:
+        raise ValueError(f"Mode d'échantillonnage inconnu : {mode}")
+
+    # Interpolation entre les centres de pixels, bornée aux centres extrêmes
+    inside = (cols >= 0) & (cols <= width) & (rows >= 0) & (rows <= height)
+    fx = np.clip(cols[inside] - 0.5, 0, width - 1)
+    fy = np.clip(rows[inside] - 0.5, 0, height - 1)
+    j0 = np.minimum(np.floor(fx).astype(np.int64), max(width - 2, 0))
+    i0 = np.minimum(np.floor(fy).astype(np.int64), max(height - 2, 0))
+    j1 = np.minimum(j0 + 1, width - 1)
+    i1 = np.minimum(i0 + 1, height - 1)
+    tx = fx - j0
+    ty = fy - i0
+    top = grid[i0, j0] * (1 - tx) + grid[i0, j1] * tx
+    bottom = grid[i1, j0] * (1 - tx) + grid[i1, j1] * tx
+    out[inside] = top * (1 - ty) + bottom * ty
+    return out
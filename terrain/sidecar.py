@@ -0,0 +1,62 @@
+"""
+sidecar.py
+
+Fichiers annexes (caches) dérivés d'un raster source.
+
+Le nom d'un fichier annexe contient une empreinte du chemin, de la date de
+modification et de la taille du raster source ainsi que des paramètres du
+calcul : toute modification de la source produit un nouveau nom, et les
+annexes obsolètes peuvent être supprimées.
+"""
+
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+
+
+def sidecar_path(source, tag, params='', cache_dir=None, extension='.tif'):
+    """
+    Chemin du fichier annexe ``tag`` d'un raster.
+
+    Par défaut, l'annexe est placée à côté du raster ; si ce répertoire n'est
+    pas accessible en écriture, dans le répertoire temporaire.
+
+    :param source: Chemin du raster source.
+    :type source: str
+    :param tag: Nature de l'annexe (``'ridge'``, ``'hydro'``...).
+    :type tag: str
+    :param params: Paramètres du calcul entrant dans l'empreinte.
+    :type params: str
+    :param extension: Extension du fichier, vide pour un répertoire.
+    :type extension: str
+    :rtype: str
+    """
+    stat = os.stat(source)
+    key = f"{os.path.abspath(source)}|{stat.st_mtime_ns}|{stat.st_size}|{params}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+    if cache_dir is None:
+        cache_dir = os.path.dirname(os.path.abspath(source))
+        if not os.access(cache_dir, os.W_OK):
+            cache_dir = tempfile.gettempdir()
+    return os.path.join(cache_dir, f"{os.path.basename(source)}.{tag}_{digest}{extension}")
+
+
+def remove_stale(path):
+    """
+    Supprime les annexes de même nature que ``path`` issues d'une autre
+    version de la source ou d'autres paramètres.
+    """
+    directory, name = os.path.split(path)
+    prefix = name[:name.rindex('_') + 1]
+    for stale in glob.glob(os.path.join(glob.escape(directory), glob.escape(prefix) + '*')):
+        if stale == path:
+            continue
+        try:
+            if os.path.isdir(stale):
+                shutil.rmtree(stale)
+            else:
+                os.remove(stale)
+        except OSError:
+            pass
@@ -0,0 +1,85 @@
+"""
+simplify.py
+
+Simplification de Douglas-Peucker d'une polyligne qui conserve, dans l'ordre,
+les sommets locaux de son profil d'altitude.
+"""
+
+import numpy as np
+
+
+def local_maxima(elevations, radius):
+    """
+    Sommets locaux d'un profil : points plus hauts que tous ceux situés à
+    moins de ``radius`` sommets de part et d'autre (le premier point d'un
+    plateau est retenu).
+
+    :param elevations: Altitudes des sommets, NaN pour nodata.
+    :type elevations: numpy.ndarray
+    :param radius: Demi-largeur du voisinage, en nombre de sommets.
+    :type radius: int
+    :return: Masque booléen des sommets locaux.
+    :rtype: numpy.ndarray
+    """
+    z = np.where(np.isnan(elevations), -np.inf, elevations)
+    n = len(z)
+    radius = max(int(radius), 1)
+    padded = np.concatenate((np.full(radius, -np.inf), z, np.full(radius, -np.inf)))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, radius)
+    left = windows[:n].max(axis=1)
+    right = windows[radius + 1:radius + 1 + n].max(axis=1)
+    return (z > left) & (z >= right) & np.isfinite(z)
+
+
+def simplify_polyline(xy, elevations, tolerance, peak_radius=1):
+    """
+    Simplifie une polyligne par Douglas-Peucker en conservant ses sommets locaux.
+
+    Les extrémités et les sommets locaux servent de points d'ancrage initiaux.
+    Chaque itération découpe simultanément tous les tronçons en leur point le
+    plus éloigné de la corde, tant que cet écart dépasse ``tolerance`` ; le
+    nombre d'itérations est la profondeur de la récursion de Douglas-Peucker.
+
+    :param xy: Coordonnées (n, 2) des sommets.
+    :type xy: numpy.ndarray
+    :param elevations: Altitudes des n sommets.
+    :type elevations: numpy.ndarray
+    :param tolerance: Écart maximal à la polyligne d'origine, en unités de ``xy``.
+    :type tolerance: float
+    :param peak_radius: Demi-largeur, en sommets, du voisinage des sommets locaux.
+    :type peak_radius: int
+    :return: Indices croissants des sommets conservés.
+    :rtype: numpy.ndarray
+    """
+    xy = np.asarray(xy, dtype=np.float64)
+    n = len(xy)
+    if n <= 2:
+        return np.arange(n)
+
+    keep = local_maxima(np.asarray(elevations, dtype=np.float64), peak_radius)
+    keep[0] = keep[-1] = True
+    index = np.arange(n)
+    while True:
+        anchors = np.flatnonzero(keep)
+        if len(anchors) == n:
+            break
+        # Tronçon [a, b] de chaque sommet
+        segment = np.minimum(np.searchsorted(anchors, index, side='right') - 1, len(anchors) - 2)
+        a, b = xy[anchors[segment]], xy[anchors[segment + 1]]
+
+        # Distance de chaque sommet à la corde de son tronçon
+        ab = b - a
+        ap = xy - a
+        length2 = np.einsum('ij,ij->i', ab, ab)
+        t = np.clip(np.einsum('ij,ij->i', ap, ab) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+        distance = np.hypot(*(ap - t[:, np.newaxis] * ab).T)
+        distance[keep] = 0.0
+
+        # Premier sommet le plus éloigné de chaque tronçon, s'il dépasse la tolérance
+        farthest = np.maximum.reduceat(distance, anchors[:-1])
+        candidates = np.flatnonzero((distance == farthest[segment]) & (distance > tolerance))
+        if candidates.size == 0:
+            break
+        _, first = np.unique(segment[candidates], return_index=True)
+        keep[candidates[first]] = True
+    return np.flatnonzero(keep)
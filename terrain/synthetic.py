@@ -0,0 +1,106 @@
+"""
+synthetic.py
+
+MNT synthétiques reproductibles pour les comparaisons et mesures de performance.
+"""
+
+import numpy as np
+
+
+def ridge_dem(shape, seed=0, noise=1.0):
+    """
+    MNT traversé d'une crête sinueuse orientée ouest-est, légèrement montante.
+
+    :param shape: Dimensions (lignes, colonnes).
+    :type shape: tuple
+    :param seed: Graine du bruit.
+    :type seed: int
+    :param noise: Amplitude du bruit uniforme, en mètres.
+    :type noise: float
+    :return: Altitudes en float32.
+    :rtype: numpy.ndarray
+    """
+    rows, cols = shape
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:rows, 0:cols]
+    crest = rows / 2 + rows / 12 * np.sin(x / max(cols / 10, 1))
+    z = 100 - 0.5 * np.abs(y - crest) + 0.05 * x + noise * rng.random(shape)
+    return z.astype(np.float32)
+
+
+def plateau_dem(shape, seed=0, noise=1.0):
+    """
+    MNT en terrasses : la crête de :func:`ridge_dem` écrêtée en paliers plats,
+    où de nombreux chemins ont le même coût.
+
+    :rtype: numpy.ndarray
+    """
+    z = ridge_dem(shape, seed, noise=0.0)
+    rng = np.random.default_rng(seed + 1)
+    z = np.minimum(z, np.float32(np.percentile(z, 85)))
+    z = np.floor(z / 5) * 5 + noise * rng.random(shape)
+    return z.astype(np.float32)
+
+
+def noise_dem(shape, seed=0, octaves=5, amplitude=50.0):
+    """
+    Relief aléatoire multi-échelle : somme d'octaves de bruit uniforme
+    agrandies par répétition de pixels, sans direction privilégiée.
+
+    :param octaves: Nombre d'octaves ; la plus grossière a des cellules de 2^octaves pixels.
+    :type octaves: int
+    :param amplitude: Amplitude de l'octave la plus grossière, en mètres.
+    :type amplitude: float
+    :rtype: numpy.ndarray
+    """
+    rows, cols = shape
+    rng = np.random.default_rng(seed)
+    z = np.zeros(shape, dtype=np.float64)
+    for octave in range(octaves, -1, -1):
+        cell = 2 ** octave
+        coarse = rng.random((-(-rows // cell), -(-cols // cell)))
+        z += amplitude * 2.0 ** (octave - octaves) * np.kron(coarse, np.ones((cell, cell)))[:rows, :cols]
+    return z.astype(np.float32)
+
+
+def with_nodata_holes(dem, count=20, radius=None, seed=0):
+    """
+    Copie d'un MNT percée de trous circulaires nodata (NaN).
+
+    :param count: Nombre de trous.
+    :type count: int
+    :param radius: Rayon des trous en pixels (1/40 du plus grand côté par défaut).
+    :type radius: float
+    :rtype: numpy.ndarray
+    """
+    rows, cols = dem.shape
+    if radius is None:
+        radius = max(rows, cols) / 40
+    rng = np.random.default_rng(seed)
+    holed = dem.copy()
+    for cy, cx in zip(rng.uniform(0, rows, count), rng.uniform(0, cols, count)):
+        r0, r1 = max(int(cy - radius), 0), min(int(cy + radius) + 1, rows)
+        c0, c1 = max(int(cx - radius), 0), min(int(cx + radius) + 1, cols)
+        y, x = np.ogrid[r0:r1, c0:c1]
+        holed[r0:r1, c0:c1][(y - cy) ** 2 + (x - cx) ** 2 < radius ** 2] = np.nan
+    return holed
+
+
+# Relief des MNT synthétiques disponibles, par nom
+KINDS = {
+    'ridge': ridge_dem,
+    'plateau': plateau_dem,
+    'noise': noise_dem,
+    'holes': lambda shape, seed=0: with_nodata_holes(ridge_dem(shape, seed), seed=seed),
+}
+
+
+def synthetic_dem(kind, shape, seed=0):
+    """
+    MNT synthétique du relief ``kind`` (voir :data:`KINDS`).
+
+    :rtype: numpy.ndarray
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Relief synthétique inconnu : {kind}")
+    return KINDS[kind](shape, seed)
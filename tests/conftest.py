@@ -0,0 +1,9 @@
+"""
+Configuration des tests : le paquet ``terrain`` est importé depuis le
+répertoire du plugin, sans QGIS ni GDAL.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
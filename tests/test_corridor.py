@@ -0,0 +1,46 @@
+"""
+Tests du masque de couloir et de la dilatation.
+"""
+
+import numpy as np
+import pytest
+
+from terrain.corridor import corridor_mask, dilate, segment_distance
+
+
+def brute_force_distance(shape, origin, pixel_size, start, end):
+    rows, cols = shape
+    a, b = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+    out = np.empty(shape)
+    for r in range(rows):
+        for c in range(cols):
+            p = np.array((origin[0] + (c + 0.5) * pixel_size[0], origin[1] + (r + 0.5) * pixel_size[1]))
+            ab = b - a
+            t = 0.0 if not ab.any() else min(max((p - a) @ ab / (ab @ ab), 0.0), 1.0)
+            out[r, c] = np.hypot(*(p - a - t * ab))
+    return out
+
+
+@pytest.mark.parametrize('start, end', [((3.0, -4.0), (25.0, -17.0)), ((10.0, -10.0), (10.0, -10.0))])
+def test_segment_distance_matches_brute_force(start, end):
+    shape, origin, pixel_size = (20, 30), (0.0, 0.0), (1.0, -1.0)
+    np.testing.assert_allclose(segment_distance(shape, origin, pixel_size, start, end),
+                               brute_force_distance(shape, origin, pixel_size, start, end))
+
+
+def test_corridor_mask_is_distance_threshold():
+    shape, origin, pixel_size = (25, 25), (100.0, 200.0), (2.0, -2.0)
+    start, end = (105.0, 195.0), (140.0, 160.0)
+    mask = corridor_mask(shape, origin, pixel_size, start, end, 6.0)
+    expected = brute_force_distance(shape, origin, pixel_size, start, end) < 6.0
+    np.testing.assert_array_equal(mask, expected)
+
+
+@pytest.mark.parametrize('radius', [0, 1, 3, 40])
+def test_dilate_matches_brute_force(radius):
+    rng = np.random.default_rng(radius)
+    mask = rng.random((30, 35)) < 0.03
+    expected = np.zeros_like(mask)
+    for r, c in zip(*np.nonzero(mask)):
+        expected[max(r - radius, 0):r + radius + 1, max(c - radius, 0):c + radius + 1] = True
+    np.testing.assert_array_equal(dilate(mask, radius), expected)
@@ -0,0 +1,125 @@
+"""
+Tests des directions d'écoulement et de l'accumulation de flux.
+"""
+
+import heapq
+
+import numpy as np
+import pytest
+
+from terrain.hydrology import (NODATA, UNVISITED, _flat_offsets, flow_accumulation,
+                               flow_directions)
+from terrain.path_engine import NEIGHBOR_OFFSETS
+from terrain.synthetic import plateau_dem, synthetic_dem
+
+DEMS = {
+    'ridge': synthetic_dem('ridge', (60, 70), seed=1),
+    'noise': synthetic_dem('noise', (64, 64), seed=2),
+    'plateau': synthetic_dem('plateau', (50, 60), seed=3),
+    'holes': synthetic_dem('holes', (60, 60), seed=4),
+    'exact plateau': plateau_dem((40, 50), noise=0.0),
+    'flat': np.zeros((30, 40), dtype=np.float32),
+    'integer noise': np.round(np.random.default_rng(5).random((40, 45)) * 3).astype(np.float32),
+}
+
+
+def bordered(dem):
+    """MNT bordé d'un pixel NaN, comme dans build_flow_grids."""
+    elevation = np.full((dem.shape[0] + 2, dem.shape[1] + 2), np.nan, dtype=np.float32)
+    elevation[1:-1, 1:-1] = dem
+    return elevation
+
+
+def compute(dem):
+    elevation = bordered(dem)
+    direction = np.zeros(elevation.shape, dtype=np.uint8)
+    labels = np.zeros(elevation.shape, dtype=np.int32)
+    assert flow_directions(elevation, direction, labels)
+    accumulation = np.zeros(elevation.shape, dtype=np.float32)
+    donors = np.zeros(elevation.shape, dtype=np.uint8)
+    assert flow_accumulation(direction, accumulation, donors)
+    return elevation, direction, accumulation
+
+
+def reference_fill(elevation):
+    """Comblement par inondation prioritaire pixel par pixel, depuis les voisins de nodata."""
+    rows, cols = elevation.shape
+    filled = np.full(elevation.shape, np.nan)
+    done = np.isnan(elevation)
+    heap = []
+    for r in range(1, rows - 1):
+        for c in range(1, cols - 1):
+            if not done[r, c] and any(np.isnan(elevation[r + di, c + dj]) for di, dj in NEIGHBOR_OFFSETS):
+                heap.append((float(elevation[r, c]), r, c))
+                done[r, c] = True
+    heapq.heapify(heap)
+    while heap:
+        level, r, c = heapq.heappop(heap)
+        filled[r, c] = level
+        for di, dj in NEIGHBOR_OFFSETS:
+            if not done[r + di, c + dj]:
+                done[r + di, c + dj] = True
+                heapq.heappush(heap, (max(level, float(elevation[r + di, c + dj])), r + di, c + dj))
+    return filled
+
+
+def brute_force_accumulation(direction):
+    """Nombre de pixels drainés par chaque pixel, en suivant l'aval de chaque pixel."""
+    width = direction.shape[1]
+    receivers = [0] + _flat_offsets(width)
+    codes = direction.reshape(-1)
+    counts = np.zeros(codes.shape, dtype=np.int64)
+    for pixel in np.flatnonzero(codes != NODATA):
+        current = pixel
+        for _ in range(codes.size):
+            counts[current] += 1
+            following = current + receivers[codes[current]]
+            if codes[following] == NODATA:
+                break
+            current = following
+        else:
+            pytest.fail("cycle dans les directions d'écoulement")
+    return counts.reshape(direction.shape)
+
+
+@pytest.mark.parametrize('name', DEMS)
+def test_every_valid_pixel_has_a_direction(name):
+    dem = DEMS[name]
+    _, direction, _ = compute(dem)
+    valid = ~np.isnan(bordered(dem))
+    assert not ((direction == UNVISITED) & valid).any()
+    assert ((direction == NODATA) == ~valid).all()
+
+
+@pytest.mark.parametrize('name', DEMS)
+def test_filled_surface_matches_priority_flood(name):
+    dem = DEMS[name]
+    filled, _, _ = compute(dem)
+    expected = reference_fill(bordered(dem))
+    np.testing.assert_array_equal(filled, expected.astype(np.float32))
+
+
+@pytest.mark.parametrize('name', DEMS)
+def test_flow_goes_downhill_on_filled_surface(name):
+    filled, direction, _ = compute(DEMS[name])
+    width = direction.shape[1]
+    receivers = np.array([0] + _flat_offsets(width))
+    codes = direction.reshape(-1)
+    pixels = np.flatnonzero(codes != NODATA)
+    targets = pixels + receivers[codes[pixels]]
+    inside = codes[targets] != NODATA
+    z = filled.reshape(-1)
+    assert (z[targets[inside]] <= z[pixels[inside]]).all()
+
+
+@pytest.mark.parametrize('name', DEMS)
+def test_accumulation_matches_brute_force(name):
+    _, direction, accumulation = compute(DEMS[name])
+    np.testing.assert_array_equal(accumulation, brute_force_accumulation(direction))
+
+
+def test_cancel_stops_computation():
+    elevation = bordered(DEMS['noise'])
+    direction = np.zeros(elevation.shape, dtype=np.uint8)
+    labels = np.zeros(elevation.shape, dtype=np.int32)
+    assert not flow_directions(elevation, direction, labels, is_canceled=lambda: True)
@@ -0,0 +1,47 @@
+"""
+Tests du cache LRU borné par taille.
+"""
+
+import numpy as np
+
+from terrain.lru import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+
+
+def test_size_budget_in_bytes():
+    cache = LRUCache(1000, sizeof=lambda tile: tile.nbytes)
+    for key in range(6):
+        cache.put(key, np.zeros(50, dtype=np.float32))
+    assert cache.size == 1000 and len(cache) == 5 and 0 not in cache
+    # Remplacer une entrée met à jour la taille occupée
+    cache.put(5, np.zeros(10, dtype=np.float32))
+    assert cache.size == 840
+
+
+def test_oversized_entry_is_kept_alone():
+    cache = LRUCache(10, sizeof=len)
+    cache.put('small', 'abc')
+    cache.put('big', 'x' * 50)
+    assert len(cache) == 1 and cache.get('big') == 'x' * 50
+
+
+def test_stats_and_clear():
+    cache = LRUCache(4)
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('missing')
+    assert cache.get('missing', 'default') == 'default'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 1)
+    assert stats['hit_rate'] == 1 / 3
+    cache.clear()
+    assert len(cache) == 0 and cache.size == 0 and cache.hits == 1
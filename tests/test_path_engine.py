@@ -0,0 +1,70 @@
+"""
+Tests du moteur de recherche de chemin sur grille.
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from terrain.path_engine import ASTAR, BIDIRECTIONAL, DIJKSTRA, elevation_cost, search_path
+from terrain.synthetic import noise_dem, ridge_dem
+
+ALGORITHMS = (DIJKSTRA, ASTAR, BIDIRECTIONAL)
+
+
+def path_cost(cost, path, step_cost):
+    """Coût d'un chemin : coût des pixels d'arrivée et longueur des pas."""
+    steps = np.diff(path, axis=0)
+    lengths = np.where(np.abs(steps).sum(axis=1) == 2, math.sqrt(2), 1.0)
+    return float(cost[path[1:, 0], path[1:, 1]].sum() + step_cost * lengths.sum())
+
+
+def check_path(cost, path, start, end):
+    """Le chemin relie start à end par pas de 8-connexité sur des pixels franchissables."""
+    assert tuple(path[0]) == start and tuple(path[-1]) == end
+    assert np.abs(np.diff(path, axis=0)).max() == 1
+    assert np.isfinite(cost[path[:, 0], path[:, 1]]).all()
+
+
+@pytest.mark.parametrize('step_cost', [0.0, 2.5])
+@pytest.mark.parametrize('dem', [ridge_dem((60, 80), seed=1), noise_dem((64, 64), seed=2)])
+def test_algorithms_agree_on_cost(dem, step_cost):
+    cost = elevation_cost(dem)
+    start, end = (5, 3), (50, 60)
+    costs = []
+    for algorithm in ALGORITHMS:
+        path, expanded = search_path(cost, start, end, algorithm, step_cost)
+        check_path(cost, path, start, end)
+        assert expanded > 0
+        costs.append(path_cost(cost, path, step_cost))
+    assert costs == pytest.approx([costs[0]] * len(costs), rel=1e-9)
+
+
+def test_algorithms_agree_around_obstacles():
+    rng = np.random.default_rng(3)
+    cost = rng.random((40, 40)) * 10
+    cost[rng.random(cost.shape) < 0.3] = np.inf
+    cost[0, 0] = cost[39, 39] = 1.0
+    results = [search_path(cost, (0, 0), (39, 39), algorithm, 1.0)[0] for algorithm in ALGORITHMS]
+    for path in results:
+        check_path(cost, path, (0, 0), (39, 39))
+    costs = [path_cost(cost, path, 1.0) for path in results]
+    assert costs == pytest.approx([costs[0]] * len(costs), rel=1e-9)
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_unreachable_target(algorithm):
+    cost = np.ones((10, 10))
+    cost[:, 5] = np.inf
+    path, _ = search_path(cost, (2, 1), (7, 8), algorithm)
+    assert path is None
+
+
+def test_masked_pixels_are_impassable():
+    dem = ridge_dem((20, 20), seed=0)
+    mask = np.ones(dem.shape, dtype=bool)
+    mask[:, 10] = False
+    cost = elevation_cost(dem, mask)
+    assert np.isinf(cost[:, 10]).all()
+    assert (cost[mask] >= 0).all()
@@ -0,0 +1,76 @@
+"""
+Tests de la chaîne du tracé assisté sur des MNT synthétiques.
+"""
+
+import numpy as np
+import pytest
+
+from terrain.metrics import Metrics
+from terrain.raster_window import ArrayRasterReader
+from terrain.ridge_path import CORRIDOR_GROWTH, highest_path, path_points, simplify_path
+from terrain.synthetic import noise_dem, ridge_dem
+
+
+def absolute_path(result):
+    """Pixels (ligne, colonne) du chemin dans le MNT."""
+    path, xoff, yoff = result
+    return path + (yoff, xoff)
+
+
+def elevation_sum(dem, path):
+    return float(dem[path[:, 0], path[:, 1]].sum())
+
+
+@pytest.mark.parametrize('dem, start, end', [
+    # Segment décalé de la crête : le chemin longe le bord du couloir initial
+    (ridge_dem((200, 240), seed=4), (10.5, -70.5), (230.5, -80.5)),
+    (noise_dem((160, 160), seed=7), (8.5, -8.5), (150.5, -140.5)),
+])
+def test_adaptive_corridor_matches_fixed_final_width(dem, start, end):
+    reader = ArrayRasterReader(dem)
+    metrics = Metrics(enabled=True)
+    adaptive = highest_path(reader, start, end, 5.0, metrics=metrics, max_width=80.0)
+    widenings = metrics.counters.get('corridor_widenings', 0)
+    assert widenings > 0
+    final_width = min(5.0 * CORRIDOR_GROWTH ** widenings, 80.0)
+
+    fixed = highest_path(ArrayRasterReader(dem), start, end, final_width)
+    adaptive, fixed = absolute_path(adaptive), absolute_path(fixed)
+    assert tuple(adaptive[0]) == tuple(fixed[0]) and tuple(adaptive[-1]) == tuple(fixed[-1])
+    assert elevation_sum(dem, adaptive) == pytest.approx(elevation_sum(dem, fixed), rel=1e-6)
+    assert len(adaptive) == len(fixed)
+
+
+def test_widening_follows_offset_ridge():
+    dem = ridge_dem((200, 240), seed=4)
+    start, end = (10.5, -70.5), (230.5, -80.5)
+    metrics = Metrics(enabled=True)
+    narrow = absolute_path(highest_path(ArrayRasterReader(dem), start, end, 5.0))
+    wide = absolute_path(highest_path(ArrayRasterReader(dem), start, end, 5.0, metrics=metrics, max_width=80.0))
+    assert metrics.counters.get('corridor_widenings', 0) > 0
+    assert dem[wide[:, 0], wide[:, 1]].mean() > dem[narrow[:, 0], narrow[:, 1]].mean()
+
+
+def test_path_stays_in_corridor():
+    dem = noise_dem((120, 120), seed=6)
+    reader = ArrayRasterReader(dem)
+    start, end = (10.5, -60.5), (110.5, -60.5)
+    path, xoff, yoff = highest_path(reader, start, end, 6.0)
+    xy = path_points(reader, path, xoff, yoff)
+    # Distance des centres de pixels au segment horizontal départ/arrivée
+    assert np.abs(xy[:, 1] - start[1]).max() < 6.0
+
+
+def test_no_path_outside_raster():
+    reader = ArrayRasterReader(ridge_dem((50, 50)))
+    assert highest_path(reader, (500.5, -500.5), (600.5, -600.5), 5.0) is None
+
+
+def test_simplified_path_keeps_endpoints():
+    dem = ridge_dem((100, 160), seed=7)
+    reader = ArrayRasterReader(dem)
+    path, xoff, yoff = highest_path(reader, (5.5, -50.5), (150.5, -50.5), 10.0)
+    xy = path_points(reader, path, xoff, yoff)
+    keep = simplify_path(xy, dem[yoff + path[:, 0], xoff + path[:, 1]], 2.0)
+    assert keep[0] == 0 and keep[-1] == len(xy) - 1
+    assert np.all(np.diff(keep) > 0)
@@ -0,0 +1,59 @@
+"""
+Tests de la simplification de polylignes avec conservation des sommets.
+"""
+
+import numpy as np
+
+from terrain.simplify import local_maxima, simplify_polyline
+
+
+def chord_distance(xy, a, b):
+    """Distance des sommets ``xy`` au segment [a, b]."""
+    ab = b - a
+    ap = xy - a
+    length2 = ab @ ab
+    t = np.clip(ap @ ab / length2, 0.0, 1.0) if length2 > 0 else np.zeros(len(xy))
+    return np.hypot(*(ap - t[:, np.newaxis] * ab).T)
+
+
+def zigzag(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=np.float64)
+    y = np.cumsum(rng.normal(0.0, 1.0, n))
+    z = 100 + 10 * np.sin(x / 15) + rng.random(n)
+    return np.column_stack((x, y)), z
+
+
+def test_straight_line_keeps_endpoints_only():
+    xy = np.column_stack((np.arange(50.0), np.zeros(50)))
+    z = np.zeros(50)
+    np.testing.assert_array_equal(simplify_polyline(xy, z, 0.5), [0, 49])
+
+
+def test_short_polylines_are_unchanged():
+    np.testing.assert_array_equal(simplify_polyline(np.zeros((2, 2)), np.zeros(2), 1.0), [0, 1])
+    assert len(simplify_polyline(np.zeros((0, 2)), np.zeros(0), 1.0)) == 0
+
+
+def test_removed_vertices_stay_within_tolerance():
+    xy, z = zigzag()
+    tolerance = 2.0
+    keep = simplify_polyline(xy, z, tolerance)
+    assert keep[0] == 0 and keep[-1] == len(xy) - 1
+    assert np.all(np.diff(keep) > 0)
+    for a, b in zip(keep[:-1], keep[1:]):
+        assert chord_distance(xy[a:b + 1], xy[a], xy[b]).max() <= tolerance + 1e-9
+
+
+def test_local_peaks_are_kept():
+    xy, z = zigzag(seed=1)
+    keep = simplify_polyline(xy, z, 50.0, peak_radius=5)
+    peaks = np.flatnonzero(local_maxima(z, 5))
+    assert peaks.size > 0
+    assert set(peaks) <= set(keep)
+
+
+def test_local_maxima_ignore_nodata_and_plateaus():
+    z = np.array([1.0, 3.0, 3.0, 2.0, np.nan, 5.0, 4.0])
+    # Le premier point d'un plateau est retenu ; nodata n'est jamais un sommet
+    np.testing.assert_array_equal(local_maxima(z, 1), [False, True, False, False, False, True, False])